@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+bench.py – Le Big Match
+───────────────────────
+Banc de mesure de la génération (make_csv.py) et, en option, du chargement
+et des requêtes sur un cluster PostgreSQL jetable, à plusieurs facteurs
+d'échelle → courbes de passage à l'échelle et détection des régressions.
+
+• Génération : une exécution par échelle dans un processus neuf → lignes/s
+  et secondes par table, octets écrits par table, pic de RSS (wait4)
+• --pg : initdb dans un dossier temporaire (socket Unix locale, aucun port
+  TCP), create_tables.sql, load_binary.sql / load.sql, REFRESH de mv_matches,
+  puis chaque requête de requete.sql et the_match.sql chronométrée à part
+• Résultats en JSON ; --compare ancien.json signale les tables plus lentes
+  que le seuil (code de sortie 1 → utilisable dans le rebuild nocturne)
+
+Exécution :
+    python bench.py --scales 1 10 100 --json bench.json
+    python bench.py --scales 10 100 --pg --compare bench.json --json bench2.json
+    python bench.py --scales 1000 --workers 0 --pg --pg-bin /usr/lib/postgresql/16/bin
+"""
+import argparse, contextlib, datetime, json, os, platform, re, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import numpy as np
+
+import make_csv
+
+ROOT = Path(__file__).resolve().parent
+DB = "le_big_match"
+
+# ───────── GÉNÉRATION ──────────
+def output_bytes(out):
+    """Octets écrits par table (fichier <table>.* ou dossier <table>/)."""
+    sizes = {}
+    for p in out.iterdir():
+        files = p.rglob("*") if p.is_dir() else [p]
+        sizes[p.stem] = sizes.get(p.stem, 0) + sum(f.stat().st_size for f in files if f.is_file())
+    return sizes
+
+def child(spec):
+    """Processus fils : une génération, stats écrites dans spec["stats"]."""
+    if spec["now"]:
+        make_csv.init_worker(datetime.datetime.fromisoformat(spec["now"]), make_csv.ACTIVE, make_csv.POOLS)
+    rows = make_csv.parse_rows(spec["scale"], spec["rows"])
+    stats = make_csv.generate(rows, Path(spec["out"]), spec["seed"], spec["workers"], spec["format"],
+                              category_depth=spec["category_depth"])
+    Path(spec["stats"]).write_text(json.dumps(stats))
+
+def run_generation(scale, out, args):
+    """Lance la génération d'une échelle ; renvoie le résultat JSON de la mesure."""
+    stats_path = out.parent / "stats.json"
+    spec = {"scale": scale, "rows": args.rows, "out": str(out), "seed": args.seed, "now": args.now,
+            "workers": args.workers or os.cpu_count() or 1, "format": args.format,
+            "category_depth": args.category_depth, "stats": str(stats_path)}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, __file__, "--child", json.dumps(spec)],
+                            stdout=subprocess.DEVNULL, cwd=ROOT)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - t0
+    if proc.returncode:
+        raise SystemExit(f"échec de la génération à l'échelle {scale} (code {proc.returncode})")
+    stats, sizes = json.loads(stats_path.read_text()), output_bytes(out)
+    tables = {t: {"rows": n, "secs": round(dt, 4), "rows_per_s": round(n/dt) if dt else None,
+                  "bytes": sizes.get(t, 0)} for t, (n, dt) in stats.items()}
+    return {"scale": scale, "wall_s": round(wall, 3), "peak_rss_kb": usage.ru_maxrss,
+            "rows": sum(t["rows"] for t in tables.values()),
+            "bytes": sum(t["bytes"] for t in tables.values()), "tables": tables}
+
+# ───────── POSTGRESQL JETABLE ──────────
+def split_queries(path):
+    """Requêtes de requete.sql : {"2": "SELECT …", "12A": …} d'après les
+    en-têtes `-- N. titre`."""
+    queries, key = {}, None
+    for line in path.read_text(encoding="utf8").splitlines():
+        m = re.match(r"--\s*(\d+[A-Z]?)\.\s", line)
+        if m:
+            key = m.group(1); queries[key] = []
+        elif key:
+            queries[key].append(line)
+    return {k: "\n".join(v).strip() for k, v in queries.items() if "".join(v).strip()}
+
+class TempCluster:
+    """Cluster PostgreSQL dans un dossier temporaire, socket Unix dans ce
+    dossier ; arrêté et supprimé à la sortie du bloc `with`."""
+
+    def __init__(self, bindir=None):
+        self.bin = lambda name: str(Path(bindir) / name) if bindir else (shutil.which(name) or name)
+        if not bindir and not shutil.which("initdb"):
+            raise SystemExit("initdb introuvable : installer PostgreSQL ou préciser --pg-bin")
+
+    def __enter__(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="bigmatch-pg-"))
+        data = self.dir / "data"
+        subprocess.run([self.bin("initdb"), "-D", data, "-U", "postgres", "-A", "trust", "-E", "UTF8"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([self.bin("pg_ctl"), "-D", data, "-l", self.dir / "log", "-w", "start",
+                        "-o", f"-k {self.dir} -c listen_addresses=''"], check=True, stdout=subprocess.DEVNULL)
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.run([self.bin("pg_ctl"), "-D", self.dir / "data", "-m", "fast", "-w", "stop"],
+                       stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def psql(self, *args, sql=None, cwd=None, db=DB):
+        """Exécute psql ; renvoie {"secs", "ok"[, "error"]}."""
+        cmd = [self.bin("psql"), "-X", "-q", "-h", self.dir, "-U", "postgres", "-d", db,
+               "-v", "ON_ERROR_STOP=1", *args]
+        t0 = time.perf_counter()
+        p = subprocess.run(cmd, input=sql, text=True, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        res = {"secs": round(time.perf_counter() - t0, 4), "ok": p.returncode == 0}
+        if p.returncode:
+            res["error"] = p.stderr.strip().splitlines()[-1] if p.stderr.strip() else f"code {p.returncode}"
+        return res
+
+    def recreate(self):
+        self.psql("-c", f"DROP DATABASE IF EXISTS {DB}", db="postgres")
+        self.psql("-c", f"CREATE DATABASE {DB}", db="postgres")
+
+def run_pg(cluster, workdir, args):
+    """Schéma, chargement (cwd = dossier parent de CSV/), requêtes ; si le
+    schéma ou le chargement échoue, requêtes marquées "skipped" (tables vides :
+    mesures sans valeur)."""
+    cluster.recreate()
+    res = {"create_tables": cluster.psql("-f", ROOT / "create_tables.sql")}
+    loader = "load_binary.sql" if args.format == "binary" else "load.sql"
+    res["load"] = cluster.psql("-f", ROOT / loader, cwd=workdir)
+    if not (res["create_tables"]["ok"] and res["load"]["ok"]):
+        skip = {"secs": 0, "ok": False, "skipped": True}
+        res.update({"refresh_mv_matches": skip, "the_match": skip,
+                    "requete": {k: skip for k in split_queries(ROOT / "requete.sql")}})
+        return res
+    res["refresh_mv_matches"] = cluster.psql("-c", "REFRESH MATERIALIZED VIEW mv_matches")
+    res["the_match"] = cluster.psql("-v", f"current_user_id={args.user_id}", "-f", ROOT / "the_match.sql")
+    res["requete"] = {k: cluster.psql(sql=q) for k, q in split_queries(ROOT / "requete.sql").items()}
+    return res
+
+# ───────── RAPPORT ──────────
+def scaling(runs):
+    """Exposant de passage à l'échelle par table : pente de log(secondes)
+    en fonction de log(lignes) (1 = linéaire)."""
+    out = {}
+    for table in runs[0]["tables"]:
+        pts = [(r["tables"][table]["rows"], r["tables"][table]["secs"]) for r in runs]
+        pts = [(n, s) for n, s in pts if n > 0 and s > 0]
+        if len({n for n, _ in pts}) >= 2:
+            out[table] = round(float(np.polyfit(np.log([n for n, _ in pts]), np.log([s for _, s in pts]), 1)[0]), 3)
+    return out
+
+def compare(old, new, tolerance):
+    """Régressions de new par rapport à old (mêmes échelles) : débit de
+    génération plus faible, chargement ou requêtes plus lents ou en échec."""
+    before = {r["scale"]: r for r in old["runs"]}
+    found = []
+    for run in new["runs"]:
+        ref = before.get(run["scale"])
+        if not ref:
+            continue
+        for table, t in run["tables"].items():
+            r = ref["tables"].get(table)
+            if r and r["rows_per_s"] and t["rows_per_s"] and t["rows_per_s"] < r["rows_per_s"] * (1 - tolerance):
+                found.append(f"échelle {run['scale']:g} {table} : {r['rows_per_s']:,} → {t['rows_per_s']:,} lignes/s")
+        steps = lambda res: {**{k: v for k, v in res.items() if k != "requete"},
+                             **{f"requete #{k}": v for k, v in res.get("requete", {}).items()}}
+        old_pg, new_pg = steps(ref.get("pg", {})), steps(run.get("pg", {}))
+        for step, t in new_pg.items():
+            r = old_pg.get(step)
+            if r and r["ok"] and not t["ok"] and not t.get("skipped"):
+                found.append(f"échelle {run['scale']:g} {step} : échec ({t.get('error', '?')})")
+            if r and r["ok"] and t["ok"] and t["secs"] > r["secs"] * (1 + tolerance):
+                found.append(f"échelle {run['scale']:g} {step} : {r['secs']:.3f} → {t['secs']:.3f} s")
+    return found
+
+def git_revision():
+    p = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return p.stdout.strip() or None
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Banc de mesure génération / chargement / requêtes.")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100], help="facteurs d'échelle mesurés")
+    ap.add_argument("--rows", action="append", default=[], metavar="TABLE=N", help="surcharges, cf. make_csv.py")
+    ap.add_argument("--workers", type=int, default=1, help="processus de génération (0 = tous les cœurs)")
+    ap.add_argument("--category-depth", type=int, default=make_csv.CATEGORY_DEPTH,
+                    help="niveaux de l'arbre des catégories, cf. make_csv.py")
+    ap.add_argument("--format", choices=["csv", "binary"], default="binary",
+                    help="format généré ; binary → load_binary.sql, csv → load.sql")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--now", default="2025-03-20T12:00", help="date de référence fixe (mesures comparables)")
+    ap.add_argument("--pg", action="store_true", help="mesure aussi chargement et requêtes (cluster jetable)")
+    ap.add_argument("--pg-bin", help="dossier des binaires PostgreSQL (initdb, pg_ctl, psql)")
+    ap.add_argument("--user-id", type=int, default=1, help=":current_user_id de the_match.sql")
+    ap.add_argument("--json", type=Path, default=Path("bench.json"), help="fichier de résultats")
+    ap.add_argument("--compare", type=Path, help="résultats précédents : signale les régressions")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="écart toléré avant régression (0.10 = 10 %%)")
+    args = ap.parse_args(argv)
+    if args.child:
+        return child(json.loads(args.child))
+
+    result = {"meta": {"date": datetime.datetime.now().isoformat(timespec="seconds"), "git": git_revision(),
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "cpu_count": os.cpu_count(), "workers": args.workers or os.cpu_count(),
+                       "format": args.format, "seed": args.seed, "now": args.now, "rows": args.rows,
+                       "category_depth": args.category_depth},
+              "runs": []}
+    with TempCluster(args.pg_bin) if args.pg else contextlib.nullcontext() as cluster:
+        for scale in args.scales:
+            with tempfile.TemporaryDirectory(prefix="bigmatch-bench-") as tmp:
+                out = Path(tmp) / "CSV"   # load*.sql lisent CSV/<table>.* relativement au cwd
+                run = run_generation(scale, out, args)
+                if cluster:
+                    run["pg"] = run_pg(cluster, tmp, args)
+            result["runs"].append(run)
+            print(f"échelle {scale:>8g} : {run['rows']:>13,} lignes {run['wall_s']:8.2f} s "
+                  f"{run['bytes']/2**20:10.1f} Mio  RSS max {run['peak_rss_kb']/1024:8.1f} Mio"
+                  + (f"  chargement {run['pg']['load']['secs']:.2f} s" if cluster else ""))
+            for step in ("create_tables", "load") if cluster else ():
+                if not run["pg"][step]["ok"]:
+                    print(f"  ⚠ {step} en échec, requêtes non mesurées : {run['pg'][step]['error']}")
+    result["scaling_exponent"] = scaling(result["runs"])
+    args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf8")
+    print(f"résultats → {args.json}")
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text(encoding="utf8")), result, args.tolerance)
+        for r in regressions: print(f"  ⚠ régression {r}")
+        if regressions:
+            return 1
+        print("aucune régression")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+candidate_index.py – Le Big Match
+─────────────────────────────────
+Index en mémoire des candidats de la CTE `potential` (the_match.sql) : la
+question « matches potentiels par événement pour l'utilisateur U » est
+résolue sans auto-jointure de "user" sur city.
+
+• Utilisateurs rangés par seau (city, gender, orientation) dans des tableaux
+  d'entiers compacts (retrait en O(1) par échange avec le dernier)
+• Comptes de participations 'going' précalculés par (city, gender) et par
+  city, tenus à jour à chaque changement de ville, de genre ou de participation
+• potential(u) : vue {event_id: compte} en O(1) (pas de copie)
+
+Même sémantique que le SQL : ville NULL ⇒ aucun candidat ; 'heterosexual' ⇒
+genre différent (NULL exclu) ; 'other' ⇒ tous les genres ; u lui-même exclu.
+
+Exécution (construction + mesure des requêtes) :
+    python candidate_index.py CSV --queries 100000
+"""
+import argparse, csv, random, sys, time
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from pathlib import Path
+from types import MappingProxyType
+
+OPPOSITE = {"man": "woman", "woman": "man"}   # gender_value a deux valeurs
+EMPTY = MappingProxyType({})
+
+class Excluding(Mapping):
+    """Vue de comptes `base` moins une participation pour chaque événement de
+    `minus` (exclusion de l'utilisateur courant) ; les zéros sont masqués."""
+
+    def __init__(self, base, minus):
+        self.base, self.minus = base, minus
+
+    def __getitem__(self, event):
+        n = self.base[event] - (event in self.minus)
+        if n <= 0:
+            raise KeyError(event)
+        return n
+
+    def __iter__(self):
+        return (e for e, n in self.base.items() if n - (e in self.minus) > 0)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class CandidateIndex:
+    """Seaux d'utilisateurs et comptes 'going' par (city, gender) et par city."""
+
+    def __init__(self):
+        self.profile = {}      # user_id → (city, gender, orientation), "" = NULL
+        self.going = {}        # user_id → set(event_id)
+        self.members = {}      # city → {(gender, orientation): array('l') d'user_id}
+        self.slot = {}         # user_id → position dans son seau
+        self.by_gender = {}    # (city, gender) → Counter {event_id: 'going'}
+        self.by_city = {}      # city → Counter {event_id: 'going'}
+
+    # ───────── CONSTRUCTION ──────────
+    @classmethod
+    def from_csv(cls, user_csv, participation_csv):
+        """user_id = rang dans user.csv ; seules les lignes 'going' comptent."""
+        idx = cls()
+        with open(user_csv, newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            header = next(r)
+            ic, ig, io = (header.index(c) for c in ("city", "gender", "orientation"))
+            for uid, row in enumerate(r, 1):
+                idx.add_user(uid, row[ic], row[ig], row[io])
+        with open(participation_csv, newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            next(r)
+            for u, e, status, _ in r:
+                if status == "going":
+                    idx.set_participation(int(u), int(e), status)
+        return idx
+
+    def _count(self, uid, events, sign):
+        city, gender, _ = self.profile[uid]
+        if not city or not events:
+            return
+        for counter in (self.by_gender.setdefault((city, gender), Counter()),
+                        self.by_city.setdefault(city, Counter())):
+            for e in events:
+                counter[e] += sign
+                if not counter[e]:
+                    del counter[e]
+
+    def _bucket_add(self, uid):
+        city, gender, orientation = self.profile[uid]
+        bucket = self.members.setdefault(city, {}).setdefault((gender, orientation), array("l"))
+        self.slot[uid] = len(bucket)
+        bucket.append(uid)
+
+    def _bucket_remove(self, uid):
+        city, gender, orientation = self.profile[uid]
+        bucket = self.members[city][gender, orientation]
+        i, last = self.slot.pop(uid), bucket.pop()
+        if last != uid:
+            bucket[i] = last
+            self.slot[last] = i
+
+    # ───────── MISES À JOUR ──────────
+    def add_user(self, uid, city="", gender="", orientation=""):
+        self.profile[uid] = (city, gender, orientation)
+        self.going.setdefault(uid, set())
+        self._bucket_add(uid)
+        self._count(uid, self.going[uid], +1)
+
+    def remove_user(self, uid):
+        self._count(uid, self.going.pop(uid), -1)
+        self._bucket_remove(uid)
+        del self.profile[uid]
+
+    def update_user(self, uid, city=None, gender=None, orientation=None):
+        """Change les attributs donnés (None = inchangé) ; les comptes de
+        l'ancienne ville / genre sont transférés aux nouveaux."""
+        old = self.profile[uid]
+        new = tuple(o if n is None else n for o, n in zip(old, (city, gender, orientation)))
+        if new == old:
+            return
+        going = self.going[uid]
+        self._count(uid, going, -1)
+        self._bucket_remove(uid)
+        self.profile[uid] = new
+        self._bucket_add(uid)
+        self._count(uid, going, +1)
+
+    def set_participation(self, uid, event, status=None):
+        """Statut de (uid, event) : 'going', 'interested' ou None (supprimée)."""
+        going = self.going[uid]
+        if status == "going" and event not in going:
+            going.add(event)
+            self._count(uid, (event,), +1)
+        elif status != "going" and event in going:
+            going.discard(event)
+            self._count(uid, (event,), -1)
+
+    # ───────── REQUÊTES ──────────
+    def potential(self, uid):
+        """CTE `potential` pour :current_user_id = uid : {event_id: matches potentiels}."""
+        city, gender, orientation = self.profile[uid]
+        if not city:
+            return EMPTY
+        if orientation == "heterosexual":   # u.gender <> ui.gender, NULL exclu
+            counts = self.by_gender.get((city, OPPOSITE.get(gender)))
+            return MappingProxyType(counts) if counts else EMPTY
+        if orientation == "other":
+            counts = self.by_city.get(city)
+            return Excluding(counts, self.going[uid]) if counts else EMPTY
+        return EMPTY
+
+    def candidates(self, uid):
+        """user_id des matches potentiels de uid (tous événements confondus)."""
+        city, gender, orientation = self.profile[uid]
+        if not city or orientation not in ("heterosexual", "other"):
+            return []
+        out = []
+        for (g, _), bucket in self.members.get(city, {}).items():
+            if orientation == "other" or (g and g == OPPOSITE.get(gender)):
+                out.extend(v for v in bucket if v != uid)
+        return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Index des matches potentiels (the_match.sql).")
+    ap.add_argument("csv_dir", type=Path, help="dossier contenant user.csv et participation.csv")
+    ap.add_argument("--queries", type=int, default=100_000, help="requêtes potential() chronométrées")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    idx = CandidateIndex.from_csv(args.csv_dir / "user.csv", args.csv_dir / "participation.csv")
+    n_buckets = sum(len(b) for b in idx.members.values())
+    print(f"{len(idx.profile):,} utilisateurs, {n_buckets:,} seaux "
+          f"construits en {time.perf_counter()-t0:.2f} s")
+    rng = random.Random(args.seed)
+    users = rng.choices(list(idx.profile), k=args.queries)
+    t0 = time.perf_counter()
+    for u in users:
+        idx.potential(u)
+    dt = time.perf_counter() - t0
+    print(f"potential() : {dt / max(args.queries, 1) * 1e6:.2f} µs/requête")
+    t0 = time.perf_counter()
+    total = sum(sum(idx.potential(u).values()) for u in users)
+    dt = time.perf_counter() - t0
+    print(f"potential() parcouru : {dt / max(args.queries, 1) * 1e6:.2f} µs/requête ({total:,} participations)")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+categories.py – Le Big Match
+────────────────────────────
+Hiérarchie des catégories en mémoire : intervalles du parcours eulérien
+(tin / tout) et table de fermeture (ancêtre, descendant, profondeur) — la
+requête récursive #13 de requete.sql devient une comparaison d'entiers.
+
+• `a` ancêtre de `d` ⇔ tin[a] ≤ tin[d] ≤ tout[a] : test O(1), vectorisé
+• Sous-arbre de `c` = tranche order[tin[c] : tout[c]+1] (ordre préfixe)
+• Fermeture (category_closure) : une ligne par couple ancêtre / descendant,
+  soi-même compris (profondeur 0), générée par make_csv.py pour SQL
+• Cumuls tag → catégorie → racine sur tag_category et tag_*_assignment par
+  tests d'intervalle, sans parcours récursif
+• Arbres profonds (`build_tree`) : les 6 catégories historiques puis des
+  niveaux de taille géométrique ; identifiants par niveau (parent < enfant)
+
+Exécution :
+    python categories.py CSV/category.csv --tag-category CSV/tag_category.csv \\
+        --assignments CSV/tag_assignment.csv
+"""
+import argparse, csv, sys, time
+
+import numpy as np
+
+# Catégories historiques (nom, parent ; 0 = racine) : arbre par défaut
+BASE = [("Sport", 0), ("Culture", 0), ("Endurance", 1), ("Musique", 2), ("Gaming", 2), ("Bien-être", 1)]
+BASE_DEPTH = 2   # niveaux de BASE (racines + sous-catégories)
+
+def level_sizes(m, levels, first):
+    """Répartit m nœuds sur `levels` niveaux de taille géométrique, le premier
+    niveau ajouté suivant un niveau de `first` nœuds (raison ajustée par
+    dichotomie pour que la somme fasse m)."""
+    lo, hi = 1e-3, max(float(m), 2.0)
+    for _ in range(100):
+        q = (lo*hi) ** 0.5
+        total = first * sum(q**k for k in range(1, levels+1))
+        lo, hi = (q, hi) if total < m else (lo, q)
+    w = np.array([q**k for k in range(1, levels+1)])
+    cum = np.round(np.cumsum(w) / w.sum() * m).astype(np.int64)
+    return np.maximum(np.diff(cum, prepend=0), 0)
+
+def build_tree(rng, n, depth=8):
+    """(noms, parent) de n catégories sur `depth` niveaux au plus : BASE, puis
+    chaque niveau rattaché uniformément au niveau précédent. parent[0] inutilisé,
+    identifiant = rang (ordre de chargement, parents d'abord)."""
+    names = [name for name, _ in BASE[:n]]
+    parent = np.zeros(n + 1, dtype=np.int64)
+    parent[1:len(names)+1] = [p for _, p in BASE[:n]]
+    if n <= len(BASE):
+        return names, parent
+    prev_lo, prev_hi = 3, len(BASE) + 1        # sous-catégories de BASE : 3..6
+    at = len(BASE) + 1
+    for size in level_sizes(n - len(BASE), max(depth - BASE_DEPTH, 1), prev_hi - prev_lo):
+        if not size:
+            continue
+        parent[at:at+size] = prev_lo + rng.integers(0, prev_hi - prev_lo, size)
+        prev_lo, prev_hi, at = at, at + size, at + size
+    names += [f"Catégorie #{c}" for c in range(len(BASE) + 1, n + 1)]
+    return names, parent
+
+class CategoryTree:
+    """Forêt de catégories 1..n (`parent` indexé par category_id, 0 = racine).
+
+    `depth`, `root`, `size` (sous-arbre), `tin` / `tout` (rangs préfixe du
+    nœud et de son dernier descendant) et `order` (category_id par rang)."""
+
+    def __init__(self, parent, names=None):
+        self.parent = np.asarray(parent, dtype=np.int64)
+        self.n = len(self.parent) - 1
+        self.names = names
+        ids = np.arange(self.n + 1)
+        # profondeur et racine par sauts de pointeurs (n itérations au plus)
+        depth, up = np.zeros(self.n + 1, dtype=np.int64), self.parent.copy()
+        self.root = ids.copy()
+        for _ in range(self.n + 1):
+            live = up[1:] != 0
+            if not live.any():
+                break
+            depth[1:] += live
+            self.root[1:] = np.where(live, up[1:], self.root[1:])
+            up[1:] = self.parent[up[1:]]
+        else:
+            raise ValueError("cycle dans parent_id")
+        self.depth = depth
+        # tailles des sous-arbres, niveau par niveau depuis le bas
+        self.size = np.ones(self.n + 1, dtype=np.int64)
+        levels = [np.flatnonzero(depth[1:] == d) + 1 for d in range(int(depth[1:].max(initial=0)) + 1)]
+        for nodes in reversed(levels[1:]):
+            np.add.at(self.size, self.parent[nodes], self.size[nodes])
+        # rangs préfixe : enfants d'un même parent dans l'ordre des identifiants
+        self.tin = np.zeros(self.n + 1, dtype=np.int64)
+        for d, nodes in enumerate(levels):
+            p = self.parent[nodes]
+            sib = nodes[np.lexsort((nodes, p))]
+            p, s = self.parent[sib], self.size[sib]
+            before = np.cumsum(s) - s
+            first = np.r_[True, p[1:] != p[:-1]] if len(p) else np.zeros(0, bool)
+            before -= np.maximum.accumulate(np.where(first, before, 0))
+            self.tin[sib] = before if d == 0 else self.tin[p] + 1 + before
+        self.tin[0] = -1
+        self.tout = self.tin + self.size - 1
+        self.order = np.empty(self.n, dtype=np.int64)
+        self.order[self.tin[1:]] = ids[1:]
+
+    def __len__(self):
+        return self.n
+
+    @classmethod
+    def from_csv(cls, path):
+        """category.csv (name, parent_id) ; category_id = rang de la ligne."""
+        with open(path, newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            next(r)
+            rows = list(r)
+        return cls([0] + [int(p) if p else 0 for _, p in rows], [name for name, _ in rows])
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Catégories déjà en colonnes (dataset.Frame)."""
+        pid = frame["parent_id"]
+        parent = pid.data if pid.null is None else np.where(pid.null, 0, pid.data)
+        return cls(np.r_[0, parent], list(frame["name"].values()))
+
+    # ───────── ACCÈS ──────────
+    def is_ancestor(self, a, d):
+        """a ancêtre de d (ou a == d) ; scalaires ou tableaux."""
+        return (self.tin[a] <= self.tin[d]) & (self.tin[d] <= self.tout[a])
+
+    def descendants(self, c):
+        """c et tous ses descendants, en ordre préfixe."""
+        return self.order[self.tin[c]:self.tout[c] + 1]
+
+    def ancestors(self, c):
+        """Chemin de c jusqu'à sa racine (c compris)."""
+        path = [c]
+        while self.parent[path[-1]]:
+            path.append(int(self.parent[path[-1]]))
+        return path
+
+    def leaves(self):
+        return np.flatnonzero(self.size[1:] == 1) + 1
+
+    def ancestor_at(self, c, level):
+        """Ancêtre de profondeur `level` (0 = racine) de chaque c ; c lui-même
+        s'il est moins profond."""
+        c = np.array(c, dtype=np.int64, copy=True)
+        for _ in range(int(self.depth.max(initial=0)) - level):
+            deeper = self.depth[c] > level
+            if not deeper.any():
+                break
+            c[deeper] = self.parent[c[deeper]]
+        return c
+
+    def closure(self, lo=0, hi=None):
+        """Fermeture transitive des descendants lo+1..hi : (ancêtre, descendant,
+        profondeur), triée par descendant puis profondeur."""
+        hi = self.n if hi is None else hi
+        d = np.arange(lo + 1, hi + 1)
+        k = self.depth[d] + 1
+        desc = np.repeat(d, k)
+        dist = np.arange(len(desc)) - np.repeat(np.cumsum(k) - k, k)
+        anc = desc.copy()
+        for step in range(int(k.max(initial=1)) - 1):
+            up = dist > step
+            anc[up] = self.parent[anc[up]]
+        return anc, desc, dist
+
+class TagCategories:
+    """tag_category (M-N) projeté sur l'arbre : cumuls par tests d'intervalle.
+
+    `tag_id`, `category_id` alignés ; `n_tags` = plus grand tag_id."""
+
+    def __init__(self, tree, tag_id, category_id, n_tags=None):
+        self.tree = tree
+        self.tag = np.asarray(tag_id, dtype=np.int64)
+        self.cat = np.asarray(category_id, dtype=np.int64)
+        self.n_tags = int(n_tags if n_tags is not None else self.tag.max(initial=0))
+
+    @classmethod
+    def from_csv(cls, tree, path, n_tags=None):
+        with open(path, newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            next(r)
+            pairs = np.array([(int(t), int(c)) for t, c in r], dtype=np.int64).reshape(-1, 2)
+        return cls(tree, pairs[:, 0], pairs[:, 1], n_tags)
+
+    def covers(self, c):
+        """Masque par tag_id (0..n_tags) : tag rattaché à c ou à un descendant de c."""
+        t = self.tree
+        hit = (t.tin[self.cat] >= t.tin[c]) & (t.tin[self.cat] <= t.tout[c])
+        mask = np.zeros(self.n_tags + 1, dtype=bool)
+        mask[self.tag[hit]] = True
+        return mask
+
+    def tags_under(self, c):
+        return np.flatnonzero(self.covers(c))
+
+    def rollup(self, tag_ids, level=0):
+        """Occurrences de tag_ids (ex. tag_*_assignment) cumulées par catégorie
+        de profondeur `level` (0 = racine) ; un tag compte une fois par
+        catégorie atteinte. Renvoie (category_id, occurrences) non nuls."""
+        anc = self.tree.ancestor_at(self.cat, level)
+        pairs = np.unique(self.tag * np.int64(self.tree.n + 1) + anc)
+        tags, cats = np.divmod(pairs, np.int64(self.tree.n + 1))
+        per_tag = np.bincount(np.asarray(tag_ids, dtype=np.int64), minlength=self.n_tags + 1)
+        total = np.bincount(cats, weights=per_tag[tags], minlength=self.tree.n + 1).astype(np.int64)
+        keep = np.flatnonzero(total)
+        return keep, total[keep]
+
+# ───────── RAPPORT ──────────
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Hiérarchie des catégories : fermeture et cumuls par intervalles.")
+    ap.add_argument("categories", help="chemin de category.csv")
+    ap.add_argument("--tag-category", help="tag_category.csv : tags rattachés")
+    ap.add_argument("--assignments", help="tag_assignment.csv : cumul par racine et type de cible")
+    ap.add_argument("--level", type=int, default=0, help="profondeur du cumul (0 = racines)")
+    ap.add_argument("--top", type=int, default=10, help="lignes affichées")
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    tree = CategoryTree.from_csv(args.categories)
+    anc, _, _ = tree.closure()
+    print(f"{len(tree):,} catégories, {int((tree.parent[1:] == 0).sum()):,} racines, "
+          f"profondeur max {int(tree.depth.max(initial=0))}, fermeture {len(anc):,} lignes "
+          f"({time.perf_counter()-t0:.2f} s)")
+    if not args.tag_category:
+        return
+    tc = TagCategories.from_csv(tree, args.tag_category)
+    name = lambda c: tree.names[c-1]
+    if not args.assignments:
+        for c in np.flatnonzero(tree.depth[1:] == args.level)[:args.top] + 1:
+            print(f"    {name(c):<30} {len(tc.tags_under(c)):,} tags")
+        return
+    with open(args.assignments, newline="", encoding="utf8") as f:
+        r = csv.reader(f)
+        next(r)
+        by_kind = {}
+        for tag, kind, _ in r:
+            by_kind.setdefault(kind, []).append(int(tag))
+    t0 = time.perf_counter()
+    for kind, tag_ids in sorted(by_kind.items()):
+        cats, counts = tc.rollup(tag_ids, args.level)
+        order = np.argsort(-counts, kind="stable")[:args.top]
+        print(f"{kind} ({len(tag_ids):,} affectations)")
+        for c, k in zip(cats[order], counts[order]): print(f"    {name(c):<30} {k:,}")
+    print(f"cumuls calculés en {time.perf_counter()-t0:.3f} s")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+chunked.py – Le Big Match
+─────────────────────────
+Sortie en morceaux compressés (make_csv.py --chunk-rows) : chaque table est
+découpée en fichiers d'environ N lignes, compressés (gzip, zstd si le module
+`zstandard` est installé) par un pool de threads pendant que la génération
+continue, puis chargés par plusieurs sessions PostgreSQL en parallèle.
+
+• Morceaux alignés sur les shards (SHARD_ROWS) : découpage, graines et
+  contenu identiques quel que soit --workers
+• zlib / zstd libèrent le GIL : la compression occupe plusieurs cœurs sans
+  processus supplémentaire ; au plus 2 × threads morceaux en mémoire
+• Fichiers : out/<table>/NNNNN.csv.gz (ou .bin, .zst) + NNNNN.sql, une
+  transaction par morceau ; out/load_parallel.sh les enchaîne table par table
+  (clés étrangères), morceaux d'une même table sur `sessions` psql
+• Tables référencées (user, place, event, social_account, category, tag) :
+  identifiants explicites (rang dans la table) via une table temporaire à
+  colonne IDENTITY → clés étrangères du jeu valides malgré le parallélisme
+• COPY … FROM PROGRAM s'exécute sur le serveur : fichiers lisibles par le
+  serveur (chemins absolus), rôle superuser ou pg_execute_server_program
+
+Exécution :
+    python make_csv.py --scale 1e4 --workers 0 --chunk-rows 1e6 --compress zstd
+    sh CSV/load_parallel.sh le_big_match 8
+"""
+import gzip, os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dataset import WRITERS
+
+try:
+    import zstandard
+except ImportError:   # optionnel : pip install zstandard
+    zstandard = None
+
+class Codec:
+    """Compression d'un morceau complet et commande de décompression côté serveur."""
+    def __init__(self, ext, compress, program):
+        self.ext, self.compress, self.program = ext, compress, program
+
+CODECS = {"gzip": Codec("gz", lambda b: gzip.compress(b, 6, mtime=0), "zcat")}
+if zstandard:
+    CODECS["zstd"] = Codec("zst", lambda b: zstandard.ZstdCompressor(level=3).compress(b), "zstd -dcq")
+
+# tables dont l'identifiant SERIAL est référencé par le jeu : rang imposé
+ID_COLUMNS = {"user": "user_id", "place": "place_id", "tag": "tag_id", "category": "category_id",
+              "event": "event_id", "social_account": "sa_id"}
+SERIAL = {**ID_COLUMNS, "subscription": "sub_id", "digital_trace": "trace_id",
+          "notification": "notification_id"}
+SEQUENTIAL = {"category"}   # parent_id vers un morceau précédent : une session
+TRUNCATE = ["tag_category", "category_closure", "tag", "category", "place", "event", "subscription",
+            "social_account", "digital_trace", "likes", "participation", "tag_user_assignment",
+            "tag_event_assignment", "tag_place_assignment", "notification", '"user"']
+
+class Chunks:
+    """Pool de compression et inventaire des morceaux écrits :
+    `files[table]` = [(chemin, rang de la première ligne, lignes)]."""
+
+    def __init__(self, rows, codec="gzip", threads=None):
+        if codec not in CODECS:
+            raise SystemExit(f"compression {codec!r} indisponible (pip install zstandard)" if codec == "zstd"
+                             else f"compression inconnue : {codec!r}")
+        self.rows, self.codec = max(int(rows), 1), CODECS[codec]
+        self.threads = threads or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(self.threads, thread_name_prefix="chunk")
+        self.pending, self.files = deque(), {}
+
+    def sink(self, out, table, fmt, names):
+        return ChunkSink(self, out, table, fmt, names)
+
+    def submit(self, path, parts):
+        """Compression + écriture en arrière-plan ; bloque au-delà de 2 × threads
+        morceaux en vol (mémoire bornée)."""
+        self.pending.append(self.pool.submit(self._write, path, parts))
+        while len(self.pending) > 2*self.threads:
+            self.pending.popleft().result()
+
+    def _write(self, path, parts):
+        path.write_bytes(self.codec.compress(b"".join(parts)))
+
+    def close(self):
+        while self.pending:
+            self.pending.popleft().result()
+        self.pool.shutdown()
+
+class ChunkSink:
+    """Destination d'une table en morceaux : shards accumulés jusqu'à
+    `chunks.rows` lignes, puis morceau complet (en-tête, lignes, fin) confié
+    au pool."""
+
+    def __init__(self, chunks, out, table, fmt, names):
+        self.chunks, self.table, self.name = chunks, table, table
+        self.writer, self.head = WRITERS[fmt], WRITERS[fmt].header(table, names)
+        self.dir = out / table
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for p in self.dir.glob("[0-9]*.*"):   # morceaux d'une génération précédente
+            p.unlink()
+        self.files = chunks.files[table] = []
+        self.parts, self.n, self.first = [], 0, 0
+
+    def write(self, data, n=0):
+        self.parts.append(data)
+        self.n += n
+        if self.n >= self.chunks.rows:
+            self.flush()
+
+    def flush(self):
+        path = self.dir / f"{len(self.files):05d}.{self.writer.ext}.{self.chunks.codec.ext}"
+        self.chunks.submit(path, [self.head, *self.parts, self.writer.trailer()])
+        self.files.append((path, self.first, self.n))
+        self.first, self.parts, self.n = self.first + self.n, [], 0
+
+    def close(self):
+        if self.parts or not self.files:   # table vide : un morceau d'en-tête seul
+            self.flush()
+
+# ───────── CHARGEUR ──────────
+def chunk_sql(table, cols, source, opts, first):
+    """Transaction de chargement d'un morceau (`first` = rang de sa première ligne)."""
+    if table == "tag_assignment":   # table polymorphe → 3 tables spécifiques
+        return ["BEGIN;",
+                "CREATE TEMP TABLE tmp_ta (tag_id INTEGER, target_type target_kind, target_id INTEGER) ON COMMIT DROP;",
+                f"COPY tmp_ta({cols}) FROM {source} {opts};"] + [
+                f"INSERT INTO tag_{k}_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = '{k}';"
+                for k in ("user", "event", "place")] + ["COMMIT;"]
+    if table in ID_COLUMNS:
+        return ["BEGIN;",
+                f'CREATE TEMP TABLE chunk (LIKE "{table}") ON COMMIT DROP;',
+                f"ALTER TABLE chunk ALTER COLUMN {ID_COLUMNS[table]} ADD GENERATED ALWAYS AS IDENTITY (START WITH {first + 1});",
+                f"COPY chunk({cols}) FROM {source} {opts};",
+                f'INSERT INTO "{table}" SELECT * FROM chunk;',
+                "COMMIT;"]
+    return [f'COPY "{table}"({cols}) FROM {source} {opts};']
+
+def write_loader(out, chunks, headers, fmt):
+    """NNNNN.sql par morceau, load_parallel_begin/end.sql et load_parallel.sh
+    (tables dans l'ordre de `headers`, ordre des clés étrangères)."""
+    root = out.resolve()
+    opts = "WITH (FORMAT binary)" if fmt.startswith("binary") else "CSV HEADER"
+    tables = [t for t in headers if t in chunks.files]
+    for table in tables:
+        for path, first, _ in chunks.files[table]:
+            source = f"PROGRAM '{chunks.codec.program} \"{path.resolve().as_posix()}\"'"
+            sql = chunk_sql(table, ",".join(headers[table]), source, opts, first)
+            path.with_name(path.name.split(".")[0] + ".sql").write_text("\n".join(sql) + "\n", encoding="utf8")
+    (out / "load_parallel_begin.sql").write_text(
+        "-- Nettoyage avant chargement parallèle (relançable : chaque morceau est une transaction)\n"
+        f"TRUNCATE TABLE {', '.join(TRUNCATE)} RESTART IDENTITY CASCADE;\n", encoding="utf8")
+    end = [f"SELECT setval(pg_get_serial_sequence('\"{t}\"', '{c}'), COALESCE(max({c}), 0) + 1, false) FROM \"{t}\";"
+           for t, c in SERIAL.items() if t in chunks.files]
+    (out / "load_parallel_end.sql").write_text(
+        "-- Séquences recalées après les identifiants explicites, puis statistiques\n"
+        + "\n".join(end) + "\nVACUUM ANALYZE;\n", encoding="utf8")
+    lines = ["#!/bin/sh",
+             "# Généré par make_csv.py --chunk-rows : chargement des morceaux compressés,",
+             "# table par table, morceaux d'une table sur plusieurs sessions psql.",
+             "# COPY … FROM PROGRAM est exécuté par le serveur (fichiers du même hôte,",
+             "# rôle superuser ou pg_execute_server_program).",
+             f"# Exécution :  sh {(out / 'load_parallel.sh').as_posix()} [base] [sessions]",
+             "set -e",
+             'DB="${1:-le_big_match}"',
+             'JOBS="${2:-4}"',
+             f"DIR='{root.as_posix()}'",
+             'PSQL="psql -d $DB -v ON_ERROR_STOP=1 -q"',
+             "load() {   # morceaux triés par nom ; -P 1 = dans l'ordre",
+             '    for f in "$DIR/$1"/*.sql; do printf \'%s\\0\' "$f"; done | xargs -0 -P "$2" -n 1 $PSQL -f',
+             "}",
+             '$PSQL -f "$DIR/load_parallel_begin.sql"']
+    for table in tables:
+        jobs = "1" if table in SEQUENTIAL else '"$JOBS"'
+        lines.append(f"load {table} {jobs}   # {len(chunks.files[table])} morceau(x)")
+    lines += ['$PSQL -f "$DIR/load_parallel_end.sql"', "echo '✅ Import parallèle terminé'"]
+    (out / "load_parallel.sh").write_text("\n".join(lines) + "\n", encoding="utf8")
@@ -32,6 +32,17 @@ CREATE TABLE tag_category (          -- M-N Tag <> Category
     PRIMARY KEY (tag_id, category_id)
 );
 
+/* Fermeture transitive de category.parent_id (générée par make_csv.py) :
+   une ligne par couple ancêtre / descendant, soi-même compris (depth = 0)
+   → sous-arbres et cumuls par jointure simple, sans WITH RECURSIVE */
+CREATE TABLE category_closure (
+    ancestor_id   INTEGER REFERENCES category(category_id) ON DELETE CASCADE,
+    descendant_id INTEGER REFERENCES category(category_id) ON DELETE CASCADE,
+    depth         INTEGER NOT NULL CHECK (depth >= 0),
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+CREATE INDEX category_closure_descendant ON category_closure (descendant_id, depth);
+
 /* =========================
    UTILISATEURS & COMPTES
    ========================= */
@@ -147,6 +158,17 @@ CREATE TABLE notification (
     sent_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+/* =========================
+   RECOMMANDATIONS (top-k de the_match.sql, calculé par recommend.py)
+   ========================= */
+CREATE TABLE event_recommendation (
+    user_id              INTEGER REFERENCES "user"(user_id) ON DELETE CASCADE,
+    rank                 INTEGER NOT NULL,
+    event_id             INTEGER REFERENCES event(event_id) ON DELETE CASCADE,
+    recommendation_index INTEGER NOT NULL,
+    PRIMARY KEY (user_id, rank)
+);
+
 /* =========================
    CONTRAINTES SUPPLÉMENTAIRES
    ========================= */
@@ -0,0 +1,25 @@
+-- digital_trace partitionnée par mois : cible de CSV/digital_trace/attach.sql
+-- (make_csv.py --split-traces). À exécuter après create_tables.sql, sur une
+-- base sans traces : remplace la table simple par une table PARTITION BY
+-- RANGE (ts). La clé primaire d'une table partitionnée doit contenir la clé
+-- de partitionnement → PRIMARY KEY (trace_id, ts) ; la séquence de trace_id
+-- appartient à la table parente. La partition DEFAULT reçoit les lignes des
+-- autres chargeurs (load.sql, load_binary.sql, load_delta.sql…).
+
+-- Exécution :  psql -d le_big_match -f create_traces_partitioned.sql
+BEGIN;
+
+DROP TABLE digital_trace;
+
+CREATE TABLE digital_trace (
+    trace_id   SERIAL,
+    sa_id      INTEGER REFERENCES social_account(sa_id) ON DELETE CASCADE,
+    trace_type TEXT      NOT NULL,
+    ts         TIMESTAMP NOT NULL,
+    payload    JSONB,
+    PRIMARY KEY (trace_id, ts)
+) PARTITION BY RANGE (ts);
+
+CREATE TABLE digital_trace_default PARTITION OF digital_trace DEFAULT;
+
+COMMIT;
@@ -0,0 +1,354 @@
+"""
+dataset.py – Le Big Match
+─────────────────────────
+Données générées **en colonnes** : un tableau NumPy typé par colonne pour
+chaque table de create_tables.sql. Les générateurs de make_csv.py remplissent
+des `Frame`, des writers interchangeables les sérialisent, les moteurs en
+mémoire (likes_graph, match_stream, recommend…) les lisent sans copie ni
+relecture des CSV.
+
+• Types de colonnes : int (int64), float (float64 → NUMERIC), text
+  (StringDType), codes (entiers + libellés : ENUM, textes à peu de valeurs,
+  tirages dans les réservoirs Faker), ts (int64, secondes epoch), date
+  (int32, jours epoch) ; NULL = masque booléen (texte vide = NULL, comme
+  csv / COPY)
+• Writers : CsvWriter (octet pour octet la sortie de csv.writer) et
+  BinaryWriter (COPY binaire) : champs convertis en octets colonne par
+  colonne, positions par cumsum, recopie par scatter NumPy ; GzipWriter (enveloppe un writer : un membre
+  gzip par shard, flux concaténé valide)
+• Aucune ligne Python (tuple / liste) n'est construite : sérialisation par
+  blocs de BLOCK lignes, colonne par colonne
+
+Exemple :
+    ds = Dataset(["likes"]); make_csv.generate(rows, out, dataset=ds)
+    LikesGraph.from_frame(ds["likes"], rows["user"])
+"""
+import gzip
+
+import numpy as np
+from numpy.dtypes import StringDType
+
+from pgcopy import HEADER, SCHEMAS, TRAILER, enc_numeric
+
+STR = StringDType()
+BLOCK = 8192                    # lignes sérialisées par passe (mémoire des index bornée)
+PG_EPOCH_S = 946_684_800        # 2000-01-01 en secondes epoch
+PG_EPOCH_D = 10_957             # … en jours epoch
+
+# type PostgreSQL (pgcopy.SCHEMAS) → type de colonne
+KINDS = {"text": "text", "jsonb": "text", "enum": "codes", "int2": "int", "int4": "int",
+         "numeric": "float", "date": "date", "timestamp": "ts"}
+
+# ───────── COLONNES ──────────
+class Column:
+    """Tableau typé d'une colonne ; `labels` pour les codes, `null` = masque ou None."""
+    __slots__ = ("kind", "data", "labels", "null")
+
+    def __init__(self, kind, data, labels=None, null=None):
+        self.kind, self.data, self.labels, self.null = kind, data, labels, null
+
+    @classmethod
+    def codes(cls, codes, labels, null=None):
+        """Colonne dictionnaire : codes entiers dans `labels`."""
+        labels = np.asarray(labels, dtype=STR)
+        return cls("codes", np.asarray(codes, dtype=np.int8 if len(labels) <= 127 else np.int32), labels, null)
+
+    @classmethod
+    def coerce(cls, kind, values):
+        """Valeurs quelconques (tableau, liste Python, "" = NULL) → Column de `kind`."""
+        if isinstance(values, Column):
+            return values
+        if kind in ("ts", "date"):
+            a = np.asarray(values)
+            unit = "s" if kind == "ts" else "D"
+            if a.dtype.kind != "M":
+                a = np.array(values, dtype=f"datetime64[{unit}]")   # "" → NaT
+            a = a.astype(f"datetime64[{unit}]")
+            null = np.isnat(a)
+            return cls(kind, a.astype(np.int64 if kind == "ts" else np.int32), null=null if null.any() else None)
+        if kind in ("int", "float"):
+            dtype = np.int64 if kind == "int" else np.float64
+            try:
+                return cls(kind, np.asarray(values, dtype=dtype))
+            except (TypeError, ValueError):
+                null = np.array([v is None or v == "" for v in values])
+                return cls(kind, np.array([0 if n else v for v, n in zip(values, null)], dtype=dtype), null=null)
+        if kind == "codes":
+            labels, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+            return cls.codes(codes.reshape(-1), labels)
+        return cls("text", np.asarray(values, dtype=STR))
+
+    def __len__(self):
+        return len(self.data)
+
+    def slice(self, a, b):
+        """Vue des lignes a..b-1 (sans copie)."""
+        return Column(self.kind, self.data[a:b], self.labels, None if self.null is None else self.null[a:b])
+
+    def values(self):
+        """Valeurs décodées (texte, datetime64…) pour un consommateur qui en a besoin."""
+        if self.kind == "codes":
+            return self.labels[self.data]
+        if self.kind == "ts":
+            return self.data.astype("datetime64[s]")
+        if self.kind == "date":
+            return self.data.astype("datetime64[D]")
+        return self.data
+
+def concat_columns(cols):
+    c0 = cols[0]
+    if c0.kind == "codes" and any(c.labels is not c0.labels and not np.array_equal(c.labels, c0.labels) for c in cols):
+        return Column.coerce("codes", np.concatenate([c.values() for c in cols]))
+    null = None
+    if any(c.null is not None for c in cols):
+        null = np.concatenate([np.zeros(len(c), bool) if c.null is None else c.null for c in cols])
+    return Column(c0.kind, np.concatenate([c.data for c in cols]), c0.labels, null)
+
+# ───────── TABLES ──────────
+class Frame:
+    """Lignes d'une table (ou d'un shard) : une Column par colonne, ordre des en-têtes CSV."""
+
+    def __init__(self, table, names, columns):
+        self.table, self.names, self.columns = table, list(names), list(columns)
+
+    @classmethod
+    def of(cls, table, names, *values):
+        """Colonnes depuis les tableaux / listes des générateurs, typées d'après pgcopy.SCHEMAS."""
+        return cls(table, names, [Column.coerce(KINDS[t], v) for t, v in zip(SCHEMAS[table], values)])
+
+    @classmethod
+    def from_rows(cls, table, names, rows):
+        """Générateurs ligne à ligne (petites tables) : transposition une fois."""
+        rows = list(rows)
+        cols = list(zip(*rows)) if rows else [[] for _ in names]
+        return cls.of(table, names, *cols)
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[self.names.index(name)]
+
+    def slice(self, a, b):
+        return Frame(self.table, self.names, [c.slice(a, b) for c in self.columns])
+
+    @classmethod
+    def concat(cls, frames):
+        f0 = frames[0]
+        return cls(f0.table, f0.names, [concat_columns(cs) for cs in zip(*(f.columns for f in frames))])
+
+class Dataset:
+    """Frames conservées en mémoire pendant make_csv.generate(dataset=…) ;
+    `tables` = tables à garder (None = toutes)."""
+
+    def __init__(self, tables=None):
+        self.wanted = None if tables is None else set(tables)
+        self.parts, self.frames = {}, {}
+
+    def wants(self, table):
+        return self.wanted is None or table in self.wanted
+
+    def add(self, frame):
+        self.parts.setdefault(frame.table, []).append(frame)
+        self.frames.pop(frame.table, None)
+
+    def __contains__(self, table):
+        return table in self.parts
+
+    def __getitem__(self, table):
+        if table not in self.frames:
+            parts = self.parts[table]
+            self.frames[table] = parts[0] if len(parts) == 1 else Frame.concat(parts)
+            self.parts[table] = [self.frames[table]]
+        return self.frames[table]
+
+# ───────── WRITERS ──────────
+class Writer:
+    """Sérialisation d'une Frame en octets. `prepare` convertit chaque colonne
+    une fois (libellés de codes compris), `encode_block` assemble BLOCK lignes."""
+    ext = ""
+
+    def header(self, table, names):
+        return b""
+
+    def trailer(self):
+        return b""
+
+    def encode(self, frame):
+        fields = self.prepare(frame)
+        return b"".join(self.encode_block(frame.table, fields, a, min(a + BLOCK, len(frame)))
+                        for a in range(0, len(frame), BLOCK))
+
+def rows_of(values, index, a, b):
+    """Lignes a..b-1 d'un champ préparé (index = codes des colonnes dictionnaire)."""
+    return values[a:b] if index is None else values[index[a:b]]
+
+def quoted(s):
+    """Guillemets là où csv.writer (QUOTE_MINIMAL) en met : , " CR LF."""
+    q = np.zeros(len(s), bool)
+    for c in (",", '"', "\r", "\n"):
+        q |= np.strings.find(s, c) >= 0
+    if q.any():
+        s = s.copy()
+        s[q] = np.strings.add(np.strings.add('"', np.strings.replace(s[q], '"', '""')), '"')
+    return s
+
+def as_bytes(s):
+    """Chaînes → (matrice uint8 (n, largeur) en UTF-8 complétée de zéros, longueurs)."""
+    b = np.strings.encode(s, "utf-8") if s.dtype.kind != "S" else s
+    return b.view(np.uint8).reshape(len(b), b.itemsize), np.strings.str_len(b).astype(np.int64)
+
+_CLOCK = []
+
+def clock():
+    """'HH:MM:SS' de chaque seconde d'une journée, en octets (calculé une fois par processus)."""
+    if not _CLOCK:
+        _CLOCK.append(as_bytes(np.array([f"{h:02}:{m:02}:{s:02}" for h in range(24)
+                                         for m in range(60) for s in range(60)], dtype="S8"))[0])
+    return _CLOCK[0]
+
+def day_bytes(days):
+    """Jours epoch → 'YYYY-MM-DD' en octets (n, 10), formatés une fois par jour distinct."""
+    uniq, inv = np.unique(days, return_inverse=True)
+    return as_bytes(np.datetime_as_string(uniq.astype("datetime64[D]"), unit="D").astype("S10"))[0][inv.reshape(-1)]
+
+def csv_field(col, alone=False):
+    """Octets CSV d'une colonne, identiques au str() que csv.writer appliquerait :
+    (octets uint8 (m, largeur), longueurs (m), index (n) ou None, NULL) — les
+    libellés d'une colonne codes ne sont traités qu'une fois. `alone` : table à
+    une colonne (champ vide écrit "" par csv.writer)."""
+    k, d = col.kind, col.data
+    if k in ("text", "codes"):
+        s = quoted(col.labels if k == "codes" else d)
+        if alone:
+            s = np.where(s == "", '""', s).astype(STR)
+        mat, lens = as_bytes(s)
+        return mat, lens, d if k == "codes" else None, col.null
+    if k == "ts":   # jour (peu de valeurs distinctes) + heure (table des 86 400 secondes)
+        day = d // 86400
+        mat = np.empty((len(d), 19), np.uint8)
+        mat[:, :10], mat[:, 10], mat[:, 11:] = day_bytes(day), ord(" "), clock()[d - day*86400]
+        return mat, np.full(len(d), 19, np.int64), None, col.null
+    if k == "date":
+        return day_bytes(d), np.full(len(d), 10, np.int64), None, col.null
+    mat, lens = as_bytes(d.astype("S"))
+    return mat, lens, None, col.null
+
+def scatter(buf, pos, mat, p):
+    """Copie la ligne i de `mat` (p[i] premiers octets) en buf[pos[i]:]."""
+    w = mat.shape[1]
+    if (p == w).all():   # largeur fixe (horodatages, dates, entiers binaires)
+        buf[pos[:, None] + np.arange(w)] = mat
+        return
+    keep = np.arange(w) < p[:, None]
+    buf[(pos[:, None] + np.arange(w))[keep]] = mat[keep]
+
+class CsvWriter(Writer):
+    """CSV vectorisé : champs en octets recopiés dans un tampon pré-rempli de virgules."""
+    ext = "csv"
+
+    def header(self, table, names):
+        return (",".join(names) + "\r\n").encode("utf8")
+
+    def prepare(self, frame):
+        return [csv_field(c, len(frame.columns) == 1) for c in frame.columns]
+
+    def encode_block(self, table, fields, a, b):
+        parts = []
+        for mat, lens, index, null in fields:
+            m, p = rows_of(mat, index, a, b), rows_of(lens, index, a, b)
+            parts.append((m, p if null is None else np.where(null[a:b], 0, p)))
+        size = sum(p for _, p in parts) + len(parts) + 1   # séparateurs + \r\n
+        end = np.cumsum(size)
+        buf = np.full(int(end[-1]), ord(","), np.uint8)
+        buf[end - 2], buf[end - 1] = ord("\r"), ord("\n")
+        pos = end - size
+        for m, p in parts:
+            scatter(buf, pos, m, p)
+            pos = pos + p + 1
+        return buf.tobytes()
+
+def ragged(items):
+    """Liste d'octets → (matrice uint8 complétée de zéros, longueurs)."""
+    lens = np.array([len(b) for b in items], dtype=np.int64)
+    mat = np.zeros((len(items), int(lens.max(initial=0))), np.uint8)
+    for i, b in enumerate(items):
+        mat[i, :len(b)] = np.frombuffer(b, np.uint8)
+    return mat, lens
+
+def binary_field(col, pgtype):
+    """Champ COPY d'une colonne : (octets uint8 (m, largeur), longueurs (m),
+    index (n) ou None, NULL (n) ou None) ; m = valeurs distinctes pour les codes
+    et les NUMERIC, sinon une ligne par valeur."""
+    k, d, null = col.kind, col.data, col.null
+    if k in ("text", "codes"):
+        s = col.labels if k == "codes" else d
+        if pgtype == "jsonb":
+            s = np.strings.add("\x01", s)
+        mat, lens = as_bytes(s)
+        lens[lens == (1 if pgtype == "jsonb" else 0)] = -1   # texte vide = NULL
+        return mat, lens, d if k == "codes" else None, null
+    if k == "float":   # NUMERIC : encodage Decimal par valeur distincte
+        uniq, inv = np.unique(d, return_inverse=True)
+        mat, lens = ragged([enc_numeric(v) for v in uniq.tolist()])
+        return mat, lens, inv.reshape(-1), null
+    if k == "ts":
+        v = ((d - PG_EPOCH_S) * 1_000_000).astype(">i8")
+    elif k == "date":
+        v = (d - PG_EPOCH_D).astype(">i4")
+    else:
+        v = d.astype(">i2" if pgtype == "int2" else ">i4")
+    w = v.dtype.itemsize
+    return v.view(np.uint8).reshape(len(v), w), np.full(len(v), w, np.int64), None, null
+
+class BinaryWriter(Writer):
+    """COPY binaire vectorisé (même sortie que pgcopy.BinaryWriter ligne à ligne)."""
+    ext = "bin"
+
+    def header(self, table, names):
+        return HEADER
+
+    def trailer(self):
+        return TRAILER
+
+    def prepare(self, frame):
+        return [binary_field(c, t) for c, t in zip(frame.columns, SCHEMAS[frame.table])]
+
+    def encode_block(self, table, fields, a, b):
+        n, parts = b - a, []
+        for mat, lens, index, null in fields:
+            m, l = rows_of(mat, index, a, b), rows_of(lens, index, a, b)
+            if null is not None:
+                l = np.where(null[a:b], -1, l)
+            parts.append((m, l, np.maximum(l, 0)))
+        size = 2 + sum(4 + p for _, _, p in parts)
+        start = np.cumsum(size) - size
+        buf = np.empty(int(size.sum()), np.uint8)
+        buf[start[:, None] + np.arange(2)] = np.array([len(fields)], ">i2").view(np.uint8)
+        pos = start + 2
+        for m, l, p in parts:
+            buf[pos[:, None] + np.arange(4)] = l.astype(">i4").view(np.uint8).reshape(n, 4)
+            pos = pos + 4
+            scatter(buf, pos, m, p)
+            pos = pos + p
+        return buf.tobytes()
+
+class GzipWriter(Writer):
+    """Enveloppe gzip d'un writer : chaque appel produit un membre gzip complet."""
+
+    def __init__(self, inner, level=6):
+        self.inner, self.level = inner, level
+        self.ext = inner.ext + ".gz"
+
+    def header(self, table, names):
+        return gzip.compress(self.inner.header(table, names), self.level, mtime=0)
+
+    def trailer(self):
+        t = self.inner.trailer()
+        return gzip.compress(t, self.level, mtime=0) if t else b""
+
+    def encode(self, frame):
+        return gzip.compress(self.inner.encode(frame), self.level, mtime=0)
+
+WRITERS = {"csv": CsvWriter(), "binary": BinaryWriter(),
+           "csv.gz": GzipWriter(CsvWriter()), "binary.gz": GzipWriter(BinaryWriter())}
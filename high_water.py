@@ -0,0 +1,202 @@
+"""
+high_water.py – Le Big Match
+────────────────────────────
+Hauts niveaux d'un jeu généré (manifest.json à côté des fichiers) : lignes
+par table (= dernier identifiant SERIAL), date de référence `now`, graine
+maître et domaines de tirage des couples → `make_csv.py --append` ne produit
+que le delta, avec des clés étrangères valides vers anciennes et nouvelles
+lignes, sans relire les CSV existants.
+
+• Domaine = ensemble de couples tiré sans remise par sa propre permutation ;
+  chaque lot ajoute les couples touchant un nouvel utilisateur / événement,
+  les anciens domaines reprennent à leur position → aucun doublon de clé
+  primaire (likes, participation)
+• Une génération complète est un ajout sur un état vide : mêmes shards,
+  mêmes graines, même sortie qu'avant
+• Abonnements conservés en tableaux (subscriptions.npz) pour le contrôle des
+  annulations de likes des anciens utilisateurs
+• Créneaux des événements à venir (events.npz : lieu, début, fin, event_id) :
+  les événements d'un lot sont placés autour des anciens (scheduling.py)
+• Rappels pas encore échus (reminders.npz) : émis par le lot qui atteint
+  leur échéance (notifier.py)
+"""
+import csv, datetime, json
+
+import numpy as np
+
+from notifier import WINDOW, derive, load_events, load_participation
+from scheduling import PlaceIndex
+from unique_keys import frame_pairs, grid_pairs
+
+MANIFEST = "manifest.json"
+SUBSCRIPTIONS = "subscriptions.npz"
+EVENTS = "events.npz"
+REMINDERS = "reminders.npz"
+
+class Domain:
+    """Couples d'un lot, indexés 0..size-1 puis permutés (graine = `tag`).
+
+    kind "frame" (likes) : args (lo, n) → couples (a, b), a ≠ b dans 1..n,
+    dont au moins un > lo. kind "rect" (participation) : args (u0, u1, e0, e1)
+    → users u0+1..u1 × events e0+1..e1."""
+
+    def __init__(self, tag, kind, args, used=0):
+        self.tag, self.kind, self.args, self.used = tag, kind, tuple(args), used
+
+    @property
+    def size(self):
+        if self.kind == "frame":
+            lo, n = self.args
+            return n*(n-1) - lo*(lo-1)
+        u0, u1, e0, e1 = self.args
+        return (u1-u0) * (e1-e0)
+
+    def key(self):
+        """Description picklable transmise aux shards."""
+        return self.tag, self.kind, self.args
+
+    def decode(self, k):
+        if self.kind == "frame":
+            return frame_pairs(k, *self.args)
+        u0, _, e0, e1 = self.args
+        u, e = grid_pairs(k, e1-e0)
+        return u + u0, e + e0
+
+    def to_json(self):
+        return {"tag": self.tag, "kind": self.kind, "args": list(self.args), "used": self.used}
+
+def allocate(domains, k):
+    """Répartit k nouveaux tirages entre les domaines au prorata de leur
+    capacité restante ; renvoie [(domaine, début, fin)] en index de permutation."""
+    free = [d.size - d.used for d in domains]
+    total = sum(free)
+    if k > total:
+        return None
+    out, acc = [], 0
+    for d, f in zip(domains, free):
+        x = k*(acc+f)//total - k*acc//total if total else 0
+        acc += f
+        if x:
+            out.append((d, d.used, d.used + x))
+            d.used += x
+    return out
+
+class HighWater:
+    """État cumulé : `rows` par table, `now` du dernier lot, domaines de couples."""
+
+    def __init__(self, seed, now=None, rows=None, batch=-1, likes=(), participation=()):
+        self.seed, self.now, self.batch = seed, now, batch
+        self.rows = dict(rows or {})
+        self.likes, self.participation = list(likes), list(participation)
+
+    def count(self, table):
+        return self.rows.get(table, 0)
+
+    def grow(self, delta, now):
+        """État après ajout de `delta` lignes par table : nouveaux domaines,
+        tirages répartis ; renvoie (état, {"likes": [...], "participation": [...]})."""
+        new = HighWater(self.seed, now, self.rows, self.batch + 1,
+                        [Domain(d.tag, d.kind, d.args, d.used) for d in self.likes],
+                        [Domain(d.tag, d.kind, d.args, d.used) for d in self.participation])
+        for table, n in delta.items():
+            new.rows[table] = self.count(table) + n
+        u0, u1 = self.count("user"), new.count("user")
+        e0, e1 = self.count("event"), new.count("event")
+        suffix = f"@{new.batch}" if new.batch else ""   # lot 0 : graines historiques
+        if u1 > u0:
+            new.likes.append(Domain("likes" + suffix, "frame", (u0, u1)))
+        if u1 > u0 and e1:
+            new.participation.append(Domain("participation" + suffix, "rect", (u0, u1, 0, e1)))
+        if u0 and e1 > e0:
+            new.participation.append(Domain(f"participation{suffix}/old", "rect", (0, u0, e0, e1)))
+        if u1 < 2:
+            raise SystemExit("il faut au moins 2 utilisateurs (contrainte no_self_like)")
+        shards = {}
+        for table, domains in (("likes", new.likes), ("participation", new.participation)):
+            shards[table] = allocate(domains, delta.get(table, 0))
+            if shards[table] is None:
+                free = sum(d.size - d.used for d in domains)
+                raise SystemExit(f"{table} : {delta[table]:,} lignes demandées, {free:,} couples distincts encore libres")
+        return new, shards
+
+    # ───────── PERSISTANCE ──────────
+    def save(self, out, subs, slots=None, reminders=None):
+        """manifest.json, abonnements et, si fournis, créneaux `slots` = (lieu,
+        début, fin, event_id) en secondes, réduits aux événements pas encore
+        terminés, et rappels en attente `reminders` = (due, user, kind, event)."""
+        manifest = {"seed": self.seed, "now": self.now.isoformat(), "batch": self.batch, "rows": self.rows,
+                    "likes": [d.to_json() for d in self.likes],
+                    "participation": [d.to_json() for d in self.participation]}
+        (out / MANIFEST).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf8")
+        np.savez(out / SUBSCRIPTIONS, **{k: np.frombuffer(getattr(subs, k), dtype=np.int_)
+                                         for k in ("uid", "start", "end")})
+        if slots is not None:
+            live = slots[2] > np.datetime64(self.now, "s").astype(np.int64)
+            np.savez(out / EVENTS, **{k: a[live] for k, a in zip(("place", "start", "end", "event"), slots)})
+        if reminders is not None:
+            np.savez(out / REMINDERS, **dict(zip(("due", "user", "kind", "event"), reminders)))
+
+    @classmethod
+    def load(cls, out):
+        path = out / MANIFEST
+        if not path.exists():
+            raise SystemExit(f"{path} introuvable : générer d'abord le jeu complet avec make_csv.py")
+        m = json.loads(path.read_text(encoding="utf8"))
+        domains = lambda key: [Domain(d["tag"], d["kind"], d["args"], d["used"]) for d in m[key]]
+        return cls(m["seed"], datetime.datetime.fromisoformat(m["now"]), m["rows"], m["batch"],
+                   domains("likes"), domains("participation"))
+
+def load_subscriptions(out, subs, batch=0):
+    """Remplit `subs` (make_csv.Subscriptions) avec les abonnements existants :
+    subscriptions.npz, ou relecture de subscription.csv si le jeu n'a encore
+    reçu aucun lot (`batch` = n° du dernier lot)."""
+    path = out / SUBSCRIPTIONS
+    if path.exists():
+        with np.load(path) as z:
+            for k in ("uid", "start", "end"):
+                getattr(subs, k).frombytes(z[k].astype(np.int_).tobytes())
+        return subs
+    if batch:
+        raise SystemExit(f"{path} introuvable : abonnements des lots précédents perdus")
+    with open(out / "subscription.csv", newline="", encoding="utf8") as f:
+        r = csv.reader(f)
+        next(r)
+        for uid, start, end in r:
+            subs.add(int(uid), datetime.date.fromisoformat(start), datetime.date.fromisoformat(end) if end else None)
+    return subs
+
+def load_bookings(out, batch=0):
+    """Créneaux occupés par les événements existants (scheduling.PlaceIndex) :
+    events.npz, ou relecture de event.csv si le jeu n'a encore reçu aucun lot."""
+    path = out / EVENTS
+    if path.exists():
+        with np.load(path) as z:
+            return PlaceIndex(z["place"], z["start"], z["end"], z["event"])
+    if batch:
+        raise SystemExit(f"{path} introuvable : créneaux des lots précédents perdus")
+    return PlaceIndex.from_csv(out / "event.csv")
+
+def load_reminders(out, batch, since):
+    """Rappels (due, user, kind, event) pas encore échus à `since` : reminders.npz,
+    ou dérivés de event.csv / participation.csv si le jeu n'a encore reçu aucun lot."""
+    path = out / REMINDERS
+    if path.exists():
+        with np.load(path) as z:
+            return tuple(z[k] for k in ("due", "user", "kind", "event"))
+    if batch:
+        raise SystemExit(f"{path} introuvable : rappels des lots précédents perdus")
+    _, starts = load_events(out / "event.csv")
+    due, user, kind, event = derive(starts, *load_participation(out / "participation.csv"))
+    late = -(-due // WINDOW) * WINDOW > np.datetime64(since, "s").astype(np.int64)
+    return due[late], user[late], kind[late], event[late]
+
+def write_expected(path, old):
+    """high_water.csv du delta : dernier identifiant attendu en base par table,
+    contrôlé par load_delta.sql avant tout chargement."""
+    ids = [("user", "user_id"), ("place", "place_id"), ("event", "event_id"), ("subscription", "sub_id"),
+           ("social_account", "sa_id"), ("notification", "notification_id")]
+    with open(path, "w", newline="", encoding="utf8") as f:
+        w = csv.writer(f)
+        w.writerow(["table_name", "id_column", "last_id"])
+        for table, col in ids:
+            w.writerow([table, col, old.count(table)])
@@ -0,0 +1,186 @@
+"""
+instrument.py – Le Big Match
+────────────────────────────
+Instrumentation de make_csv.py : où passe le temps d'une génération longue ?
+
+• Par shard : temps « generate » (production des lignes : Faker, NumPy,
+  permutations…) et « encode » (csv.writer / COPY binaire), sections nommées
+  (`with section("subscription_check"):`), lignes et octets produits
+• Options : pic d'allocations Python (tracemalloc), capture cProfile
+  (fichiers .prof fusionnés par table), échantillonnage de pile par
+  SIGPROF (piles repliées, format flamegraph / speedscope)
+• Agrégation par table dans le processus parent → rapport JSON structuré,
+  callback de progression appelé après chaque shard
+
+Les mesures d'un shard sont prises dans le worker qui l'exécute puis
+renvoyées avec ses octets : rien n'est partagé entre processus.
+"""
+import cProfile, json, os, pstats, resource, signal, sys, time, tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+class Options:
+    """Instrumentation demandée (transmise à chaque shard, donc picklable)."""
+
+    def __init__(self, alloc=False, profile_dir=None, sample=0.0):
+        self.alloc = alloc                # pic tracemalloc par shard
+        self.profile_dir = profile_dir    # dossier des .prof (cProfile) ou None
+        self.sample = sample              # période d'échantillonnage (s), 0 = désactivé
+
+# ───────── MESURES D'UN SHARD (processus worker) ──────────
+class Recorder:
+    """Mesures du shard en cours : sections chronométrées, profilage optionnel."""
+
+    def __init__(self, options=None, name=""):
+        self.options, self.name = options or Options(), name
+        self.sections = defaultdict(float)
+        self.stacks = Counter()
+        self.profiler = None
+        self.root = None   # cadre de l'appelant de begin() : piles échantillonnées tronquées là
+
+    def start(self):
+        o = self.options
+        if o.alloc:
+            tracemalloc.start()
+        if o.sample:
+            signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(signal.ITIMER_PROF, o.sample, o.sample)
+        if o.profile_dir:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def stop(self):
+        """Arrête les captures ; renvoie le résultat picklable du shard."""
+        o, out = self.options, {"sections": dict(self.sections)}
+        if self.profiler:
+            self.profiler.disable()
+            path = Path(o.profile_dir) / f"{self.name}.prof"
+            self.profiler.dump_stats(path)
+            out["profile"] = str(path)
+        if o.sample:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            out["stacks"] = dict(self.stacks)
+        if o.alloc:
+            out["alloc_peak"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        out["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return out
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            name = os.path.basename(frame.f_code.co_filename).removesuffix(".py")
+            stack.append(f"{name}:{frame.f_code.co_name}")
+            if frame is self.root:
+                break
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+CURRENT = Recorder()   # remplacé au début de chaque shard
+
+@contextmanager
+def section(name):
+    """Chronomètre une section du shard en cours (cumulé par nom)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        CURRENT.sections[name] += time.perf_counter() - t0
+
+def begin(options, name):
+    global CURRENT
+    CURRENT = Recorder(options, name)
+    CURRENT.root = sys._getframe(1)
+    return CURRENT.start()
+
+# ───────── AGRÉGATION (processus parent) ──────────
+class Report:
+    """Mesures agrégées par table, sections du parent, rapport JSON."""
+
+    def __init__(self, options=None):
+        self.options = options or Options()
+        self.tables = {}
+        self.parent = defaultdict(float)
+        self.t0 = time.perf_counter()
+
+    @contextmanager
+    def section(self, name):
+        """Étape exécutée dans le processus parent (réservoirs, index…)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.parent[name] += time.perf_counter() - t0
+
+    def add(self, table, rows, nbytes, secs, result):
+        t = self.tables.setdefault(table, {"rows": 0, "bytes": 0, "shards": 0, "secs": 0.0,
+                                           "sections": defaultdict(float), "alloc_peak": 0,
+                                           "max_rss_kb": 0, "profiles": [], "stacks": Counter()})
+        t["rows"] += rows; t["bytes"] += nbytes; t["shards"] += 1; t["secs"] += secs
+        for k, v in result["sections"].items(): t["sections"][k] += v
+        t["alloc_peak"] = max(t["alloc_peak"], result.get("alloc_peak", 0))
+        t["max_rss_kb"] = max(t["max_rss_kb"], result["max_rss_kb"])
+        if "profile" in result: t["profiles"].append(result["profile"])
+        t["stacks"].update(result.get("stacks", {}))
+        return t
+
+    def finish(self):
+        """Fusionne les profils par table ; renvoie le rapport (dict JSON).
+        Les sections sont imbriquées : « generate » inclut ses sous-sections."""
+        tables = {}
+        for table, t in self.tables.items():
+            entry = {k: t[k] for k in ("rows", "bytes", "shards", "max_rss_kb")}
+            entry["secs"] = round(t["secs"], 4)
+            entry["rows_per_s"] = round(t["rows"] / t["secs"]) if t["secs"] else None
+            entry["sections"] = {k: round(v, 4) for k, v in sorted(t["sections"].items(), key=lambda kv: -kv[1])}
+            if self.options.alloc:
+                entry["alloc_peak_kb"] = t["alloc_peak"] // 1024
+            if t["profiles"]:
+                merged = Path(self.options.profile_dir) / f"{table}.prof"
+                stats = pstats.Stats(*t["profiles"])
+                stats.dump_stats(merged)
+                for p in t["profiles"]: os.remove(p)
+                entry["profile"] = str(merged)
+                entry["top_functions"] = top_functions(stats)
+            if t["stacks"]:
+                folded = Path(self.options.profile_dir or ".") / f"{table}.folded"
+                folded.write_text("".join(f"{s} {n}\n" for s, n in t["stacks"].most_common()), encoding="utf8")
+                entry["samples"] = str(folded)
+            tables[table] = entry
+        return {"wall_s": round(time.perf_counter() - self.t0, 3),
+                "parent_sections": {k: round(v, 4) for k, v in self.parent.items()},
+                "tables": tables}
+
+    def write(self, path):
+        report = self.finish()
+        Path(path).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf8")
+        return report
+
+def top_functions(stats, n=10):
+    """n fonctions les plus coûteuses en temps propre : (fonction, appels, secondes)."""
+    rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][2])[:n]
+    return [{"function": f"{Path(f).stem}:{line}:{name}", "calls": nc, "tottime": round(tt, 4)}
+            for (f, line, name), (_, nc, tt, _, _) in rows]
+
+def print_report(report, stream=sys.stdout):
+    """Résumé lisible du rapport : part de chaque section dans le temps des shards."""
+    stream.write("instrumentation (secondes cumulées sur les shards) :\n")
+    for name, secs in report["parent_sections"].items():
+        stream.write(f"  [parent] {name:<22} {secs:9.2f} s\n")
+    for table, t in report["tables"].items():
+        parts = "  ".join(f"{k} {v:.2f} s ({v/t['secs']:.0%})" for k, v in t["sections"].items() if t["secs"])
+        extra = f"  alloc max {t['alloc_peak_kb']:,} Kio" if "alloc_peak_kb" in t else ""
+        stream.write(f"  {table:<15} {t['secs']:9.2f} s  {parts}{extra}\n")
+        for f in t.get("top_functions", [])[:5]:
+            stream.write(f"      {f['tottime']:8.2f} s {f['calls']:>12,}×  {f['function']}\n")
+
+def print_progress(event, stream=sys.stderr):
+    """Callback de progression par défaut : une ligne réécrite par shard."""
+    stream.write(f"\r  {event['table']:<15} shard {event['shard']:>6,}/{event['shards']:<6,} "
+                 f"{event['rows']:>14,} lignes {event['rows_per_s']:>12,.0f} lignes/s "
+                 f"{event['elapsed']:9.1f} s")
+    if event["shard"] == event["shards"]:
+        stream.write("\n")
+    stream.flush()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+likes_graph.py – Le Big Match
+─────────────────────────────
+Graphe des likes en mémoire, format CSR (compressed sparse row), et calcul
+vectorisé des requêtes « likes » de requete.sql — pour le reporting hors
+ligne et le contrôle croisé des résultats de la base.
+
+• Adjacence directe (source → cibles) et inverse (cible → sources)
+• Par arête : value (like / nope), annulée ?, created_at / canceled_at en int64
+  (secondes epoch, NaT = NULL)
+• ~30 octets par arête : 100 M de likes ≈ 3 Go
+
+Requêtes couvertes (même sémantique que le SQL) :
+    #2  likes reçus par utilisateur          → likes_received()
+    #3  likes réciproques                    → reciprocal()
+    #4  utilisateurs n'ayant jamais liké     → never_liked()
+    #10 / #11  « a liké tout le monde »      → liked_everyone()
+    #14 top 5 par mois des likes reçus       → monthly_top()
+
+Exécution :
+    python likes_graph.py CSV/likes.csv --users CSV/user.csv
+"""
+import argparse, csv, sys, time
+
+import numpy as np
+
+NULL_TS = np.iinfo(np.int64).min   # NaT converti en int64
+CHUNK = 1_000_000
+
+class LikesGraph:
+    """Likes indexés par source (CSR direct) et par cible (CSR inverse).
+
+    Les arêtes sont triées par (source, cible) : `indices`, `like`, `canceled`,
+    `created_at`, `canceled_at` sont alignés sur cet ordre. `rev_edge` donne,
+    pour chaque cible, les numéros d'arêtes entrantes. `n_users` = COUNT(*)
+    de "user" (ids 1..n_users) : ni #4 ni #10 / #11 ne peuvent le déduire des
+    likes (utilisateurs sans like)."""
+
+    def __init__(self, src, tgt, like, created_at, canceled_at, n_users):
+        src, tgt = np.asarray(src, dtype=np.int64), np.asarray(tgt, dtype=np.int64)
+        self.n_users = int(n_users)
+        if max(src.max(initial=0), tgt.max(initial=0)) > self.n_users:
+            raise ValueError(f"user_id hors de 1..{self.n_users} : n_users doit être le nombre d'utilisateurs")
+        n = np.int64(self.n_users + 1)
+        order = np.argsort(src * n + tgt)   # clé unique (clé primaire de likes)
+        idx = np.int32 if self.n_users < 2**31 else np.int64
+        self.src = src[order].astype(idx)
+        self.indices = tgt[order].astype(idx)
+        del src, tgt
+        self.like = np.asarray(like, dtype=bool)[order]
+        self.created_at = np.asarray(created_at, dtype=np.int64)[order]
+        self.canceled_at = np.asarray(canceled_at, dtype=np.int64)[order]
+        self.canceled = self.canceled_at != NULL_TS
+        # indptr[u] .. indptr[u+1] : arêtes sortantes de u (ids 1..n_users)
+        self.indptr = np.r_[0, np.cumsum(np.bincount(self.src, minlength=self.n_users + 1))]
+        self.rev_edge = np.argsort(self.indices.astype(np.int64) * n + self.src) \
+            .astype(np.int32 if len(order) < 2**31 else np.int64)
+        self.rev_indptr = np.r_[0, np.cumsum(np.bincount(self.indices, minlength=self.n_users + 1))]
+
+    def __len__(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_csv(cls, path, n_users):
+        """Charge un likes.csv par blocs (colonnes converties en NumPy)."""
+        parts = []
+        with open(path, newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            next(r)
+            while True:
+                rows = [row for _, row in zip(range(CHUNK), r)]
+                if not rows:
+                    break
+                s, t, v, c, x = zip(*rows)
+                parts.append((np.array(s, dtype=np.int64), np.array(t, dtype=np.int64),
+                              np.array(v) == "like",
+                              np.array(c, dtype="datetime64[s]").astype(np.int64),
+                              np.array(x, dtype="datetime64[s]").astype(np.int64)))
+        if not parts:
+            return cls([], [], [], [], [], n_users)
+        return cls(*(np.concatenate(col) for col in zip(*parts)), n_users=n_users)
+
+    @classmethod
+    def from_frame(cls, frame, n_users):
+        """Likes déjà en colonnes (dataset.Frame, ex. make_csv.generate(dataset=…)) :
+        aucun parsing, tableaux int64 repris tels quels."""
+        value, canceled = frame["value"], frame["canceled_at"]
+        canceled_at = canceled.data if canceled.null is None else np.where(canceled.null, NULL_TS, canceled.data)
+        return cls(frame["source_user_id"].data, frame["target_user_id"].data,
+                   value.labels[value.data] == "like", frame["created_at"].data, canceled_at, n_users=n_users)
+
+    # ───────── ACCÈS ──────────
+    def out_edges(self, u):
+        """Tranche des arêtes sortantes de u (index dans les tableaux alignés)."""
+        return slice(self.indptr[u], self.indptr[u + 1])
+
+    def liked_by(self, u):
+        """Cibles likées (value = like) par u."""
+        e = self.out_edges(u)
+        return self.indices[e][self.like[e]]
+
+    def likers_of(self, u):
+        """Sources ayant liké (value = like) u."""
+        e = self.rev_edge[self.rev_indptr[u]:self.rev_indptr[u + 1]]
+        return self.src[e][self.like[e]]
+
+    # ───────── REQUÊTES requete.sql ──────────
+    def likes_received(self):
+        """#2 : (user_id, likes reçus) par ordre décroissant ; comme le WHERE
+        du SQL filtre value = 'like', les utilisateurs à 0 n'apparaissent pas."""
+        counts = np.bincount(self.indices[self.like], minlength=self.n_users + 1)
+        users = np.flatnonzero(counts)
+        order = np.argsort(-counts[users], kind="stable")
+        return users[order], counts[users][order]
+
+    def reciprocal(self, active_only=False):
+        """#3 : couples (a, b), a < b, qui se sont likés mutuellement.
+        active_only=True : sans like annulé (sémantique de mv_matches)."""
+        keep = self.like & ~self.canceled if active_only else self.like
+        n = np.int64(self.n_users + 1)
+        keys = self.src[keep].astype(np.int64) * n + self.indices[keep]   # triées
+        a, b = self.src[keep], self.indices[keep]
+        half = a < b
+        back = b[half].astype(np.int64) * n + a[half]
+        pos = np.minimum(np.searchsorted(keys, back), max(len(keys) - 1, 0))
+        hit = keys[pos] == back if len(keys) else np.zeros(0, dtype=bool)
+        return a[half][hit], b[half][hit]
+
+    def never_liked(self):
+        """#4 : utilisateurs sans aucune ligne sortante dans likes."""
+        return np.flatnonzero(np.diff(self.indptr)[1:] == 0) + 1
+
+    def liked_everyone(self, only_likes=True):
+        """#10 (only_likes=True) : value = 'like' vers tous les autres utilisateurs.
+        #11 (only_likes=False) : une ligne, quelle que soit value, vers tous."""
+        src = self.src[self.like] if only_likes else self.src
+        deg = np.bincount(src, minlength=self.n_users + 1)
+        return np.flatnonzero(deg == self.n_users - 1)
+
+    def monthly_top(self, k=5):
+        """#14 : par mois calendaire (toutes années confondues), utilisateurs dont
+        le RANK() sur le nombre de likes reçus (toutes valeurs) est ≤ k.
+        Renvoie (mois, user_id, likes_reçus) ; created_at NULL ignorés."""
+        ok = self.created_at != NULL_TS
+        month = self.created_at[ok].astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+        n = np.int64(self.n_users + 1)
+        keys, counts = np.unique(month * n + self.indices[ok], return_counts=True)
+        months, users = np.divmod(keys, n)
+        out = []
+        for m in range(1, 13):
+            sel = months == m
+            c = counts[sel]
+            if not len(c):
+                continue
+            # rang ≤ k ⇔ au plus k-1 valeurs strictement supérieures ⇔ c ≥ k-ième plus grande
+            threshold = np.partition(c, len(c) - k)[len(c) - k] if len(c) > k else c.min()
+            top = np.flatnonzero(c >= threshold)
+            top = top[np.argsort(-c[top], kind="stable")]
+            out.append((np.full(len(top), m), users[sel][top], c[top]))
+        if not out:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.int64)
+        return tuple(np.concatenate(col) for col in zip(*out))
+
+# ───────── RAPPORT ──────────
+def load_pseudos(path):
+    with open(path, newline="", encoding="utf8") as f:
+        r = csv.reader(f)
+        next(r)
+        return [""] + [row[0] for row in r]   # user_id = rang dans user.csv
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Requêtes likes de requete.sql, calculées hors base.")
+    ap.add_argument("likes", help="chemin de likes.csv")
+    ap.add_argument("--users", required=True, help="user.csv : nombre d'utilisateurs et pseudos")
+    ap.add_argument("--top", type=int, default=10, help="lignes affichées par requête")
+    args = ap.parse_args(argv)
+    pseudos = load_pseudos(args.users)
+    t0 = time.perf_counter()
+    g = LikesGraph.from_csv(args.likes, len(pseudos) - 1)
+    print(f"{len(g):,} likes, {g.n_users:,} utilisateurs chargés en {time.perf_counter()-t0:.2f} s")
+    name = lambda u: pseudos[u]
+
+    t0 = time.perf_counter()
+    users, counts = g.likes_received()
+    a, b = g.reciprocal()
+    never = g.never_liked()
+    everyone10, everyone11 = g.liked_everyone(), g.liked_everyone(only_likes=False)
+    months, top_users, top_counts = g.monthly_top()
+    print(f"requêtes calculées en {time.perf_counter()-t0:.2f} s")
+
+    print(f"\n#2  likes reçus ({len(users):,} utilisateurs)")
+    for u, c in zip(users[:args.top], counts[:args.top]): print(f"    {name(u):<30} {c}")
+    print(f"#3  likes réciproques : {len(a):,} couples")
+    for x, y in zip(a[:args.top], b[:args.top]): print(f"    {name(x)} ↔ {name(y)}")
+    print(f"#4  jamais liké : {len(never):,} utilisateurs")
+    print(f"#10 a liké tout le monde : {len(everyone10):,} | #11 (toute valeur) : {len(everyone11):,}")
+    print(f"#14 top 5 mensuel : {len(months):,} lignes")
+    for m, u, c in zip(months[:args.top], top_users[:args.top], top_counts[:args.top]):
+        print(f"    {m:>2} {name(u):<30} {c}")
+
+if __name__ == "__main__":
+    sys.exit(main())
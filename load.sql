@@ -9,6 +9,7 @@ BEGIN;
 -- Nettoyage complet pour éviter les problèmes de séquence après un précédent ROLLBACK
 TRUNCATE TABLE 
     tag_category,
+    category_closure,
     tag,
     category,
     place,
@@ -18,7 +19,9 @@ TRUNCATE TABLE
     digital_trace,
     likes,
     participation,
-    tag_assignment,
+    tag_user_assignment,
+    tag_event_assignment,
+    tag_place_assignment,
     notification,
     "user"
 RESTART IDENTITY CASCADE;
@@ -46,16 +49,12 @@ INSERT INTO place(name,address,city,country) SELECT * FROM tmp_place;
 \copy tag(type) FROM 'CSV/tag.csv' CSV HEADER
 
 /* ================================================================
-   4. CATEGORIES  (racines d'abord, enfants ensuite)
+   4. CATEGORIES  (fichier par niveaux : parent_id < category_id)
    ================================================================*/
-CREATE TEMP TABLE tmp_category (LIKE category INCLUDING ALL);
-ALTER TABLE tmp_category DROP COLUMN category_id;
-\copy tmp_category(name,parent_id) FROM 'CSV/category.csv' CSV HEADER
--- parent_id NULL (racines) -> parents présents -> enfants
-INSERT INTO category(name,parent_id)
-SELECT name,parent_id
-FROM   tmp_category
-ORDER  BY parent_id IS NOT NULL, parent_id;
+-- les SERIAL suivent l'ordre du fichier : category_closure et tag_category
+-- reprennent ces identifiants, aucun réordonnancement
+\copy category(name,parent_id) FROM 'CSV/category.csv' CSV HEADER
+\copy category_closure(ancestor_id,descendant_id,depth) FROM 'CSV/category_closure.csv' CSV HEADER
 
 /* 4b. TAG_CATEGORY  (après que tags et catégories existent) */
 \copy tag_category(tag_id,category_id) FROM 'CSV/tag_category.csv' CSV HEADER
@@ -95,35 +94,23 @@ ALTER TABLE tmp_dt DROP COLUMN trace_id;
 INSERT INTO digital_trace(sa_id,trace_type,ts,payload) SELECT * FROM tmp_dt;
 
 /* ================================================================
-   9. LIKES
+   9. LIKES  (couples (source,target) uniques par construction : COPY direct)
    ================================================================*/
-CREATE TEMP TABLE tmp_like (LIKE likes INCLUDING ALL);
-ALTER TABLE tmp_like DROP CONSTRAINT IF EXISTS tmp_like_pkey;
-\copy tmp_like(source_user_id,target_user_id,value,created_at,canceled_at) FROM 'CSV/likes.csv' CSV HEADER
-INSERT INTO likes
-SELECT DISTINCT ON (source_user_id, target_user_id)
-    source_user_id, target_user_id, value, created_at, canceled_at
-FROM tmp_like
-ORDER BY source_user_id, target_user_id, created_at;
+\copy likes(source_user_id,target_user_id,value,created_at,canceled_at) FROM 'CSV/likes.csv' CSV HEADER
 
 /* ================================================================
-   10. PARTICIPATION
+   10. PARTICIPATION  (couples (user,event) uniques par construction)
    ================================================================*/
-CREATE TEMP TABLE tmp_part (LIKE participation INCLUDING ALL);
-ALTER TABLE tmp_part DROP CONSTRAINT IF EXISTS tmp_part_pkey;
-\copy tmp_part(user_id,event_id,status,created_at) FROM 'CSV/participation.csv' CSV HEADER
-INSERT INTO participation
-SELECT DISTINCT ON (user_id, event_id)
-    user_id, event_id, status, created_at
-FROM tmp_part
-ORDER BY user_id, event_id, created_at;
+\copy participation(user_id,event_id,status,created_at) FROM 'CSV/participation.csv' CSV HEADER
 
 /* ================================================================
-   11. TAG ASSIGNMENT
+   11. TAG ASSIGNMENT  (→ tag_user / tag_event / tag_place_assignment)
    ================================================================*/
-CREATE TEMP TABLE tmp_ta (LIKE tag_assignment INCLUDING ALL);
+CREATE TEMP TABLE tmp_ta (tag_id INTEGER, target_type target_kind, target_id INTEGER);
 \copy tmp_ta(tag_id,target_type,target_id) FROM 'CSV/tag_assignment.csv' CSV HEADER
-INSERT INTO tag_assignment SELECT * FROM tmp_ta;
+INSERT INTO tag_user_assignment  SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'user';
+INSERT INTO tag_event_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'event';
+INSERT INTO tag_place_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'place';
 
 /* ================================================================
    12. NOTIFICATION
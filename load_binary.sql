@@ -0,0 +1,75 @@
+-- Importe les fichiers COPY binaires générés par `make_csv.py --format binary`
+-- **directement dans les tables finales** : pas de parsing CSV ni de double
+-- écriture via tables temporaires (sauf répartition de tag_assignment dans
+-- les 3 tables spécifiques).
+
+-- Exécution :  psql -d le_big_match -f load_binary.sql
+\echo '==> Import binaire Le Big Match'
+
+BEGIN;
+
+TRUNCATE TABLE
+    tag_category,
+    category_closure,
+    tag,
+    category,
+    place,
+    event,
+    subscription,
+    social_account,
+    digital_trace,
+    likes,
+    participation,
+    tag_user_assignment,
+    tag_event_assignment,
+    tag_place_assignment,
+    notification,
+    "user"
+RESTART IDENTITY CASCADE;
+
+/* 1. UTILISATEURS */
+\copy "user"(pseudo,email,height_cm,weight_kg,eye_color,city,country,gender,orientation,birthday) FROM 'CSV/user.bin' WITH (FORMAT binary)
+
+/* 2. PLACES */
+\copy place(name,address,city,country) FROM 'CSV/place.bin' WITH (FORMAT binary)
+
+/* 3. TAGS */
+\copy tag(type) FROM 'CSV/tag.bin' WITH (FORMAT binary)
+
+/* 4. CATEGORIES  (racines en tête de fichier : les SERIAL suivent l'ordre du fichier) */
+\copy category(name,parent_id) FROM 'CSV/category.bin' WITH (FORMAT binary)
+\copy category_closure(ancestor_id,descendant_id,depth) FROM 'CSV/category_closure.bin' WITH (FORMAT binary)
+\copy tag_category(tag_id,category_id) FROM 'CSV/tag_category.bin' WITH (FORMAT binary)
+
+/* 5. EVENTS */
+\copy event(title,description,tag_id,starts_at,ends_at,price,place_id,organiser_id,source) FROM 'CSV/event.bin' WITH (FORMAT binary)
+
+/* 6. SUBSCRIPTIONS */
+\copy subscription(user_id,start_date,end_date) FROM 'CSV/subscription.bin' WITH (FORMAT binary)
+
+/* 7. SOCIAL ACCOUNT */
+\copy social_account(user_id,provider,external_uid) FROM 'CSV/social_account.bin' WITH (FORMAT binary)
+
+/* 8. DIGITAL TRACE */
+\copy digital_trace(sa_id,trace_type,ts,payload) FROM 'CSV/digital_trace.bin' WITH (FORMAT binary)
+
+/* 9. LIKES  (couples (source,target) uniques par construction) */
+\copy likes(source_user_id,target_user_id,value,created_at,canceled_at) FROM 'CSV/likes.bin' WITH (FORMAT binary)
+
+/* 10. PARTICIPATION  (couples (user,event) uniques par construction) */
+\copy participation(user_id,event_id,status,created_at) FROM 'CSV/participation.bin' WITH (FORMAT binary)
+
+/* 11. TAG ASSIGNMENT  (→ tag_user / tag_event / tag_place_assignment) */
+CREATE TEMP TABLE tmp_ta (tag_id INTEGER, target_type target_kind, target_id INTEGER);
+\copy tmp_ta(tag_id,target_type,target_id) FROM 'CSV/tag_assignment.bin' WITH (FORMAT binary)
+INSERT INTO tag_user_assignment  SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'user';
+INSERT INTO tag_event_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'event';
+INSERT INTO tag_place_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'place';
+
+/* 12. NOTIFICATION */
+\copy notification(user_id,message,sent_at) FROM 'CSV/notification.bin' WITH (FORMAT binary)
+
+COMMIT;
+
+VACUUM ANALYZE;
+\echo '✅ Import binaire terminé'
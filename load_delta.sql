@@ -0,0 +1,71 @@
+-- Importe le lot généré par `make_csv.py --append` (dossier CSV/delta/)
+-- **sans TRUNCATE** : les lignes s'ajoutent au jeu déjà chargé. Les SERIAL
+-- doivent reprendre exactement au haut niveau du lot précédent (les clés
+-- étrangères du delta en dépendent) : contrôlé puis recalé avant tout \copy.
+-- Coût proportionnel au lot : ni relecture ni VACUUM des tables complètes.
+
+-- Exécution :  psql -d le_big_match -f load_delta.sql
+\echo '==> Import delta Le Big Match'
+
+BEGIN;
+
+/* 0. HAUTS NIVEAUX  (max(id) lu sur l'index de clé primaire ; séquences
+      recalées : un ROLLBACK antérieur a pu consommer des valeurs) */
+CREATE TEMP TABLE tmp_hw (table_name TEXT, id_column TEXT, last_id BIGINT);
+\copy tmp_hw FROM 'CSV/delta/high_water.csv' CSV HEADER
+DO $$
+DECLARE r RECORD; cur BIGINT;
+BEGIN
+    FOR r IN SELECT * FROM tmp_hw LOOP
+        EXECUTE format('SELECT COALESCE(max(%I), 0) FROM %I', r.id_column, r.table_name) INTO cur;
+        IF cur <> r.last_id THEN
+            RAISE EXCEPTION 'delta incompatible : max(%.%) = % en base, % attendu', r.table_name, r.id_column, cur, r.last_id;
+        END IF;
+        PERFORM setval(pg_get_serial_sequence(format('%I', r.table_name), r.id_column),
+                       greatest(r.last_id, 1), r.last_id > 0);
+    END LOOP;
+END $$;
+
+/* 1. UTILISATEURS */
+\copy "user"(pseudo,email,height_cm,weight_kg,eye_color,city,country,gender,orientation,birthday) FROM 'CSV/delta/user.csv' CSV HEADER
+
+/* 2. PLACES */
+\copy place(name,address,city,country) FROM 'CSV/delta/place.csv' CSV HEADER
+
+/* 3-4. TAGS & CATEGORIES : référentiels, jamais étendus par un lot */
+
+/* 5. EVENTS */
+\copy event(title,description,tag_id,starts_at,ends_at,price,place_id,organiser_id,source) FROM 'CSV/delta/event.csv' CSV HEADER
+
+/* 6. SUBSCRIPTIONS */
+\copy subscription(user_id,start_date,end_date) FROM 'CSV/delta/subscription.csv' CSV HEADER
+
+/* 7. SOCIAL ACCOUNT */
+\copy social_account(user_id,provider,external_uid) FROM 'CSV/delta/social_account.csv' CSV HEADER
+
+/* 8. DIGITAL TRACE  (horodatages postérieurs au lot précédent) */
+\copy digital_trace(sa_id,trace_type,ts,payload) FROM 'CSV/delta/digital_trace.csv' CSV HEADER
+
+/* 9. LIKES  (couples jamais tirés par les lots précédents : pas de conflit de clé) */
+\copy likes(source_user_id,target_user_id,value,created_at,canceled_at) FROM 'CSV/delta/likes.csv' CSV HEADER
+
+/* 10. PARTICIPATION */
+\copy participation(user_id,event_id,status,created_at) FROM 'CSV/delta/participation.csv' CSV HEADER
+
+/* 11. TAG ASSIGNMENT  (nouveaux events / places / users uniquement) */
+CREATE TEMP TABLE tmp_ta (tag_id INTEGER, target_type target_kind, target_id INTEGER);
+\copy tmp_ta(tag_id,target_type,target_id) FROM 'CSV/delta/tag_assignment.csv' CSV HEADER
+INSERT INTO tag_user_assignment  SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'user';
+INSERT INTO tag_event_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'event';
+INSERT INTO tag_place_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = 'place';
+
+/* 12. NOTIFICATION */
+\copy notification(user_id,message,sent_at) FROM 'CSV/delta/notification.csv' CSV HEADER
+
+COMMIT;
+
+-- Statistiques seulement (échantillonnage) ; mv_matches n'est pas rafraîchie
+-- ici : REFRESH MATERIALIZED VIEW mv_matches, ou match_stream.py sur
+-- CSV/delta/likes.csv pour un suivi incrémental.
+ANALYZE "user", place, event, subscription, social_account, digital_trace, likes, participation, notification;
+\echo '✅ Import delta terminé'
@@ -1,374 +1,106 @@
 #!/usr/bin/env python3
 """
-make_csv.py – Le Big Match
-──────────────────────────
-Génère des fichiers CSV conformes au **schéma Postgres** fourni
-
-Exécution :
-    pip install faker python-slugify
-    python make_csv.py
-"""
-
-import csv
-import datetime
-import json
-import random
-import uuid
-from pathlib import Path
-
-from faker import Faker
-from slugify import slugify
-
-fake = Faker("fr_FR")
-Path("CSV").mkdir(exist_ok=True)
-
-# ────────────────────────────────────────────────────────────
-# PARAMÈTRAGE
-# ────────────────────────────────────────────────────────────
-N_USERS      = 120
-N_PLACES     = 25
-N_EVENTS     = 40
-N_TAGS       = 10
-N_NOTIF      = 60
-
-# Valeurs exactes de l'ENUM provider_value
-PROVIDERS = [
-    "facebook",
-    "instagram",
-    "x",
-    "linkedin",
-    "ticketmaster",
-    "snapchat",
-    "tiktok",
-]
-# Parmi ces providers, seuls deux génèrent des événements IRL dans ce script
-EVENT_PROVIDERS = ["facebook", "ticketmaster"]
-
-# ────────────────────────────────────────────────────────────
-# FONCTIONS UTILITAIRES
-# ────────────────────────────────────────────────────────────
-
-def rand_ts_this_year() -> str:
-    return fake.date_time_this_year().strftime("%Y-%m-%d %H:%M:%S")
-
-def iso_now(days_offset: int = 0) -> str:
-    return (
-        datetime.datetime.now() + datetime.timedelta(days=days_offset)
-    ).strftime("%Y-%m-%d %H:%M:%S")
-
-def gen_external_uid(provider: str) -> str:
-    """Retourne un identifiant externe réaliste selon la plateforme."""
-    if provider == "facebook":
-        return str(random.randint(10**11, 10**12 - 1))  # 12 chiffres
-    if provider in {"instagram", "x", "tiktok"}:
-        return slugify(fake.user_name()[:15])
-    if provider == "linkedin":
-        return "urn:li:person:" + uuid.uuid4().hex[:22]
-    if provider == "ticketmaster":
-        return str(random.randint(10**9, 10**10 - 1))  # 10 chiffres
-    if provider == "snapchat":
-        return "".join(random.choices("abcdefghijklmnopqrstuvwxyz", k=8))
-    return slugify(fake.user_name())
-
-# ────────────────────────────────────────────────────────────
-# 1. USERS
-# ────────────────────────────────────────────────────────────
-users_ids = list(range(1, N_USERS + 1))
-with open("CSV/user.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(
-        [
-            "pseudo",
-            "email",
-            "height_cm",
-            "weight_kg",
-            "eye_color",
-            "city",
-            "country",
-            "gender",
-            "orientation",
-            "birthday",
-        ]
-    )
-    for i in users_ids:
-        w.writerow(
-            [
-                slugify(fake.user_name() + str(i)),
-                fake.unique.email(),
-                random.randint(150, 200),
-                round(random.uniform(50, 100), 1),
-                random.choice(["blue", "brown", "green", "hazel"]),
-                fake.city(),
-                fake.current_country(),
-                random.choice(["man", "woman"]),
-                random.choice(["heterosexual", "other"]),
-                fake.date_of_birth(minimum_age=18, maximum_age=55),
-            ]
-        )
-
-# ────────────────────────────────────────────────────────────
-# 2. PLACES
-# ────────────────────────────────────────────────────────────
-places_ids = list(range(1, N_PLACES + 1))
-with open("CSV/place.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["name", "address", "city", "country"])
-    for _ in places_ids:
-        w.writerow(
-            [
-                fake.company() + " " + random.choice(["Bar", "Club", "Gym", "Hall"]),
-                fake.address().replace("\n", " "),
-                fake.city(),
-                fake.current_country(),
-            ]
-        )
-
-# ────────────────────────────────────────────────────────────
-# 3. TAGS & CATÉGORIES
-# ────────────────────────────────────────────────────────────
-tags = [
-    "cycling",
-    "rock",
-    "cinema",
-    "hiking",
-    "yoga",
-    "coding",
-    "coffee",
-    "art",
-    "boardgames",
-    "running",
-]
-with open("CSV/tag.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["type"])
-    w.writerows([[t] for t in tags])
-
-with open("CSV/category.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["name", "parent_id"])
-    w.writerows([
-        ["Sport", ""],  # id 1
-        ["Culture", ""],  # id 2
-        ["Endurance", 1],  # id 3
-        ["Musique", 2],  # id 4
-        ["Gaming", 2],  # id 5
-        ["Bien-être", 1],  # id 6
-    ])
-
-with open("CSV/tag_category.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["tag_id", "category_id"])
-    for tag_id in range(1, N_TAGS + 1):
-        w.writerow([tag_id, random.choice([3, 4, 5, 6])])
-
-# ────────────────────────────────────────────────────────────
-# 4. EVENTS
-# ────────────────────────────────────────────────────────────
-now = datetime.datetime.now()
-events_ids = list(range(1, N_EVENTS + 1))
-event_templates = [
-    "Participez à une soirée {subject} animée avec des passionnés et profitez d'une ambiance conviviale.",
-    "Rejoignez-nous pour un {event_type} dédié à {subject}, idéal pour rencontrer de nouvelles personnes partageant vos intérêts.",
-    "Découvrez les secrets de {subject} lors de ce {event_type} interactif, ouvert à tous les niveaux.",
-    "Venez vivre une expérience unique autour de {subject} lors de notre prochain {event_type}.",
-    "Un {event_type} exceptionnel sur le thème de {subject}, avec des intervenants de qualité et des surprises.",
-    "Plongez dans l'univers de {subject} grâce à ce {event_type} original et enrichissant.",
-    "Échangez, apprenez et amusez-vous lors de ce {event_type} consacré à {subject}.",
-    "Une occasion parfaite pour approfondir vos connaissances en {subject} lors de ce {event_type}.",
-    "Ne manquez pas ce {event_type} incontournable pour tous les amateurs de {subject}.",
-    "Venez partager votre passion pour {subject} lors de ce {event_type} convivial et inspirant.",
-    "Initiez-vous à {subject} lors de ce {event_type} encadré par des experts reconnus.",
-    "Un {event_type} immersif pour explorer toutes les facettes de {subject}.",
-    "Profitez d'ateliers pratiques sur {subject} dans une ambiance détendue.",
-    "Ce {event_type} vous permettra de rencontrer des professionnels du domaine {subject}.",
-    "Développez vos compétences en {subject} grâce à ce {event_type} interactif.",
-    "Un {event_type} festif autour de {subject}, avec animations et dégustations.",
-    "Participez à des discussions passionnantes sur {subject} lors de ce {event_type}.",
-    "Un {event_type} pour petits et grands, centré sur la découverte de {subject}.",
-    "Venez relever des défis autour de {subject} lors de ce {event_type} compétitif.",
-    "Un {event_type} collaboratif pour créer ensemble autour de {subject}.",
-    "Découvrez les dernières tendances en {subject} lors de ce {event_type} innovant.",
-    "Un {event_type} exclusif réservé aux passionnés de {subject}.",
-    "Rencontrez des influenceurs de {subject} lors de ce {event_type} unique.",
-    "Un {event_type} pour échanger vos astuces et expériences sur {subject}.",
-    "Vivez une aventure inoubliable autour de {subject} lors de ce {event_type}.",
-]
-event_types = [
-    "Soirée", "Concert", "Atelier", "Conférence", "Projection", "Tournoi", "Rencontre", "Exposition", "Festival", "Cours", "Spectacle", "Workshop", "Séminaire", "Vernissage", "Compétition", "Bal", "Gala", "Dégustation", "Projection", "Meetup"
-]
-event_subjects = [
-    "Jazz", "Startup", "Peinture", "Cinéma", "Coding", "Danse", "Photographie", "Théâtre", "Musique", "Littérature", "Cuisine", "Fitness", "Jeux", "Science", "Technologie", "Vin", "Lecture", "Nature", "Sport", "Innovation"
-]
-with open("CSV/event.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(
-        [
-            "title",
-            "description",
-            "tag_id",
-            "starts_at",
-            "ends_at",
-            "price",
-            "place_id",
-            "organiser_id",
-            "source",
-        ]
-    )
-    for i in events_ids:
-        event_type = random.choice(event_types)
-        subject = random.choice(event_subjects)
-        title = f"{event_type} {subject}"
-        template = random.choice(event_templates)
-        description = template.format(event_type=event_type, subject=subject)
-        start = now + datetime.timedelta(days=random.randint(1, 60), hours=random.randint(8, 20))
-        end = start + datetime.timedelta(hours=random.randint(2, 6))
-        w.writerow(
-            [
-                title,
-                description,
-                random.randint(1, N_TAGS),
-                start.strftime("%Y-%m-%d %H:%M:%S"),
-                end.strftime("%Y-%m-%d %H:%M:%S"),
-                round(random.uniform(0, 40), 2),
-                random.choice(places_ids),
-                random.choice(users_ids),
-                random.choice(EVENT_PROVIDERS),
-            ]
-        )
-
-# ────────────────────────────────────────────────────────────
-# 5. SUBSCRIPTIONS
-# ────────────────────────────────────────────────────────────
-with open("CSV/subscription.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["user_id", "start_date", "end_date"])
-    for uid in random.sample(users_ids, k=N_USERS // 2):
-        start = fake.date_between(start_date="-2y", end_date="-1d")
-        end = None if random.random() < 0.3 else fake.date_between(start, "+6M")
-        w.writerow([uid, start, end or ""])  # chaîne vide = NULL pour COPY
-
-# ────────────────────────────────────────────────────────────
-# 6. SOCIAL ACCOUNTS
-# ────────────────────────────────────────────────────────────
-soc_acc_ids = []  # pour relier digital_trace.sa_id
-with open("CSV/social_account.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["user_id", "provider", "external_uid"])
-    acc_id = 1
-    for uid in users_ids:
-        for provider in random.sample(PROVIDERS, k=random.randint(1, len(PROVIDERS))):
-            w.writerow([uid, provider, gen_external_uid(provider)])
-            soc_acc_ids.append(acc_id)
-            acc_id += 1
-
-# ────────────────────────────────────────────────────────────
-# 7. DIGITAL TRACES
-# ────────────────────────────────────────────────────────────
-with open("CSV/digital_trace.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["sa_id", "trace_type", "ts", "payload"])
-    trace_types = ["activity", "like", "post", "comment", "share", "reaction"]
-    for _ in range(200):
-        sa_id = random.choice(soc_acc_ids)
-        trace_type = random.choice(trace_types)
-        if trace_type == "activity":
-            payload = {
-                "action": random.choice(["login", "logout", "profile_update", "browse"]),
-                "device": random.choice(["mobile", "desktop", "tablet"]),
-                "ip": fake.ipv4()
-            }
-        elif trace_type == "like":
-            payload = {
-                "target_type": random.choice(["post", "comment", "photo"]),
-                "target_id": random.randint(1000, 9999)
-            }
-        elif trace_type == "post":
-            payload = {
-                "content": fake.sentence(),
-                "media": random.choice(["", fake.image_url()])
-            }
-        elif trace_type == "comment":
-            payload = {
-                "comment": fake.sentence(),
-                "post_id": random.randint(1000, 9999)
-            }
-        elif trace_type == "share":
-            payload = {
-                "shared_type": random.choice(["event", "post", "profile"]),
-                "shared_id": random.randint(1000, 9999)
-            }
-        elif trace_type == "reaction":
-            payload = {
-                "reaction": random.choice(["like", "love", "haha", "wow", "sad", "angry"]),
-                "target_id": random.randint(1000, 9999)
-            }
-        else:
-            payload = {"info": fake.word()}
-        w.writerow(
-            [
-                sa_id,
-                trace_type,
-                rand_ts_this_year(),
-                json.dumps(payload),
-            ]
-        )
-
-# ────────────────────────────────────────────────────────────
-# 9. PARTICIPATION
-# ────────────────────────────────────────────────────────────
-with open("CSV/participation.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["user_id", "event_id", "status", "created_at"])
-    for _ in range(180):
-        w.writerow([
-            random.choice(users_ids),
-            random.choice(events_ids),
-            random.choice(["interested", "going"]),
-            rand_ts_this_year(),
-        ])
-
-# ────────────────────────────────────────────────────────────
-# 10. TAG ASSIGNMENT
-# ────────────────────────────────────────────────────────────
-with open("CSV/tag_assignment.csv", "w", newline="", encoding="utf8") as f:
-    w = csv.writer(f)
-    w.writerow(["tag_id", "target_type", "target_id"])
-    # Chaque événement reçoit ≥1 tag
-    for ev in events_ids:
-        w.writerow([random.randint(1, N_TAGS), "event", ev])
-    # Tague 10 places et 50 users pour tester le polymorphisme
-    for pl in random.sample(places_ids, 10):
-        w.writerow([random.randint(1, N_TAGS), "place", pl])
-    for uid in random.sample(users_ids, 50):
-        w.writerow([random.randint(1, N_TAGS), "user", uid])
-
-# ────────────────────────────────────────────────────────────
-# 11. NOTIFICATIONS
-# ────────────────────────────────────────────────────────────
-#!/usr/bin/env python3
-"""
-make_csv.py – v2
+make_csv.py – v3
 ────────────────
-• Corrige la casse de l'énum `provider_value` ("X" majuscule)
+• Génération en flux : chaque table est produite par un générateur de lignes
+  écrit directement sur disque → mémoire constante quel que soit le volume
+  (plus aucune liste `users`, `sa_ids`… construite à l'avance)
+• Point d'entrée en ligne de commande : facteur d'échelle global + nombre de
+  lignes par table, rapport lignes/s par table
+• Génération multi-processus par shards de plages d'ID : chaque shard a sa
+  propre graine dérivée de la graine maître (--seed) → sortie fusionnée
+  identique octet pour octet quel que soit --workers
+• Valeurs Faker tirées une fois dans des réservoirs (value_pools.py) puis
+  échantillonnées par colonnes NumPy pour user, place, event
+• Clés uniques par construction (unique_keys.py) : pseudo, email,
+  (provider, external_uid), couples de likes et de participations tirés sans
+  remise → le nombre de lignes demandé est exactement le nombre chargé
+• Shards produits en colonnes typées (dataset.py) puis sérialisés par un
+  writer interchangeable : CSV, COPY binaire PostgreSQL chargé directement
+  dans les tables finales (fichiers ou flux `psql`, --pipe), variantes gzip ;
+  generate(dataset=…) garde les colonnes en mémoire pour les moteurs Python
+• Morceaux compressés (chunked.py, --chunk-rows) : gzip / zstd par un pool
+  de threads pendant la génération, chargeur load_parallel.sh (plusieurs
+  sessions COPY … FROM PROGRAM par table)
+• digital_trace (traces.py) : payloads typés sérialisés par lots, lignes
+  triées par horodatage, option --split-traces = un fichier par mois
+• Instrumentation (instrument.py) : temps generate / encode et sections par
+  table, rapport JSON (--report), cProfile (--profile), échantillonnage de
+  pile (--sample), pic d'allocations (--trace-alloc), progression (--progress)
+• Ajout incrémental (--append, high_water.py) : reprend les hauts niveaux de
+  out/manifest.json et ne génère que le lot ajouté dans out/delta/ (nouveaux
+  utilisateurs, likes, traces, participations…), clés étrangères valides vers
+  anciennes et nouvelles lignes → coût proportionnel au delta ; load_delta.sql
+• Lieux sans double réservation (scheduling.py) : créneaux demandés par les
+  shards d'événements rejoués dans le parent, conflits repoussés au premier
+  créneau libre du lieu (index d'intervalles), découpés ensuite par shard
+• notification dérivée des événements et participations du lot (notifier.py) :
+  confirmations et rappels échus jusqu'à `now`, rappels à venir conservés
+  pour le lot suivant (reminders.npz) ; non réglable par --rows
+• Catégories (categories.py) : --rows category=N → arbre profond
+  (--category-depth niveaux) et sa fermeture category_closure (ancêtre,
+  descendant, profondeur) ; par défaut les 6 catégories historiques
 • Génère des `canceled_at` **seulement** pour les likes dont le `source_user_id`
-  possède un abonnement actif à la date d’annulation (respecte le trigger métier)
-• Reste strictement conforme à toutes tes contraintes SQL
+  possède un abonnement actif à la date d'annulation (respecte le trigger métier)
+• Reste strictement conforme à toutes les contraintes SQL
 
 Exécution :
-    python make_csv.py
-Dossier `CSV/` rempli → importer ensuite avec `load.sql`.
+    pip install faker python-slugify numpy
+    python make_csv.py                              # jeu « jouet » (volumes v2)
+    python make_csv.py --scale 1000                 # ×1000 sur toutes les tables
+    python make_csv.py --rows likes=5e8 --rows digital_trace=1e9
+    python make_csv.py --scale 1e4 --workers 0 --seed 42   # tous les cœurs
+    python make_csv.py --format binary              # CSV/*.bin → load_binary.sql
+    python make_csv.py --pipe "psql -d le_big_match"     # COPY direct, sans fichier
+    python make_csv.py --rows digital_trace=1e9 --split-traces   # CSV/digital_trace/AAAA-MM.csv
+    python make_csv.py --scale 1e3 --progress --report run.json --profile prof/
+    python make_csv.py --rows category=1e5 --category-depth 12   # hiérarchie profonde
+    python make_csv.py --scale 1e4 --workers 0 --chunk-rows 1e6 --compress zstd   # sh CSV/load_parallel.sh
+    python make_csv.py --append --scale 0.01         # lot quotidien → CSV/delta/ (load_delta.sql)
+Dossier `CSV/` rempli → importer ensuite avec `load.sql` (traces découpées :
+CSV/digital_trace/load.sql, ou attach.sql sur le schéma create_traces_partitioned.sql,
+à la place de la section 8).
 """
-import csv, datetime, json, random, uuid
+import argparse, asyncio, datetime, functools, hashlib, os, random, shlex, subprocess, sys, time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from faker import Faker
 from slugify import slugify
-
-fake = Faker("fr_FR")
-Path("CSV").mkdir(exist_ok=True)
+from categories import BASE, BASE_DEPTH, CategoryTree, build_tree
+from chunked import Chunks, write_loader
+from dataset import WRITERS, Column, Dataset, Frame
+from high_water import Domain, HighWater, load_bookings, load_reminders, load_subscriptions, write_expected
+from instrument import Options, Report, begin, print_progress, print_report, section
+from notifier import Output, Scheduler, VirtualClock, derive, from_frames
+from pgcopy import copy_statements
+from scheduling import schedule
+from subscription_index import SubscriptionIndex
+from traces import TRACE_TYPES, epoch, month_of, payloads, sorted_ts, trace_shards, write_loaders
+from unique_keys import ExternalUids, Permutation, unique_suffix
+from value_pools import ValuePools, POOL_SIZE, choice, days_from, ts_this_year
+import numpy as np
+
+fake = Faker("fr_FR")   # une instance par processus, réensemencée à chaque shard
 
 # ───────── PARAMETRES GLOBAUX ──────────
-N_USERS, N_PLACES, N_EVENTS = 120, 25, 40
-N_TAGS, N_NOTIF = 10, 60
+# Volumes de référence (scale = 1) ; multipliés par --scale, surchargés par --rows
+BASE_ROWS = {
+    "user": 120,
+    "place": 25,
+    "event": 40,
+    "subscription": 60,
+    "digital_trace": 200,
+    "likes": 400,
+    "participation": 180,
+}
+# Référentiels : volumes fixes (non multipliés par --scale), surchargés par --rows
+REF_ROWS = {"category": len(BASE)}
+CATEGORY_DEPTH = 8   # niveaux de l'arbre des catégories, les 2 de BASE compris (--category-depth)
+N_TAGS = 10
+# Taille fixe des shards : le découpage (donc les graines) ne dépend pas de --workers
+SHARD_ROWS = 100_000
 
 PROVIDERS = [
     "facebook",
@@ -381,149 +113,581 @@ PROVIDERS = [
 ]
 EVENT_PROVIDERS = ["facebook", "ticketmaster"]
 
+HEADERS = {
+    "user":           ["pseudo","email","height_cm","weight_kg","eye_color","city","country","gender","orientation","birthday"],
+    "place":          ["name","address","city","country"],
+    "tag":            ["type"],
+    "category":       ["name","parent_id"],
+    "tag_category":   ["tag_id","category_id"],
+    "category_closure": ["ancestor_id","descendant_id","depth"],
+    "event":          ["title","description","tag_id","starts_at","ends_at","price","place_id","organiser_id","source"],
+    "subscription":   ["user_id","start_date","end_date"],
+    "social_account": ["user_id","provider","external_uid"],
+    "digital_trace":  ["sa_id","trace_type","ts","payload"],
+    "likes":          ["source_user_id","target_user_id","value","created_at","canceled_at"],
+    "participation":  ["user_id","event_id","status","created_at"],
+    "tag_assignment": ["tag_id","target_type","target_id"],
+    "notification":   ["user_id","message","sent_at"],
+}
+
 # ───────── HELPERS ──────────
-fake_date  = lambda a,b: fake.date_between(a,b)
-iso        = lambda dt: dt.strftime("%Y-%m-%d %H:%M:%S")
-now        = datetime.datetime.now()
-rand_ts    = lambda: iso(fake.date_time_this_year())
-iso_now    = lambda d=0: iso(now + datetime.timedelta(days=d))
-
-def gen_external_uid(p):
-    if p == "facebook":      return str(random.randint(10**11, 10**12-1))
-    if p in {"instagram", "X", "tiktok"}: return slugify(fake.user_name()[:15])
-    if p == "linkedin":      return "urn:li:person:"+uuid.uuid4().hex[:22]
-    if p == "ticketmaster":  return str(random.randint(10**9, 10**10-1))
-    if p == "snapchat":      return "".join(random.choices("abcdefghijklmnopqrstuvwxyz", k=8))
-    return slugify(fake.user_name())
+# `now` est fixé par le processus parent puis transmis aux workers : aucune
+# valeur ne dépend de l'heure à laquelle un shard est exécuté.
+now        = datetime.datetime.now().replace(microsecond=0)
+SINCE      = None   # --append : `now` du lot précédent, borne basse des horodatages
+BATCH      = 0      # n° de lot (0 = génération complète), mêlé aux graines des shards
+
+def shard_seed(seed, table, no):
+    """Graine d'un shard, dérivée de façon stable de (graine maître, table, n° de shard)."""
+    h = hashlib.blake2b(f"{seed}:{table}:{no}".encode(), digest_size=8)
+    return int.from_bytes(h.digest(), "big")
+
+class Shard:
+    """Contexte de génération d'un shard : `rng`, `np` (tirages vectorisés) et
+    `fake` ensemencés pour lui seul."""
+    def __init__(self, seed, table, no):
+        s = shard_seed(seed, f"{table}#{BATCH}" if BATCH else table, no)
+        self.seed = seed   # graine maître : permutations communes à tous les shards
+        self.rng = random.Random(s)
+        self.np = np.random.default_rng(s)
+        self.fake = fake
+        fake.seed_instance(s)
+        self.subs = Subscriptions()
+
+def frame(table, *columns):
+    """Lignes d'un shard en colonnes (dataset.Frame) : tableaux NumPy, listes ou Column."""
+    return Frame.of(table, HEADERS[table], *columns)
+
+def codes(g, labels, n):
+    """Colonne codes tirée uniformément dans `labels` (même tirage que value_pools.choice)."""
+    return Column.codes(g.np.integers(0, len(labels), n), labels)
+
+def rand_date(g, lo_days, hi_days):
+    """Date aléatoire entre aujourd'hui+lo_days et aujourd'hui+hi_days (inclus)."""
+    return now.date() + datetime.timedelta(days=g.rng.randint(lo_days, hi_days))
+
+def quota(k, n, lo, hi):
+    """Part de k tirages revenant à la plage [lo, hi) de 0..n (somme exacte = k)."""
+    return k*hi//n - k*lo//n if n else 0
+
+def select_sorted(g, lo, hi, k):
+    """Tire k identifiants distincts parmi lo+1..hi, en ordre croissant et en flux
+    (sélection séquentielle, Knuth algo S) : mémoire O(1) au lieu du
+    `random.sample` qui matérialise la population."""
+    n = hi - lo
+    for i in range(1, n+1):
+        if k == 0: return
+        if g.rng.random() * (n-i+1) < k:
+            yield lo+i; k -= 1
+
+class Subscriptions:
+    """Abonnements générés, accumulés en tableaux compacts (dates en ordinal,
+    0 = end_date NULL) puis indexés pour le contrôle des likes annulés."""
+    def __init__(self):
+        self.uid, self.start, self.end = array("l"), array("l"), array("l")
+
+    def extend(self, other):
+        self.uid.extend(other.uid); self.start.extend(other.start); self.end.extend(other.end)
+
+    def add(self, uid, start, end):
+        self.uid.append(uid); self.start.append(start.toordinal())
+        self.end.append(end.toordinal() if end else 0)
+
+    def index(self):
+        return SubscriptionIndex(self.uid, self.start, self.end)
 
 # ───────── 1. USERS ──────────
-users = list(range(1, N_USERS+1))
-with open("CSV/user.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["pseudo","email","height_cm","weight_kg","eye_color","city","country","gender","orientation","birthday"])
-    for i in users:
-        w.writerow([
-            slugify(fake.user_name()+str(i)), fake.unique.email(),
-            random.randint(150,200), round(random.uniform(50,100),1),
-            random.choice(["blue","brown","green","hazel"]),
-            fake.city(), fake.current_country(),
-            random.choice(["man","woman"]), random.choice(["heterosexual","other"]),
-            fake.date_of_birth(minimum_age=18, maximum_age=55)
-        ])
+def gen_users(g, lo, hi):
+    n, ids = hi-lo, range(lo+1, hi+1)
+    # suffixe « _id » / « .id » : pseudo et email uniques sans ensemble en mémoire
+    emails = zip(POOLS.sample("email_local", g.np, n), ids, POOLS.sample("email_domain", g.np, n))
+    return frame("user",
+        [unique_suffix(u, i) for u, i in zip(POOLS.sample("user_name", g.np, n), ids)],
+        [f"{l}.{i}@{d}" for l, i, d in emails],
+        g.np.integers(150, 201, n), np.round(g.np.uniform(50, 100, n), 1),
+        codes(g, ["blue","brown","green","hazel"], n),
+        POOLS.column("city", g.np, n), POOLS.column("country", g.np, n),
+        codes(g, ["man","woman"], n), codes(g, ["heterosexual","other"], n),
+        days_from(g.np, now, -55*365, -18*366, n),
+    )
 
 # ───────── 2. PLACES ──────────
-places = list(range(1, N_PLACES+1))
-with open("CSV/place.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["name","address","city","country"])
-    for _ in places:
-        w.writerow([
-            fake.company()+" "+random.choice(["Bar","Club","Gym","Hall"]),
-            fake.address().replace("\n"," "), fake.city(), fake.current_country()
-        ])
+def gen_places(g, lo, hi):
+    n = hi-lo
+    names = zip(POOLS.sample("company", g.np, n), choice(g.np, ["Bar","Club","Gym","Hall"], n))
+    return frame("place", [f"{c} {k}" for c, k in names], POOLS.column("address", g.np, n),
+                 POOLS.column("city", g.np, n), POOLS.column("country", g.np, n))
 
 # ───────── 3. TAGS & CATEGORIES ──────────
 tags=["cycling","rock","cinema","hiking","yoga","coding","coffee","art","boardgames","running"]
-with open("CSV/tag.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["type"]); w.writerows([[t] for t in tags])
 
-with open("CSV/category.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["name","parent_id"])
-    w.writerows([["Sport",""],["Culture",""]])
-    w.writerows([["Endurance",1],["Musique",2],["Gaming",2],["Bien-être",1]])
+def gen_tags(g):
+    return [[t] for t in tags]
+
+@functools.lru_cache(maxsize=2)
+def category_tree(seed, n, depth):
+    """Arbre des catégories (categories.py), identique dans tous les shards :
+    tiré une fois par processus depuis la graine maître."""
+    names, parent = build_tree(np.random.default_rng(shard_seed(seed, "category", 0)), n, depth)
+    return CategoryTree(parent, names)
+
+def gen_categories(g, n, depth):
+    # n ≤ 6 : les catégories historiques (Sport, Culture…) ; au-delà, arbre profond
+    tree = category_tree(g.seed, n, depth)
+    parent = tree.parent[1:]
+    return frame("category", tree.names, Column("int", parent, null=parent == 0))
 
-with open("CSV/tag_category.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["tag_id","category_id"])
-    for tid in range(1,N_TAGS+1): w.writerow([tid, random.choice([3,4,5,6])])
+def gen_category_closure(g, lo, hi, n, depth):
+    # fermeture transitive des descendants lo+1..hi, soi-même compris (profondeur 0)
+    return frame("category_closure", *category_tree(g.seed, n, depth).closure(lo, hi))
+
+def gen_tag_categories(g, n, depth):
+    # chaque tag rattaché à une feuille (BASE : sous-catégories 3..6)
+    leaves = category_tree(g.seed, n, depth).leaves().tolist()
+    for tid in range(1,N_TAGS+1): yield [tid, g.rng.choice(leaves)]
 
 # ───────── 4. EVENTS ──────────
-events=list(range(1,N_EVENTS+1))
-with open("CSV/event.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["title","description","tag_id","starts_at","ends_at","price","place_id","organiser_id","source"])
-    for ev in events:
-        start=now+datetime.timedelta(days=random.randint(1,60),hours=random.randint(8,20))
-        w.writerow([f"Event #{ev}",fake.sentence(10),random.randint(1,N_TAGS),iso(start),iso(start+datetime.timedelta(hours=random.randint(2,6))),round(random.uniform(0,40),2),random.choice(places),random.choice(users),random.choice(EVENT_PROVIDERS)])
+def event_draws(g, n, n_places, n_users):
+    """Tirages d'un shard d'événements dans l'ordre du flux g.np : (début et fin
+    demandés, description, tag, prix, lieu, organisateur, source)."""
+    start = np.datetime64(now, "s") + (g.np.integers(1, 61, n)*86400 + g.np.integers(8, 21, n)*3600).astype("timedelta64[s]")
+    end = start + (g.np.integers(2, 7, n)*3600).astype("timedelta64[s]")
+    return (start, end, POOLS.column("sentence", g.np, n), g.np.integers(1, N_TAGS+1, n),
+            np.round(g.np.uniform(0, 40, n), 2), g.np.integers(1, n_places+1, n), g.np.integers(1, n_users+1, n),
+            codes(g, EVENT_PROVIDERS, n))
+
+def event_slots(seed, lo, hi, n_places, n_users, booked=None):
+    """Créneaux des événements lo+1..hi : demandes de chaque shard rejouées
+    (mêmes graines que gen_events), chevauchements d'un même lieu — entre
+    elles ou avec `booked` (scheduling.PlaceIndex) — résolus par
+    scheduling.schedule. Renvoie (lieu, début, fin) en secondes."""
+    place, start, end = [], [], []
+    for no, (a, b) in enumerate(ranges(hi, lo)):
+        s, e, *_, p, _, _ = event_draws(Shard(seed, "event", no), b-a, n_places, n_users)
+        place.append(p); start.append(s); end.append(e)
+    place = np.concatenate(place)
+    start, end, _ = schedule(place, np.concatenate(start), np.concatenate(end), np.datetime64(now, "s"), booked)
+    return place, start, end
+
+def gen_events(g, lo, hi, n_places, n_users, start, end):
+    # start / end = créneaux du shard placés par event_slots (les tirages du shard en sont les demandes)
+    _, _, sentence, tag, price, place, organiser, source = event_draws(g, hi-lo, n_places, n_users)
+    return frame("event",
+        [f"Event #{ev}" for ev in range(lo+1, hi+1)], sentence, tag,
+        start.astype("datetime64[s]"), end.astype("datetime64[s]"), price, place, organiser, source,
+    )
 
 # ───────── 5. SUBSCRIPTIONS ──────────
-subscriptions=[]
-with open("CSV/subscription.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["user_id","start_date","end_date"])
-    for uid in random.sample(users,k=N_USERS//2):
-        start=fake_date("-2y","-1d"); end=None if random.random()<0.3 else fake_date(start,"+6M")
-        w.writerow([uid,start,end or ""]); subscriptions.append((uid,start,end))
-
-# helper pour likes annulés
-def has_active_sub(uid, ts):
-    for s,e in [(s[1],s[2]) for s in subscriptions if s[0]==uid]:
-        if s<=ts.date() and (e=="" or e is None or ts.date()<=e):
-            return True
-    return False
+def gen_subscriptions(g, lo, hi, k):
+    # abonnés tirés dans la plage d'utilisateurs du shard ; remontés au parent via g.subs
+    for uid in select_sorted(g, lo, hi, k):
+        start=rand_date(g, -730, -1); end=None if g.rng.random()<0.3 else start+datetime.timedelta(days=g.rng.randint(0, (now.date()-start).days+182))
+        g.subs.add(uid, start, end)
+        yield [uid,start,end or ""]
 
 # ───────── 6. SOCIAL_ACCOUNT ──────────
-sa_ids=[]
-with open("CSV/social_account.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["user_id","provider","external_uid"])
-    acc=1
-    for uid in users:
-        for prov in random.sample(PROVIDERS,k=random.randint(1,len(PROVIDERS))):
-            w.writerow([uid,prov,gen_external_uid(prov)]); sa_ids.append(acc); acc+=1
+def gen_social_accounts(g, lo, hi, n_users, first=0):
+    # sa_id = rang de la ligne (SERIAL) → seul le total est utile en aval ;
+    # au plus un compte par (user, provider) ⇒ external_uid = permutation de user_id
+    if hi == lo: return   # lot sans nouvel utilisateur
+    external_uid = ExternalUids(g.seed, n_users, first)
+    for uid in range(lo+1, hi+1):
+        for prov in g.rng.sample(PROVIDERS,k=g.rng.randint(1,len(PROVIDERS))):
+            yield [uid,prov,external_uid(prov, uid, slugify(g.fake.user_name()[:15]))]
 
 # ───────── 7. DIGITAL_TRACE ──────────
-with open("CSV/digital_trace.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["sa_id","trace_type","ts","payload"])
-    for _ in range(200):
-        w.writerow([random.choice(sa_ids),random.choice(["activity","like","post"]),rand_ts(),json.dumps({"info":fake.word()})])
+def gen_traces(g, lo, hi, n_sa, t0, t1):
+    # tranche de temps [t0, t1) propre au shard : horodatages triés ⇒ table triée
+    n = hi-lo
+    types = g.np.integers(0, len(TRACE_TYPES), n)
+    return frame("digital_trace", g.np.integers(1, n_sa+1, n), Column.codes(types, TRACE_TYPES),
+                 sorted_ts(g.np, t0, t1, n), payloads_timed(g.np, types))
+
+def payloads_timed(rng, types):
+    with section("payloads"): return payloads(rng, types, POOLS)
 
 # ───────── 8. LIKES (respect du trigger "annulation = abonnés") ──────────
-with open("CSV/likes.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["source_user_id","target_user_id","value","created_at","canceled_at"])
-    for _ in range(400):
-        src,tgt=random.sample(users,2); value=random.choice(["like","nope"])
-        cancel=""
-        if value=="nope" and random.random()<0.2:
-            ts=datetime.datetime.strptime(rand_ts(),"%Y-%m-%d %H:%M:%S")
-            if has_active_sub(src,ts): cancel=iso(ts)
-        w.writerow([src,tgt,value,rand_ts(),cancel])
+def pairs(g, lo, hi, dom):
+    """Couples n° P(lo)..P(hi-1) du domaine `dom` (high_water.Domain.key())."""
+    dom = Domain(*dom)
+    return dom.decode(Permutation(dom.size, shard_seed(g.seed, dom.tag, -1)).take(np.arange(lo, hi)))
+
+def gen_likes(g, lo, hi, dom):
+    # like k = couple n° P(k) du domaine : aucun doublon (source,target) entre shards ni entre lots
+    if hi == lo: return []
+    n = hi-lo
+    src, tgt = pairs(g, lo, hi, dom)
+    is_like = g.np.random(n) < 0.5
+    canceled = ts_this_year(g.np, now, n, SINCE)
+    cancel = ~is_like & (g.np.random(n) < 0.2)
+    with section("subscription_check"):
+        cancel &= ACTIVE.active_batch(src, canceled.astype("datetime64[D]"))
+    return frame("likes", src, tgt, Column.codes(~is_like, ["like", "nope"]),
+                 ts_this_year(g.np, now, n, SINCE), Column("ts", canceled.astype(np.int64), null=~cancel))
 
 # ───────── 9. PARTICIPATION ──────────
-with open("CSV/participation.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["user_id","event_id","status","created_at"])
-    for _ in range(180):
-        w.writerow([random.choice(users),random.choice(events),random.choice(["interested","going"]),rand_ts()])
+def gen_participations(g, lo, hi, dom):
+    if hi == lo: return []
+    n = hi-lo
+    uid, ev = pairs(g, lo, hi, dom)
+    return frame("participation", uid, ev, codes(g, ["interested","going"], n), ts_this_year(g.np, now, n, SINCE))
 
 # ───────── 10. TAG_ASSIGNMENT ──────────
-with open("CSV/tag_assignment.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["tag_id","target_type","target_id"])
-    for ev in events: w.writerow([random.randint(1,N_TAGS),"event",ev])
-    for pl in random.sample(places,10): w.writerow([random.randint(1,N_TAGS),"place",pl])
-    for uid in random.sample(users,50): w.writerow([random.randint(1,N_TAGS),"user",uid])
+def gen_tag_assignments(g, kind, lo, hi, k=None):
+    # ratios v2 : tous les events, 10 places / 25, 50 users / 120
+    ids = range(lo+1, hi+1) if k is None else select_sorted(g, lo, hi, k)
+    for target in ids: yield [g.rng.randint(1,N_TAGS),kind,target]
 
 # ───────── 11. NOTIFICATION ──────────
-notif_templates=[
-    "Votre inscription à l'événement {event} a bien été prise en compte.",
-    "N'oubliez pas : l'événement {event} commence bientôt !",
-    "Vous avez reçu un nouveau like de la part d'un utilisateur.",
-    "Votre abonnement a été renouvelé avec succès.",
-    "Un nouvel événement {event} a été ajouté près de chez vous.",
-    "Vous avez été ajouté à la liste d'attente pour l'événement {event}.",
-    "Votre participation à l'événement {event} a été confirmée.",
-    "L'événement {event} a été annulé. Nous vous tiendrons informé.",
-    "Un utilisateur souhaite se connecter avec vous.",
-    "Votre profil a été mis à jour avec succès.",
-    "Vous avez un nouveau message concernant {event}.",
-    "Votre demande d'ami a été acceptée.",
-    "Votre ticket pour {event} est disponible dans votre espace.",
-    "Un rappel : {event} commence dans 1 heure.",
-    "Vous avez été mentionné dans une discussion liée à {event}.",
-    "Votre réservation pour {event} a été annulée à votre demande.",
-    "Un utilisateur a commenté votre participation à {event}.",
-    "Votre note pour {event} a bien été enregistrée.",
-    "Un événement similaire à {event} pourrait vous intéresser.",
-    "Votre présence à {event} a été remarquée par l'organisateur.",
-]
-with open("CSV/notification.csv","w",newline="",encoding="utf8") as f:
-    w=csv.writer(f); w.writerow(["user_id","message","sent_at"])
-    for _ in range(N_NOTIF):
-        event_name=f"Event #{random.choice(events)}"
-        msg=random.choice(notif_templates).format(event=event_name)
-        w.writerow([random.choice(users),msg,rand_ts()])
-
-print("✅ CSV générés (v2) → dossier CSV/")
+def gen_notifications(sink, fmt, events, participation, known=None, pending=None, keep=None):
+    """notification dérivée (notifier.py) des événements et participations du
+    lot, écrite dans `sink` : notifications échues jusqu'à `now`. `known` =
+    (titres, starts_at) des événements des lots précédents, `pending` = rappels
+    (due, user, kind, event) laissés par le lot précédent, `keep(frame)` =
+    blocs gardés en mémoire. Renvoie (lignes, rappels encore en attente)."""
+    titles, starts, cols = from_frames(events, participation, known)
+    out = Output(None, fmt, sink, keep)
+    sched = Scheduler(out, titles, clock=VirtualClock())
+    if pending is not None: sched.schedule(*pending)
+    sched.schedule(*derive(starts, *cols))
+    asyncio.run(sched.run(epoch(now)))
+    out.close()
+    return out.rows, sched.pending()
+
+GENERATORS = {
+    "user": gen_users, "place": gen_places, "tag": gen_tags, "category": gen_categories,
+    "category_closure": gen_category_closure, "tag_category": gen_tag_categories, "event": gen_events, "subscription": gen_subscriptions,
+    "social_account": gen_social_accounts, "digital_trace": gen_traces, "likes": gen_likes,
+    "participation": gen_participations, "tag_assignment": gen_tag_assignments,
+}
+
+# ───────── PLAN DE SHARDS ──────────
+def ranges(n, start=0):
+    return [(lo, min(lo+SHARD_ROWS, n)) for lo in range(start, n, SHARD_ROWS)] or [(start, start)]
+
+def plan(old, new, drawn, n_sa=None, slots=None, category_depth=CATEGORY_DEPTH):
+    """Découpe chaque table en shards (args du générateur), en deux phases :
+    la phase 2 dépend des abonnements et du nombre de comptes sociaux (n_sa).
+    Seules les lignes du lot sont planifiées : identifiants old.count(t)+1..
+    new.count(t) (high_water.HighWater), couples `drawn` = tirages par domaine,
+    `slots` = créneaux (lieu, début, fin) des nouveaux événements (event_slots),
+    `category_depth` = niveaux de l'arbre des catégories."""
+    n_users, n_places = new.count("user"), new.count("place")
+    o_users, o_places, o_events = old.count("user"), old.count("place"), old.count("event")
+    span = lambda table: ranges(new.count(table), old.count(table))
+    if n_sa is None:
+        d_users = n_users - o_users
+        k = min(new.count("subscription") - old.count("subscription"), d_users)
+        ref = [] if new.batch else [()]   # référentiels : générés une seule fois
+        tree = [] if new.batch else [(new.count("category"), category_depth)]
+        shards = {
+            "user":           span("user"),
+            "place":          span("place"),
+            "tag":            ref,
+            "category":       tree,
+            "category_closure": [] if new.batch else [(lo, hi, *tree[0]) for lo, hi in ranges(new.count("category"))],
+            "tag_category":   tree,
+            "event":          [(lo, hi, n_places, n_users, slots[1][lo-o_events:hi-o_events],
+                              slots[2][lo-o_events:hi-o_events]) for lo, hi in span("event")],
+            "subscription":   [(lo, hi, quota(k, d_users, lo-o_users, hi-o_users)) for lo, hi in span("user")],
+            "social_account": [(lo, hi, n_users, o_users) for lo, hi in span("user")],
+        }
+        return {t: argss for t, argss in shards.items() if argss}
+    k_pl, k_us = (n_places-o_places)*2//5, (n_users-o_users)*5//12
+    start = now.replace(month=1, day=1, hour=0, minute=0, second=0)
+    if SINCE: start = max(start, SINCE)
+    trace_rows = new.count("digital_trace") - old.count("digital_trace")
+    return {
+        "digital_trace":  trace_shards(trace_rows, n_sa, epoch(start), epoch(now), SHARD_ROWS),
+        "likes":          [(lo, hi, d.key()) for d, a, b in drawn["likes"] for lo, hi in ranges(b, a)] or [(0, 0, None)],
+        "participation":  [(lo, hi, d.key()) for d, a, b in drawn["participation"] for lo, hi in ranges(b, a)] or [(0, 0, None)],
+        "tag_assignment": [("event", lo, hi) for lo, hi in span("event")]
+                        + [("place", lo, hi, quota(k_pl, n_places-o_places, lo-o_places, hi-o_places)) for lo, hi in span("place")]
+                        + [("user", lo, hi, quota(k_us, n_users-o_users, lo-o_users, hi-o_users)) for lo, hi in span("user")],
+    }
+
+# ───────── EXECUTION DES SHARDS ──────────
+SUBS = Subscriptions()                 # abonnements complets (phase 1)…
+ACTIVE = SubscriptionIndex([], [], [])  # …et leur index, lu par gen_likes (phase 2)
+POOLS = None                            # réservoirs Faker communs à tous les shards
+
+def init_worker(now_, active, pools, since=None, batch=0):
+    global now, ACTIVE, POOLS, SINCE, BATCH
+    now, ACTIVE, POOLS, SINCE, BATCH = now_, active, pools, since, batch
+
+def run_shard(seed, table, no, args, fmt, opts=None, keep=False):
+    """Génère un shard en colonnes puis l'encode (dataset.WRITERS[fmt]) en
+    mémoire ; renvoie (octets, lignes, secondes, abonnements, mesures
+    instrument, Frame si `keep` sinon None)."""
+    t0, rec = time.perf_counter(), begin(opts, f"{table}-{no}")
+    g = Shard(seed, table, no)
+    with section("generate"):
+        rows = GENERATORS[table](g, *args)
+        rows = rows if isinstance(rows, Frame) else Frame.from_rows(table, HEADERS[table], rows)
+    with section("encode"):
+        data = WRITERS[fmt].encode(rows)
+    return data, len(rows), time.perf_counter()-t0, g.subs, rec.stop(), rows if keep else None
+
+def shard_results(tasks, seed, fmt, pool, window, opts=None, keep=()):
+    """Résultats des shards dans l'ordre des tâches ; au plus `window` shards
+    en vol sur le pool → mémoire bornée quel que soit le volume (hors tables
+    `keep`, renvoyées en colonnes)."""
+    if pool is None:
+        for table, no, args in tasks: yield run_shard(seed, table, no, args, fmt, opts, table in keep)
+        return
+    pending = deque()
+    for table, no, args in tasks:
+        pending.append(pool.submit(run_shard, seed, table, no, args, fmt, opts, table in keep))
+        if len(pending) >= window: yield pending.popleft().result()
+    while pending: yield pending.popleft().result()
+
+class Sink:
+    """Destination d'une table : fichier out/<table>.csv|.bin[.gz], ou stdin d'un
+    `psql` qui fait le COPY binaire directement dans la table finale (--pipe)."""
+    def __init__(self, out, table, fmt, pipe=None, name=None):
+        self.table, self.writer, self.proc = table, WRITERS[fmt], None
+        self.name = name or table
+        if pipe:
+            sql = [a for stmt in copy_statements(table, HEADERS[table]) for a in ("-c", stmt)]
+            self.proc = subprocess.Popen(shlex.split(pipe) + ["-v", "ON_ERROR_STOP=1"] + sql, stdin=subprocess.PIPE)
+            self.f = self.proc.stdin
+        else:
+            path = out / f"{self.name}.{self.writer.ext}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.f = open(path, "wb")
+        self.f.write(self.writer.header(table, HEADERS[table]))
+
+    def write(self, data, n=0):
+        self.f.write(data)
+
+    def close(self):
+        self.f.write(self.writer.trailer())
+        self.f.close()
+        if self.proc and self.proc.wait():
+            raise SystemExit(f"échec du chargement psql pour la table {self.table}")
+
+def sink_name(table, args, split):
+    """Fichier de destination d'un shard : digital_trace/AAAA-MM si --split-traces."""
+    return f"{table}/{month_of(args[3])}" if split and table == "digital_trace" else table
+
+def run_phase(shards, seed, out, fmt, pipe, pool, window, split=False, report=None, progress=None, datasets=(),
+              chunks=None):
+    """Exécute une phase et écrit les tables (shards concaténés dans l'ordre) ;
+    renvoie {table: (lignes, secondes cumulées)}. Mesures agrégées dans
+    `report`, `progress(événement)` appelé après chaque shard, colonnes des
+    tables voulues par l'un des `datasets` (dataset.Dataset) conservées en
+    mémoire, `chunks` (chunked.Chunks) = morceaux compressés au lieu d'un fichier."""
+    report = report or Report()
+    tasks = [(table, no, args) for table, argss in shards.items() for no, args in enumerate(argss)]
+    stats, sink = {}, None
+    keep = {t for t in shards if any(d.wants(t) for d in datasets)}
+    results = shard_results(tasks, seed, fmt, pool, window, report.options, keep)
+    for (table, no, args), (data, n, dt, subs, measures, rows) in zip(tasks, results):
+        for d in datasets if rows is not None else ():
+            if d.wants(table): d.add(rows)
+        name = sink_name(table, args, split)
+        if sink and sink.name != name: sink.close(); sink = None
+        if sink is None: sink = chunks.sink(out, table, fmt, HEADERS[table]) if chunks else Sink(out, table, fmt, pipe, name)
+        sink.write(data, n)
+        SUBS.extend(subs)   # ordre des shards = ordre des user_id
+        rows, secs = stats.get(table, (0, 0.0)); stats[table] = (rows+n, secs+dt)
+        t = report.add(table, n, len(data), dt, measures)
+        if progress:
+            elapsed = time.perf_counter()-report.t0
+            progress({"table": table, "shard": no+1, "shards": len(shards[table]), "rows": t["rows"],
+                      "bytes": t["bytes"], "rows_per_s": t["rows"]/t["secs"] if t["secs"] else 0,
+                      "elapsed": elapsed})
+        if no == len(shards[table])-1: sink.close(); sink = None
+    return stats
+
+def generate(rows, out=Path("CSV"), seed=0, workers=1, fmt="csv", pipe=None, split=False,
+             report=None, progress=None, append=False, dataset=None, chunks=None, category_depth=CATEGORY_DEPTH):
+    """Génère toutes les tables dans l'ordre des dépendances (clés étrangères) ;
+    fmt = clé de dataset.WRITERS ("csv", "binary", "csv.gz", "binary.gz"),
+    pipe = commande psql pour charger sans fichier,
+    split = digital_trace en un fichier par mois, report = instrument.Report,
+    progress = callback par shard, append = `rows` lignes ajoutées au jeu de
+    out/manifest.json (fichiers du lot dans out/delta/, graine du manifeste),
+    dataset = dataset.Dataset rempli des colonnes générées (lecture en mémoire
+    sans relire les fichiers), chunks = chunked.Chunks : tables en morceaux
+    compressés (fmt non compressé) + out/load_parallel.sh, category_depth =
+    niveaux de l'arbre des catégories (≥ 3, BASE compris) ; renvoie
+    {table: (lignes, secondes)}. notification est dérivée en fin de
+    génération (gen_notifications), ses rappels à venir passent au lot suivant."""
+    global SUBS
+    check_depth(category_depth)
+    old = HighWater.load(out) if append else HighWater(seed)
+    if append and now <= old.now:
+        raise SystemExit(f"--now ({now}) doit suivre le lot précédent ({old.now})")
+    seed, since = old.seed, old.now
+    new, drawn = old.grow(rows, now)
+    dest = out / "delta" if append else out
+    dest.mkdir(parents=True, exist_ok=True)
+    report = report or Report()
+    SUBS = load_subscriptions(out, Subscriptions(), old.batch) if append else Subscriptions()
+    with report.section("pools"):
+        init_worker(now, ACTIVE, ValuePools(shard_seed(seed, "pools", new.batch), min(POOL_SIZE, max(rows.values()))),
+                    since, new.batch)
+    t0, stats = time.perf_counter(), {}
+    booked = load_bookings(out, old.batch) if append else None
+    with report.section("event_slots"):
+        slots = event_slots(seed, old.count("event"), new.count("event"), new.count("place"), new.count("user"), booked)
+    slots += (np.arange(old.count("event"), new.count("event")) + 1,)
+    derived = Dataset(["event", "participation"])
+    datasets = (derived,) if dataset is None else (derived, dataset)
+    for phase in (1, 2):
+        if phase == 1:
+            shards = plan(old, new, drawn, slots=slots, category_depth=category_depth)
+        else:
+            shards = plan(old, new, drawn, old.count("social_account") + stats["social_account"][0])
+            with report.section("subscription_index"):
+                init_worker(now, SUBS.index(), POOLS, SINCE, BATCH)
+        if workers == 1:
+            stats.update(run_phase(shards, seed, dest, fmt, pipe, None, 1, split, report, progress, datasets, chunks))
+        else:
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(now, ACTIVE, POOLS, SINCE, BATCH)) as pool:
+                stats.update(run_phase(shards, seed, dest, fmt, pipe, pool, 2*workers, split, report, progress, datasets,
+                                       chunks))
+    known = None
+    if append:   # titres (make_csv.gen_events) et débuts des anciens événements, 0 si terminés
+        known = np.zeros(old.count("event") + 1, dtype=np.int64)
+        known[booked.event] = booked.start
+        known = [""] + [f"Event #{ev}" for ev in range(1, len(known))], known
+    t1 = time.perf_counter()
+    with report.section("notification"):
+        sink = chunks.sink(dest, "notification", fmt, HEADERS["notification"]) if chunks else \
+            Sink(dest, "notification", fmt, pipe)
+        keep = dataset.add if dataset is not None and dataset.wants("notification") else None
+        n, reminders = gen_notifications(sink, fmt, derived["event"], derived["participation"], known,
+                                         load_reminders(out, old.batch, since) if append else None, keep)
+    stats["notification"] = (n, time.perf_counter()-t1)
+    if chunks:
+        with report.section("chunks"):
+            chunks.close()
+        write_loader(dest, chunks, HEADERS, fmt)
+    if split and not pipe:
+        firsts = {}
+        for lo, _, _, t0, _ in shards["digital_trace"]: firsts.setdefault(month_of(t0), lo)
+        write_loaders(dest / "digital_trace", sorted(firsts.items()), fmt)
+    new.rows.update((table, old.count(table) + n) for table, (n, _) in stats.items())
+    if append and not pipe:
+        write_expected(dest / "high_water.csv", old)
+    new.save(out, SUBS, slots if booked is None else
+             tuple(np.r_[getattr(booked, k), a] for k, a in zip(("place", "start", "end", "event"), slots)), reminders)
+    for table in HEADERS:
+        if table not in stats: continue
+        n, dt = stats[table]
+        print(f"  {table:<15} {n:>13,} lignes {dt:9.2f} s {n/dt if dt else 0:>13,.0f} lignes/s")
+    wall = time.perf_counter()-t0; total = sum(n for n, _ in stats.values())
+    print(f"  {'total':<15} {total:>13,} lignes {wall:9.2f} s {total/wall:>13,.0f} lignes/s ({workers} worker(s))")
+    return stats
+
+# ───────── LIGNE DE COMMANDE ──────────
+def parse_rows(scale, overrides, append=False):
+    """Volumes finaux : BASE_ROWS × scale, puis surcharges `table=N` ; avec
+    append, volumes du lot ajouté (capacités contrôlées par HighWater.grow)."""
+    rows = {t: max(1, round(n*scale)) for t, n in BASE_ROWS.items()} | REF_ROWS
+    for item in overrides:
+        table, _, n = item.partition("=")
+        if table == "notification":
+            raise SystemExit("--rows : notification est dérivée des événements et participations (notifier.py)")
+        if table not in rows:
+            raise SystemExit(f"table inconnue pour --rows : {table!r} (choix : {', '.join(rows)})")
+        if append and table in REF_ROWS:
+            raise SystemExit(f"--append : {table} est un référentiel, généré une seule fois")
+        rows[table] = int(float(n))
+    if append:
+        return {t: n for t, n in rows.items() if t not in REF_ROWS}
+    if rows["category"] < 1:
+        raise SystemExit("il faut au moins 1 catégorie (tag_category)")
+    if rows["user"] < 2:
+        raise SystemExit("il faut au moins 2 utilisateurs (contrainte no_self_like)")
+    # tirages sans remise : pas plus de lignes que de couples possibles (clés primaires)
+    if rows["likes"] > rows["user"]*(rows["user"]-1):
+        raise SystemExit(f"likes > {rows['user']*(rows['user']-1):,} couples (source, cible) distincts possibles")
+    if rows["participation"] > rows["user"]*rows["event"]:
+        raise SystemExit(f"participation > {rows['user']*rows['event']:,} couples (user, event) distincts possibles")
+    return rows
+
+def check_depth(depth):
+    """Profondeur de --category-depth : BASE occupe déjà 2 niveaux."""
+    if depth < BASE_DEPTH + 1:
+        raise SystemExit(f"--category-depth : au moins {BASE_DEPTH + 1} niveaux "
+                         f"(les {BASE_DEPTH} des catégories historiques compris), reçu {depth}")
+    return depth
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Génère les CSV de Le Big Match.")
+    ap.add_argument("--scale", type=float, default=1.0,
+                    help="facteur d'échelle appliqué à tous les volumes (défaut : 1 = jeu v2)")
+    ap.add_argument("--rows", action="append", default=[], metavar="TABLE=N",
+                    help="nombre de lignes pour une table (répétable), ex. likes=5e8")
+    ap.add_argument("--out", type=Path, default=Path("CSV"), help="dossier de sortie (défaut : CSV/)")
+    ap.add_argument("--seed", type=int, default=None,
+                    help="graine maître (défaut : tirée au hasard et affichée)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="nombre de processus (0 = tous les cœurs ; défaut : 1)")
+    ap.add_argument("--now", type=datetime.datetime.fromisoformat, default=None,
+                    help="date de référence « maintenant » (ex. 2025-05-01T12:00) pour rejouer un jeu à l'identique")
+    ap.add_argument("--format", choices=list(WRITERS), default="csv",
+                    help="csv (load.sql) ou binary : COPY binaire PostgreSQL, <table>.bin (load_binary.sql) ; "
+                         "suffixe .gz = fichiers compressés gzip")
+    ap.add_argument("--pipe", metavar="PSQL", default=None,
+                    help="charge directement via COPY … FROM STDIN sans écrire de fichier, "
+                         "ex. --pipe 'psql -d le_big_match' (implique --format binary)")
+    ap.add_argument("--split-traces", action="store_true",
+                    help="digital_trace en un fichier par mois (out/digital_trace/AAAA-MM.*, "
+                         "avec load.sql et attach.sql)")
+    ap.add_argument("--chunk-rows", type=float, metavar="N",
+                    help="chaque table en morceaux d'environ N lignes (multiple des shards) compressés en "
+                         "arrière-plan : out/<table>/NNNNN.*, chargement parallèle out/load_parallel.sh")
+    ap.add_argument("--compress", choices=["gzip", "zstd"], default="gzip",
+                    help="compression des morceaux (zstd : module zstandard ; défaut : gzip)")
+    ap.add_argument("--threads", type=int, default=0,
+                    help="threads de compression des morceaux (0 = tous les cœurs)")
+    ap.add_argument("--report", type=Path, metavar="JSON",
+                    help="rapport structuré : temps generate / encode et sections par table")
+    ap.add_argument("--profile", type=Path, metavar="DOSSIER",
+                    help="capture cProfile par shard, fusionnée en DOSSIER/<table>.prof")
+    ap.add_argument("--sample", type=float, default=0, metavar="MS",
+                    help="échantillonnage de pile toutes les MS ms → <table>.folded (flamegraph)")
+    ap.add_argument("--trace-alloc", action="store_true", help="pic d'allocations Python par shard (tracemalloc)")
+    ap.add_argument("--progress", action="store_true", help="progression shard par shard sur stderr")
+    ap.add_argument("--category-depth", type=int, default=CATEGORY_DEPTH, metavar="D",
+                    help="niveaux de l'arbre des catégories (≥ 3, les 2 niveaux historiques compris) quand "
+                         f"--rows category=N dépasse les 6 catégories historiques (défaut : {CATEGORY_DEPTH})")
+    ap.add_argument("--append", action="store_true",
+                    help="ajoute un lot au jeu de --out (manifest.json) : fichiers du lot seuls dans "
+                         "out/delta/, à charger avec load_delta.sql ; --scale / --rows = volumes du lot")
+    args = ap.parse_args(argv)
+    check_depth(args.category_depth)
+    fmt = "binary" if args.pipe else args.format
+    if args.append and not args.pipe and (fmt != "csv" or args.split_traces):
+        raise SystemExit("--append : lot en CSV d'un seul tenant (load_delta.sql) ou chargé via --pipe")
+    chunks = None
+    if args.chunk_rows:
+        if args.pipe or args.append or args.split_traces:
+            raise SystemExit("--chunk-rows : incompatible avec --pipe, --append et --split-traces")
+        if fmt.endswith(".gz"):   # csv.gz → morceaux csv compressés par le pool
+            fmt, args.compress = fmt[:-3], "gzip"
+        chunks = Chunks(args.chunk_rows, args.compress, args.threads)
+    seed = random.SystemRandom().randrange(2**32) if args.seed is None else args.seed
+    workers = args.workers or os.cpu_count() or 1
+    if args.now: init_worker(args.now.replace(microsecond=0), ACTIVE, POOLS)
+    if not args.append: print(f"graine maître : {seed}")
+    if args.profile: args.profile.mkdir(parents=True, exist_ok=True)
+    report = Report(Options(args.trace_alloc, args.profile, args.sample/1000))
+    generate(parse_rows(args.scale, args.rows, args.append), args.out, seed, workers, fmt, args.pipe,
+             args.split_traces, report, print_progress if args.progress else None, args.append,
+             chunks=chunks, category_depth=args.category_depth)
+    if args.report or args.profile or args.sample or args.trace_alloc:
+        summary = report.write(args.report) if args.report else report.finish()
+        print_report(summary)
+    if args.pipe:
+        print(f"✅ tables chargées (v3) via {args.pipe}")
+    else:
+        dest = args.out / "delta" if args.append else args.out
+        print(f"✅ {'CSV' if fmt.startswith('csv') else 'fichiers COPY binaires'} générés (v3) → dossier {dest}/")
+
+if __name__ == "__main__":
+    sys.exit(main())
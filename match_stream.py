@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+match_stream.py – Le Big Match
+──────────────────────────────
+Maintenance **incrémentale** des matches (équivalent de `mv_matches`,
+the_match.sql) à partir d'un flux d'événements au schéma de likes.csv :
+
+    source_user_id,target_user_id,value,created_at,canceled_at
+
+Chaque ligne remplace la ligne (source, cible) de la table likes (clé
+primaire) : like, nope, ou annulation (canceled_at renseigné). Un like est
+« actif » si value = 'like' et canceled_at IS NULL ; un match (a, b), a < b,
+existe si a → b et b → a sont actifs — exactement le WHERE de mv_matches.
+
+• O(1) par événement (une table de hachage des likes actifs)
+• Deltas publiés : ("+", a, b, like_time_a, like_time_b) / ("-", …)
+• Instantané sur disque (.npz) avec la position dans le fichier en cours
+  (chemin + ligne) et dans --deltas → reprise sans delta perdu ni doublé
+• created_at vide (NULL) conservé : like_time vide dans les deltas, comme
+  mv_matches
+
+Exécution :
+    python match_stream.py CSV/likes.csv --deltas deltas.csv --snapshot matches.npz
+    python match_stream.py CSV/likes.csv --snapshot matches.npz          # reprise (même flux)
+    python match_stream.py nouveaux.csv --snapshot matches.npz --no-skip # flux suivant
+"""
+import argparse, csv, datetime, os, sys, time
+from pathlib import Path
+
+import numpy as np
+
+EPOCH = datetime.datetime(1970, 1, 1)
+SHIFT = 32   # clé d'un like = source << 32 | cible
+NULL_TS = np.iinfo(np.int64).min   # created_at NULL dans les instantanés
+
+def to_epoch(ts):
+    return int((datetime.datetime.fromisoformat(ts) - EPOCH).total_seconds())
+
+def to_iso(t):
+    return "" if t is None else (EPOCH + datetime.timedelta(seconds=t)).strftime("%Y-%m-%d %H:%M:%S")
+
+class MatchEngine:
+    """Likes actifs {clé: created_at ou None} et nombre de matches courants ;
+    `offset` = nombre d'événements consommés (tous fichiers), `source` /
+    `line` = fichier en cours et lignes déjà lues, `written` = octets de
+    --deltas au dernier instantané (pour la reprise)."""
+
+    def __init__(self):
+        self.active = {}
+        self.n_matches = 0
+        self.offset = 0
+        self.source, self.line, self.written = "", 0, 0
+        self.subscribers = []
+
+    def subscribe(self, fn):
+        """`fn(delta)` est appelé pour chaque delta publié."""
+        self.subscribers.append(fn)
+
+    def _match(self, a, b):
+        """Ligne mv_matches du couple {a, b} (a < b), ou None."""
+        ab, ba = a << SHIFT | b, b << SHIFT | a
+        if ab not in self.active or ba not in self.active:
+            return None
+        return a, b, self.active[ab], self.active[ba]
+
+    def apply(self, src, tgt, value, created_at, canceled_at=None):
+        """Applique un événement (created_at en secondes epoch) ; renvoie la
+        liste des deltas (0, 1 ou 2 : une mise à jour = retrait + ajout)."""
+        self.offset += 1
+        a, b = min(src, tgt), max(src, tgt)
+        before = self._match(a, b)
+        key = src << SHIFT | tgt
+        if value == "like" and canceled_at is None:
+            self.active[key] = created_at
+        else:
+            self.active.pop(key, None)
+        after = self._match(a, b)
+        if before == after:
+            return []
+        deltas = []
+        if before:
+            self.n_matches -= 1; deltas.append(("-",) + before)
+        if after:
+            self.n_matches += 1; deltas.append(("+",) + after)
+        for fn in self.subscribers:
+            for d in deltas: fn(d)
+        return deltas
+
+    def consume(self, rows):
+        """Consomme des lignes au format likes.csv (chaînes) ; génère les deltas."""
+        for s, t, value, created, canceled in rows:
+            yield from self.apply(int(s), int(t), value, to_epoch(created) if created else None,
+                                  to_epoch(canceled) if canceled else None)
+
+    def matches(self):
+        """Matches courants (a, b, like_time_a, like_time_b), a < b."""
+        for key, ta in self.active.items():
+            a, b = key >> SHIFT, key & ((1 << SHIFT) - 1)
+            if a < b:
+                ba = b << SHIFT | a
+                if ba in self.active:
+                    yield a, b, ta, self.active[ba]
+
+    # ───────── INSTANTANÉS ──────────
+    def snapshot(self, path):
+        """Écrit l'état (likes actifs + positions) de façon atomique."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        created = (NULL_TS if t is None else t for t in self.active.values())
+        with open(tmp, "wb") as f:
+            np.savez(f, keys=np.fromiter(self.active.keys(), np.int64, len(self.active)),
+                     created=np.fromiter(created, np.int64, len(self.active)),
+                     meta=np.array([self.offset, self.n_matches, self.line, self.written], dtype=np.int64),
+                     source=np.array(self.source))
+        os.replace(tmp, path)
+
+    @classmethod
+    def restore(cls, path):
+        engine = cls()
+        with np.load(path) as z:
+            created = [None if t == NULL_TS else t for t in z["created"].tolist()]
+            engine.active = dict(zip(z["keys"].tolist(), created))
+            engine.offset, engine.n_matches, engine.line, engine.written = (int(x) for x in z["meta"])
+            engine.source = str(z["source"])
+        return engine
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Maintenance incrémentale de mv_matches depuis un flux de likes.")
+    ap.add_argument("events", help="fichier d'événements au schéma de likes.csv")
+    ap.add_argument("--snapshot", help="instantané .npz : repris s'il existe, réécrit à la fin")
+    ap.add_argument("--every", type=int, default=0, help="instantané intermédiaire tous les N événements")
+    ap.add_argument("--no-skip", action="store_true",
+                    help="le fichier a été remplacé par des événements nouveaux sous le même chemin "
+                         "(pas de saut des lignes lues avant l'instantané)")
+    ap.add_argument("--deltas", help="écrit les deltas (op,user_a,user_b,like_time_a,like_time_b) en CSV ; "
+                                     "complété à la reprise d'un instantané")
+    args = ap.parse_args(argv)
+
+    resume = bool(args.snapshot) and Path(args.snapshot).exists()
+    engine = MatchEngine.restore(args.snapshot) if resume else MatchEngine()
+    source = str(Path(args.events).resolve())
+    skip = engine.line if engine.source == source and not args.no_skip else 0   # même fichier : reprise
+    engine.source, engine.line = source, skip
+    out = None
+    if args.deltas:
+        out = open(args.deltas, "a" if resume else "w", newline="", encoding="utf8")
+        if resume and 0 < engine.written < out.tell():
+            out.truncate(engine.written)   # deltas publiés après l'instantané : republiés ci-dessous
+        w = csv.writer(out)
+        if not out.tell(): w.writerow(["op","user_a","user_b","like_time_a","like_time_b"])
+        engine.subscribe(lambda d: w.writerow([d[0], d[1], d[2], to_iso(d[3]), to_iso(d[4])]))
+
+    def save():
+        if out: out.flush(); engine.written = out.tell()
+        engine.snapshot(args.snapshot)
+
+    t0, n = time.perf_counter(), 0
+    with open(args.events, newline="", encoding="utf8") as f:
+        r = csv.reader(f); next(r)
+        for _ in zip(range(skip), r): pass   # lus avant l'instantané
+        for row in r:
+            for _ in engine.consume([row]): pass
+            n += 1; engine.line += 1
+            if args.every and args.snapshot and n % args.every == 0:
+                save()
+    if args.snapshot: save()
+    if out: out.close()
+    dt = time.perf_counter() - t0
+    print(f"{n:,} événements ({skip:,} déjà consommés) en {dt:.2f} s "
+          f"({n/dt if dt else 0:,.0f} év./s) → {engine.n_matches:,} matches")
+
+if __name__ == "__main__":
+    sys.exit(main())
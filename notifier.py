@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+notifier.py – Le Big Match
+──────────────────────────
+Notifications **dérivées des données** au lieu de modèles tirés au hasard :
+confirmations d'inscription (participation.created_at) et rappels avant
+event.starts_at, ordonnancés par un planificateur asyncio puis écrits au
+format de la table notification (user_id, message, sent_at).
+
+• Échéances regroupées par fenêtre de `window` secondes : un tas ne contient
+  qu'une entrée par fenêtre non vide (pas une par rappel), les rappels de la
+  fenêtre sont stockés en tableaux NumPy → millions de rappels, aucune boucle
+  de scrutation : la boucle dort jusqu'à la prochaine échéance du tas et n'est
+  réveillée que si une échéance plus proche est ajoutée
+• Par fenêtre, les rappels d'un même utilisateur et d'un même type sont
+  fusionnés en une seule notification (« Un rappel : Event #3, Event #7
+  commencent dans 1 heure. »)
+• Horloge réelle (service) ou virtuelle (rejeu d'un jeu généré : le temps
+  saute d'échéance en échéance)
+• Une notification est envoyée : émission jusqu'à `now` du jeu (manifest.json)
+  par défaut, rappels postérieurs laissés dans le tas (Scheduler.pending)
+• make_csv.py produit ainsi notification.csv (from_frames, mêmes entrées en
+  mémoire) ; les rappels en attente passent au lot suivant (--append)
+
+Exécution :
+    python notifier.py CSV/event.csv CSV/participation.csv --out /tmp/notification.csv
+    python notifier.py CSV/event.csv CSV/participation.csv --out n.bin --format binary --until 2025-04-01
+    python notifier.py --bench 5e6                 # débit : rappels planifiés / émis par seconde
+"""
+import argparse, asyncio, csv, datetime, heapq, json, sys, time
+from pathlib import Path
+
+import numpy as np
+
+from dataset import STR, WRITERS, Frame
+
+COLUMNS = ["user_id", "message", "sent_at"]
+WINDOW = 60            # regroupement par utilisateur, en secondes
+FLUSH_ROWS = 100_000   # notifications accumulées avant encodage
+
+# Types de notification : (modèle un événement, modèle plusieurs) ; {events} = titres
+KINDS = [
+    ("Votre inscription à l'événement {events} a bien été prise en compte.",
+     "Vos inscriptions aux événements {events} ont bien été prises en compte."),
+    ("Votre participation à l'événement {events} a été confirmée.",
+     "Vos participations aux événements {events} ont été confirmées."),
+    ("N'oubliez pas : l'événement {events} commence bientôt !",
+     "N'oubliez pas : les événements {events} commencent bientôt !"),
+    ("Un rappel : {events} commence dans 1 heure.",
+     "Un rappel : {events} commencent dans 1 heure."),
+]
+INSCRIPTION, CONFIRMATION, VEILLE, UNE_HEURE = range(len(KINDS))
+
+def derive(starts_at, user, event, going, created_at):
+    """Notifications dues pour des participations (tableaux alignés, secondes
+    epoch ; starts_at indexé par event_id) : confirmation à l'inscription,
+    rappel la veille, rappel 1 h avant (« going » seulement). Un rappel dont
+    l'échéance précède l'inscription est omis. Renvoie (due, user, kind, event)."""
+    user, event = np.asarray(user, dtype=np.int64), np.asarray(event, dtype=np.int64)
+    going, created_at = np.asarray(going, dtype=bool), np.asarray(created_at, dtype=np.int64)
+    start = np.asarray(starts_at, dtype=np.int64)[event]
+    veille, heure = start - 86_400, start - 3_600
+    ok_v, ok_h = veille > created_at, going & (heure > created_at)
+    return (np.concatenate([created_at, veille[ok_v], heure[ok_h]]),
+            np.concatenate([user, user[ok_v], user[ok_h]]),
+            np.concatenate([np.where(going, CONFIRMATION, INSCRIPTION),
+                            np.full(ok_v.sum(), VEILLE), np.full(ok_h.sum(), UNE_HEURE)]).astype(np.int8),
+            np.concatenate([event, event[ok_v], event[ok_h]]))
+
+# ───────── HORLOGES ──────────
+class RealClock:
+    """Temps réel : attente de l'échéance, interrompue par `wake`."""
+    def now(self):
+        return time.time()
+
+    async def sleep_until(self, t, wake):
+        """True si réveillé avant `t` (nouvelle échéance plus proche)."""
+        try:
+            await asyncio.wait_for(wake.wait(), max(t - self.now(), 0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+class VirtualClock:
+    """Rejeu : le temps saute à l'échéance suivante, arrondie au pas `step`
+    (toutes les fenêtres échues dans le pas sont émises ensemble)."""
+    def __init__(self, t=0, step=3600):
+        self.t, self.step = t, step
+
+    def now(self):
+        return self.t
+
+    async def sleep_until(self, t, wake):
+        self.t = max(self.t, -(-t // self.step) * self.step)
+        await asyncio.sleep(0)   # laisse tourner les autres tâches (producteurs)
+        return False
+
+# ───────── PLANIFICATEUR ──────────
+class Scheduler:
+    """Tas des fenêtres d'échéance ; `buckets[t]` = morceaux (user, kind, event)
+    à émettre au temps t (fin de fenêtre). `emit(users, messages, sent_at)`
+    reçoit les fenêtres échues à chaque réveil, notifications fusionnées par
+    (fenêtre, user, type)."""
+
+    def __init__(self, emit, titles, window=WINDOW, clock=None):
+        if window < 1:
+            raise ValueError("window ≥ 1 s")
+        self.emit, self.window = emit, int(window)
+        self.titles = np.asarray(titles, dtype=STR)
+        # modèle à un événement coupé autour de {events} : messages composés par colonnes
+        self.pre, self.post = (np.array([m[0].split("{events}")[i] for m in KINDS], dtype=STR) for i in (0, 1))
+        self.clock = clock or RealClock()
+        self.heap, self.buckets = [], {}
+        self.wake = asyncio.Event()
+        self.scheduled = self.sent = self.emitted = 0   # rappels planifiés / émis, notifications
+
+    def __len__(self):
+        """Rappels en attente."""
+        return self.scheduled - self.sent
+
+    def schedule(self, due, user, kind, event):
+        """Ajoute des rappels (tableaux alignés ou scalaires ; due en secondes epoch)."""
+        due = np.atleast_1d(np.asarray(due, dtype=np.int64))
+        if not len(due):
+            return
+        user, kind, event = (np.broadcast_to(np.asarray(x), due.shape) for x in (user, kind, event))
+        b = -(-due // self.window) * self.window   # fin de fenêtre
+        order = np.argsort(b, kind="stable")
+        b, cols = b[order], [x[order] for x in (user, kind, event)]
+        keys, first = np.unique(b, return_index=True)
+        bounds = np.r_[first, len(b)]
+        head = self.heap[0] if self.heap else None
+        for t, lo, hi in zip(keys.tolist(), bounds[:-1].tolist(), bounds[1:].tolist()):
+            parts = self.buckets.get(t)
+            if parts is None:
+                parts = self.buckets[t] = []
+                heapq.heappush(self.heap, t)
+            parts.append([c[lo:hi] for c in cols])
+        self.scheduled += len(due)
+        if head is None or self.heap[0] < head:
+            self.wake.set()
+
+    def message(self, kind, events):
+        one, many = KINDS[kind]
+        return (one if len(events) == 1 else many).format(events=", ".join(self.titles[e] for e in events))
+
+    def flush(self, ts):
+        """Émet les fenêtres `ts` : une notification par (fenêtre, user, type),
+        événements triés, en une passe vectorisée."""
+        parts = [(t, c) for t in ts for c in self.buckets.pop(t)]
+        sent = np.repeat([t for t, _ in parts], [len(c[0]) for _, c in parts])
+        user, kind, event = (np.concatenate(c) for c in zip(*(c for _, c in parts)))
+        order = np.lexsort((event, kind, user, sent))
+        sent, user, kind, event = sent[order], user[order], kind[order], event[order]
+        first = np.flatnonzero(np.r_[True, (sent[1:] != sent[:-1]) | (user[1:] != user[:-1])
+                                     | (kind[1:] != kind[:-1])])
+        bounds = np.r_[first, len(user)]
+        k = kind[first]
+        msgs = self.pre[k] + self.titles[event[first]] + self.post[k]
+        for i in np.flatnonzero(np.diff(bounds) > 1).tolist():   # plusieurs événements fusionnés
+            msgs[i] = self.message(int(k[i]), event[bounds[i]:bounds[i+1]].tolist())
+        self.sent += len(user)
+        self.emitted += len(msgs)
+        self.emit(user[first], msgs, sent[first])
+
+    def pending(self):
+        """Rappels restés dans le tas : (due = fin de fenêtre, user, kind, event),
+        replanifiables tels quels par schedule()."""
+        parts = [(t, c) for t in sorted(self.buckets) for c in self.buckets[t]]
+        if not parts:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.int8), np.zeros(0, np.int64)
+        due = np.repeat([t for t, _ in parts], [len(c[0]) for _, c in parts]).astype(np.int64)
+        return (due, *(np.concatenate(c) for c in zip(*(c for _, c in parts))))
+
+    async def run(self, until=None):
+        """Émet les fenêtres dans l'ordre jusqu'à épuisement du tas (ou `until`,
+        secondes epoch) ; une échéance ajoutée pendant l'attente la raccourcit."""
+        while self.heap and (until is None or self.heap[0] <= until):
+            if self.heap[0] > self.clock.now():
+                self.wake.clear()
+                if await self.clock.sleep_until(self.heap[0], self.wake):
+                    continue
+            now = self.clock.now() if until is None else min(self.clock.now(), until)
+            due = []
+            while self.heap and self.heap[0] <= now:
+                due.append(heapq.heappop(self.heap))
+            self.flush(due)
+
+# ───────── ENTRÉES / SORTIE ──────────
+def epoch(values):
+    return np.array(values, dtype="datetime64[s]").astype(np.int64)
+
+def load_events(path):
+    """event.csv → (titres, starts_at) indexés par event_id (rang ; 0 inutilisé)."""
+    with open(path, newline="", encoding="utf8") as f:
+        r = csv.reader(f)
+        head = next(r)
+        i, j = head.index("title"), head.index("starts_at")
+        rows = [(row[i], row[j]) for row in r]
+    titles, starts = zip(*rows) if rows else ((), ())
+    return [""] + list(titles), np.r_[0, epoch(starts)]
+
+def load_participation(path):
+    """participation.csv → (user, event, going, created_at)."""
+    with open(path, newline="", encoding="utf8") as f:
+        r = csv.reader(f)
+        next(r)
+        rows = list(r)
+    u, e, s, c = zip(*rows) if rows else ((), (), (), ())
+    return np.array(u, dtype=np.int64), np.array(e, dtype=np.int64), np.array(s) == "going", epoch(c)
+
+def from_frames(events, participation, known=None):
+    """Mêmes entrées depuis des dataset.Frame (make_csv.generate) : `events` =
+    événements du lot, qui suivent `known` = (titres, starts_at) des lots
+    précédents indexés par event_id (défaut : aucun)."""
+    titles, starts = known or ([""], np.zeros(1, np.int64))
+    status = participation["status"]
+    return (list(titles) + events["title"].values().tolist(), np.r_[starts, events["starts_at"].data],
+            (participation["user_id"].data, participation["event_id"].data,
+             status.labels[status.data] == "going", participation["created_at"].data))
+
+class Output:
+    """Notifications encodées par blocs (dataset.WRITERS) dans `path`, ou
+    confiées à `sink` (make_csv.Sink / chunked.ChunkSink : en-tête et fin à sa
+    charge) ; `keep(frame)` reçoit aussi chaque bloc en colonnes."""
+    def __init__(self, path, fmt="csv", sink=None, keep=None):
+        self.writer, self.sink, self.keep = WRITERS[fmt], sink, keep
+        self.f = sink or open(path, "wb")
+        if sink is None:
+            self.f.write(self.writer.header("notification", COLUMNS))
+        self.parts, self.pending, self.rows = [], 0, 0
+
+    def __call__(self, users, msgs, sent_at):
+        self.parts.append((users, msgs, sent_at.astype("datetime64[s]")))
+        self.pending += len(users)
+        if self.pending >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            u, m, t = zip(*self.parts)
+            frame = Frame.of("notification", COLUMNS, np.concatenate(u),
+                             np.concatenate(m), np.concatenate(t))
+            if self.keep: self.keep(frame)
+            data = self.writer.encode(frame)
+            self.f.write(data, len(frame)) if self.sink else self.f.write(data)
+            self.rows += len(frame)
+        self.parts, self.pending = [], 0
+
+    def close(self):
+        self.flush()
+        if self.sink is None:
+            self.f.write(self.writer.trailer())
+        self.f.close()
+
+# ───────── BANC ──────────
+async def bench(n, window=WINDOW, step=3600, seed=0):
+    """n rappels aléatoires (n/20 utilisateurs, n/50 événements, 60 jours),
+    planifiés par lots de 1 M puis émis en temps virtuel."""
+    rng = np.random.default_rng(seed)
+    n_users, n_events = max(n // 20, 1), max(n // 50, 1)
+    titles = [""] + [f"Event #{e}" for e in range(1, n_events + 1)]
+    t0 = 1_740_000_000
+    count = lambda users, msgs, sent_at: None
+    sched = Scheduler(count, titles, window, VirtualClock(t0, step))
+    tick = time.perf_counter()
+    for lo in range(0, n, 1_000_000):
+        k = min(1_000_000, n - lo)
+        sched.schedule(t0 + rng.integers(0, 60*86_400, k), rng.integers(1, n_users + 1, k),
+                       rng.integers(0, len(KINDS), k).astype(np.int8), rng.integers(1, n_events + 1, k))
+    t_sched, buckets = time.perf_counter() - tick, len(sched.heap)
+    tick = time.perf_counter()
+    await sched.run()
+    t_run = time.perf_counter() - tick
+    print(f"{n:,} rappels planifiés en {t_sched:.2f} s ({n/t_sched:,.0f}/s), {buckets:,} fenêtres de {window} s")
+    print(f"{sched.emitted:,} notifications émises en {t_run:.2f} s ({n/t_run:,.0f} rappels/s)")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Notifications dérivées des événements et participations.")
+    ap.add_argument("events", nargs="?", help="chemin de event.csv")
+    ap.add_argument("participation", nargs="?", help="chemin de participation.csv")
+    ap.add_argument("--out", type=Path, help="fichier notification produit")
+    ap.add_argument("--format", choices=list(WRITERS), default="csv")
+    ap.add_argument("--window", type=int, default=WINDOW, help="fenêtre de regroupement par utilisateur, en s")
+    ap.add_argument("--step", type=int, default=3600,
+                    help="pas du rejeu en s : fenêtres échues émises ensemble (sortie identique)")
+    ap.add_argument("--until", type=datetime.datetime.fromisoformat,
+                    help="n'émet que les notifications jusqu'à cette date (défaut : `now` de "
+                         "manifest.json à côté de event.csv)")
+    ap.add_argument("--bench", type=float, metavar="N", help="banc de débit sur N rappels aléatoires")
+    args = ap.parse_args(argv)
+    if args.bench:
+        asyncio.run(bench(int(args.bench), args.window, args.step))
+        return
+    if not (args.events and args.participation and args.out):
+        ap.error("event.csv, participation.csv et --out sont requis (ou --bench N)")
+    manifest = Path(args.events).parent / "manifest.json"
+    if args.until is None and manifest.exists():
+        args.until = datetime.datetime.fromisoformat(json.loads(manifest.read_text(encoding="utf8"))["now"])
+    if args.until is None:
+        ap.error(f"--until requis : {manifest} introuvable (date de référence du jeu)")
+    t0 = time.perf_counter()
+    titles, starts = load_events(args.events)
+    due, user, kind, event = derive(starts, *load_participation(args.participation))
+    out = Output(args.out, args.format)
+    sched = Scheduler(out, titles, args.window, VirtualClock(step=args.step))
+    sched.schedule(due, user, kind, event)
+    asyncio.run(sched.run(int(np.datetime64(args.until, "s").astype(np.int64))))
+    out.close()
+    print(f"{sched.scheduled:,} rappels → {out.rows:,} notifications jusqu'au {args.until} "
+          f"({len(sched):,} en attente) en {time.perf_counter()-t0:.2f} s → {args.out}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+pgcopy.py – Le Big Match
+────────────────────────
+Encodeur / décodeur du format **COPY binaire** de PostgreSQL
+(`COPY … WITH (FORMAT binary)`) pour les tables de create_tables.sql.
+
+• En-tête PGCOPY, tuples typés (SMALLINT, INTEGER, NUMERIC, DATE, TIMESTAMP,
+  JSONB, TEXT et ENUM), marqueur de fin -1
+• Valeurs d'entrée = lignes des générateurs de make_csv.py : "" ou None ⇒ NULL,
+  dates / horodatages en objets Python ou en chaînes ISO
+• Instructions COPY directement dans les tables finales (pipe `psql`), sans
+  second parsing du CSV ; table temporaire seulement pour répartir
+  tag_assignment dans les 3 tables spécifiques
+
+Relecture d'un fichier (contrôle hors ligne) :
+    python pgcopy.py CSV/likes.bin > likes.csv
+"""
+import csv, datetime, json, struct, sys
+from decimal import Decimal
+from pathlib import Path
+
+HEADER  = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+TRAILER = struct.pack(">h", -1)
+
+PG_EPOCH      = datetime.datetime(2000, 1, 1)
+PG_EPOCH_DAYS = PG_EPOCH.toordinal()
+NUMERIC_NEG   = 0x4000
+
+# Types des colonnes, dans l'ordre des en-têtes CSV de make_csv.py
+SCHEMAS = {
+    "user":           ["text","text","int2","numeric","text","text","text","enum","enum","date"],
+    "place":          ["text","text","text","text"],
+    "tag":            ["text"],
+    "category":       ["text","int4"],
+    "tag_category":   ["int4","int4"],
+    "category_closure": ["int4","int4","int4"],
+    "event":          ["text","text","int4","timestamp","timestamp","numeric","int4","int4","text"],
+    "subscription":   ["int4","date","date"],
+    "social_account": ["int4","enum","text"],
+    "digital_trace":  ["int4","text","timestamp","jsonb"],
+    "likes":          ["int4","int4","enum","timestamp","timestamp"],
+    "participation":  ["int4","int4","enum","timestamp"],
+    "tag_assignment": ["int4","enum","int4"],
+    "notification":   ["int4","text","timestamp"],
+    "event_recommendation": ["int4","int4","int4","int4"],   # recommend.py
+}
+
+# ───────── ENCODAGE ──────────
+def enc_text(v):
+    return str(v).encode("utf8")
+
+def enc_int2(v):
+    return struct.pack(">h", int(v))
+
+def enc_int4(v):
+    return struct.pack(">i", int(v))
+
+def enc_numeric(v):
+    """NUMERIC : ndigits, weight, sign, dscale puis chiffres en base 10000."""
+    sign, digits, exp = Decimal(str(v)).as_tuple()
+    s = "".join(map(str, digits))
+    dscale = max(-exp, 0)
+    if exp >= 0:
+        ip, fp = s + "0"*exp, ""
+    else:
+        ip, fp = s[:exp].lstrip("0"), s[exp:].rjust(dscale, "0")
+    ip = "0"*(-len(ip) % 4) + ip
+    fp = fp + "0"*(-len(fp) % 4)
+    groups = [int((ip+fp)[i:i+4]) for i in range(0, len(ip+fp), 4)]
+    weight = len(ip)//4 - 1
+    while groups and groups[0] == 0:
+        groups.pop(0); weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+    return struct.pack(f">hhHH{len(groups)}H", len(groups), weight,
+                       NUMERIC_NEG if sign and groups else 0, dscale, *groups)
+
+def enc_date(v):
+    if isinstance(v, str):
+        v = datetime.date.fromisoformat(v)
+    return struct.pack(">i", v.toordinal() - PG_EPOCH_DAYS)
+
+def enc_timestamp(v):
+    if isinstance(v, str):
+        v = datetime.datetime.fromisoformat(v)
+    return struct.pack(">q", (v - PG_EPOCH) // datetime.timedelta(microseconds=1))
+
+def enc_jsonb(v):
+    return b"\x01" + (v if isinstance(v, str) else json.dumps(v)).encode("utf8")
+
+ENCODERS = {
+    "text": enc_text, "enum": enc_text, "int2": enc_int2, "int4": enc_int4,
+    "numeric": enc_numeric, "date": enc_date, "timestamp": enc_timestamp, "jsonb": enc_jsonb,
+}
+NULL = struct.pack(">i", -1)
+
+class BinaryWriter:
+    """Même interface que `csv.writer` (writerow) mais produit des tuples COPY
+    binaires ; l'en-tête et le marqueur de fin sont écrits par l'appelant."""
+    def __init__(self, f, table):
+        self.f = f
+        self.count = struct.pack(">h", len(SCHEMAS[table]))
+        self.encoders = [ENCODERS[t] for t in SCHEMAS[table]]
+
+    def writerow(self, row):
+        out = [self.count]
+        for enc, v in zip(self.encoders, row):
+            if v is None or v == "":
+                out.append(NULL)
+            else:
+                b = enc(v)
+                out.append(struct.pack(">i", len(b))); out.append(b)
+        self.f.write(b"".join(out))
+
+    def writerows(self, rows):
+        for row in rows: self.writerow(row)
+
+# ───────── DÉCODAGE ──────────
+def dec_numeric(b):
+    n, weight, sign, dscale = struct.unpack_from(">hhHH", b)
+    groups = struct.unpack_from(f">{n}H", b, 8)
+    value = sum((Decimal(g).scaleb(4*(weight - i)) for i, g in enumerate(groups)), Decimal(0))
+    value = value.quantize(Decimal(1).scaleb(-dscale))
+    return -value if sign == NUMERIC_NEG else value
+
+DECODERS = {
+    "text": lambda b: b.decode("utf8"), "enum": lambda b: b.decode("utf8"),
+    "int2": lambda b: struct.unpack(">h", b)[0], "int4": lambda b: struct.unpack(">i", b)[0],
+    "numeric": dec_numeric,
+    "date": lambda b: datetime.date.fromordinal(struct.unpack(">i", b)[0] + PG_EPOCH_DAYS),
+    "timestamp": lambda b: PG_EPOCH + datetime.timedelta(microseconds=struct.unpack(">q", b)[0]),
+    "jsonb": lambda b: b[1:].decode("utf8"),
+}
+
+def read_copy(f, table):
+    """Relit un flux COPY binaire ; produit des tuples Python (None = NULL)."""
+    if f.read(len(HEADER)) != HEADER:
+        raise ValueError("en-tête PGCOPY invalide")
+    decoders = [DECODERS[t] for t in SCHEMAS[table]]
+    while True:
+        (n,) = struct.unpack(">h", f.read(2))
+        if n == -1:
+            return
+        if n != len(decoders):
+            raise ValueError(f"{table} : {n} colonnes lues, {len(decoders)} attendues")
+        row = []
+        for dec in decoders:
+            (size,) = struct.unpack(">i", f.read(4))
+            row.append(None if size == -1 else dec(f.read(size)))
+        yield tuple(row)
+
+# ───────── CHARGEMENT DIRECT ──────────
+def copy_statements(table, columns):
+    """Instructions SQL pour charger le flux binaire de `table` depuis STDIN,
+    directement dans la table finale (cf. load_binary.sql pour les fichiers)."""
+    cols = ",".join(columns)
+    if table == "tag_assignment":   # table polymorphe → 3 tables spécifiques
+        return ["CREATE TEMP TABLE tmp_ta (tag_id INTEGER, target_type target_kind, target_id INTEGER)",
+                f"COPY tmp_ta({cols}) FROM STDIN WITH (FORMAT binary)"] + [
+                f"INSERT INTO tag_{k}_assignment SELECT tag_id, target_id FROM tmp_ta WHERE target_type = '{k}'"
+                for k in ("user", "event", "place")]
+    return [f'COPY "{table}"({cols}) FROM STDIN WITH (FORMAT binary)']
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        raise SystemExit("usage : python pgcopy.py CSV/<table>.bin")
+    path = Path(argv[0])
+    w = csv.writer(sys.stdout)
+    with open(path, "rb") as f:
+        for row in read_copy(f, path.stem):
+            w.writerow(["" if v is None else v for v in row])
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+reco_cache.py – Le Big Match
+────────────────────────────
+Cache des recommandations de the_match.sql (top-k par utilisateur) tenu à
+jour par les événements likes, participation et attributs d'utilisateur :
+une requête répétée coûte une lecture de dict au lieu des deux CTE.
+
+• Deux niveaux : classement par cohorte (city, gender, orientation) =
+  2 × matches effectifs + matches potentiels de la cohorte, puis top-k de
+  l'utilisateur (exclusion de soi-même pour 'other') ; une entrée
+  utilisateur retient les versions de sa cohorte et de ses participations,
+  vérifiées à la lecture
+• Cohortes normalisées (cohort_key) : 'other' partagée par tous les genres
+  d'une ville, profils sans potentiel réunis en une cohorte vide
+• Invalidation par dépendances : un score qui change pour l'événement e
+  n'invalide que les cohortes qui classent e, ou dont le seuil (score du
+  dernier classé) est atteint par son nouveau score
+• Matches effectifs par événement tenus en O(partenaires) à chaque delta de
+  match (match_stream.MatchEngine) ou de participation 'going' ; comptes
+  potentiels de candidate_index.CandidateIndex
+• LRU bornés (OrderedDict) : `capacity` utilisateurs, `cohorts` classements
+  (défaut : 2 × cohortes des profils chargés) ; un succès utilisateur
+  rafraîchit sa cohorte, une cohorte évincée sans entrée utilisateur ne
+  périme rien ; statistiques hits / misses / périmées (données ou éviction) /
+  évictions / invalidations
+
+Ex æquo : event_id croissant (comme recommend.py).
+
+Exécution :
+    python reco_cache.py CSV --k 10 --requests 100000 --updates 0.05 --check 200
+"""
+import argparse, csv, random, sys, time
+from bisect import bisect_right, insort
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from candidate_index import OPPOSITE, CandidateIndex
+from match_stream import MatchEngine
+from recommend import GENDERS, ORIENTATIONS, NULL, Going, Recommender, effective_matches
+
+EMPTY = ("", "", "")   # cohorte sans potentiel : 2 × matches effectifs seuls
+
+def cohort_key(profile):
+    """Clé de classement d'un profil : mêmes comptes potentiels ⇒ même clé
+    ('other' : la ville seule ; ni ville ni orientation utile : EMPTY)."""
+    city, gender, orientation = profile
+    if city and orientation == "other":
+        return city, "", "other"
+    if city and orientation == "heterosexual" and gender in OPPOSITE:
+        return profile
+    return EMPTY
+
+class RecoCache:
+    """Top-k de the_match.sql par utilisateur, invalidé par dépendances.
+
+    `index` (CandidateIndex) porte profils, participations 'going' et comptes
+    potentiels, `engine` (MatchEngine) les likes actifs ; les mises à jour
+    passent par like(), participation(), add_user() et update_user()."""
+
+    def __init__(self, index, engine, n_events, k=10, capacity=100_000, cohorts=None):
+        self.index, self.engine, self.n_events = index, engine, n_events
+        if cohorts is None:   # marge pour les cohortes créées par les mises à jour
+            cohorts = max(2 * len({cohort_key(p) for p in index.profile.values()}), 1024)
+        self.k, self.capacity, self.max_cohorts = min(k, n_events), capacity, cohorts
+        self.attendees = {}                    # event_id → set(user_id) 'going'
+        for u, events in index.going.items():
+            for e in events:
+                self.attendees.setdefault(e, set()).add(u)
+        self.partners = {}                     # user_id → set(user_id) matchés
+        a, b = [], []
+        for x, y, _, _ in engine.matches():
+            self.partners.setdefault(x, set()).add(y); self.partners.setdefault(y, set()).add(x)
+            a.append(x); b.append(y)
+        users = [u for u, events in index.going.items() for _ in events]
+        events = [e for evs in index.going.values() for e in evs]
+        going = Going(np.array(users, np.int64), np.array(events, np.int64), max(index.profile, default=0), n_events)
+        self.base = 2 * effective_matches(going, np.array(a, np.int64), np.array(b, np.int64))
+        self.base[0] = -1                      # case 0 : jamais classée
+        self.ranked = OrderedDict()            # cohorte → (événements, scores, seuil)
+        self.listed = {}                       # event_id → cohortes qui le classent
+        self.cutoffs = []                      # (seuil, cohorte) triés
+        self.cohort_version = Counter()
+        self.evicted = {}                      # cohorte → version due à sa dernière éviction
+        self.refs = Counter()                  # cohorte → entrées utilisateur qui la lisent
+        self.user_version = Counter()
+        self.users = OrderedDict()             # user_id → (événements, scores, cohorte, versions)
+        self.stats = Counter()
+        engine.subscribe(self._on_match)
+
+    @classmethod
+    def from_csv(cls, csv_dir, **kw):
+        index = CandidateIndex.from_csv(csv_dir / "user.csv", csv_dir / "participation.csv")
+        engine = MatchEngine()
+        with open(csv_dir / "likes.csv", newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            next(r)
+            for _ in engine.consume(r):
+                pass
+        with open(csv_dir / "event.csv", newline="", encoding="utf8") as f:
+            n_events = sum(1 for _ in f) - 1
+        return cls(index, engine, n_events, **kw)
+
+    # ───────── LECTURE ──────────
+    def get(self, uid):
+        """(event_id, indices) des k premiers événements recommandés à uid."""
+        key = cohort_key(self.index.profile[uid])
+        entry = self.users.get(uid)
+        if entry is not None:
+            versions = (self.cohort_version[key], self.user_version[uid])
+            if entry[2] == key and entry[3] == versions:
+                self.stats["hits"] += 1
+                self.users.move_to_end(uid)
+                if key in self.ranked: self.ranked.move_to_end(key)
+                return entry[0], entry[1]
+            evicted = entry[2] == key and entry[3][1] == versions[1] and self.evicted.get(key) == versions[0]
+            self.stats["stale_evicted" if evicted else "stale"] += 1
+            self.refs[entry[2]] -= 1
+        self.stats["misses"] += 1
+        events, scores = self._compute(uid, key)
+        self.users[uid] = (events, scores, key, (self.cohort_version[key], self.user_version[uid]))
+        self.refs[key] += 1
+        self.users.move_to_end(uid)
+        if len(self.users) > self.capacity:
+            self.refs[self.users.popitem(last=False)[1][2]] -= 1
+            self.stats["evictions"] += 1
+        return events, scores
+
+    def _compute(self, uid, key):
+        city, _, orientation = key
+        if orientation != "other":   # même liste pour toute la cohorte
+            events, scores = self._cohort(key, self.k)
+            return events[:self.k], scores[:self.k]
+        # u.user_id != ui.user_id : -1 là où uid est 'going' ; au plus deg(uid) reculs
+        mine = self.index.going[uid]
+        events, scores = self._cohort(key, self.k + len(mine))
+        adj = scores - np.fromiter((e in mine for e in events.tolist()), bool, len(events))
+        top = np.lexsort((events, -adj))[:self.k]
+        return events[top], adj[top]
+
+    def _counts(self, key):
+        """Comptes potentiels {event_id: n} de la cohorte (avant exclusion de soi)."""
+        city, gender, orientation = key
+        if not city:
+            return {}
+        if orientation == "heterosexual":
+            return self.index.by_gender.get((city, OPPOSITE.get(gender)), {})
+        return self.index.by_city.get(city, {}) if orientation == "other" else {}
+
+    def _cohort(self, key, depth):
+        """Classement de la cohorte sur `depth` événements au moins (recalculé
+        s'il est absent ou trop court)."""
+        entry = self.ranked.get(key)
+        if entry is not None and len(entry[0]) >= min(depth, self.n_events):
+            self.stats["cohort_hits"] += 1
+            self.ranked.move_to_end(key)
+            return entry[0], entry[1]
+        self.stats["cohort_misses"] += 1
+        if entry is not None:   # liste prolongée : le début reste valide, versions inchangées
+            self._forget(key, stale=False)
+        score = self.base.copy()
+        counts = self._counts(key)
+        if counts:
+            score[np.fromiter(counts.keys(), np.int64, len(counts))] += np.fromiter(counts.values(), np.int64, len(counts))
+        depth = min(depth, self.n_events)
+        if depth < self.n_events:   # ex æquo du seuil repris : départage par event_id
+            cand = np.flatnonzero(score >= score[np.argpartition(-score, depth - 1)[depth - 1]])
+        else:
+            cand = np.arange(1, self.n_events + 1)
+        top = cand[np.lexsort((cand, -score[cand]))][:depth]
+        events, scores = top, score[top]
+        # seuil : un événement hors liste qui l'atteint peut y entrer (aucun si la liste est complète)
+        cutoff = int(scores[-1]) if depth < self.n_events else None
+        self.ranked[key] = (events, scores, cutoff)
+        for e in events.tolist():
+            self.listed.setdefault(e, set()).add(key)
+        if cutoff is not None:
+            insort(self.cutoffs, (cutoff, key))
+        if len(self.ranked) > self.max_cohorts:
+            old = next(iter(self.ranked))
+            self.stats["cohort_evictions"] += 1
+            self._forget(old, stale=self.refs[old] > 0)   # sans lecteur : rien à périmer
+            if self.refs[old]:
+                self.evicted[old] = self.cohort_version[old]
+                self.stats["evicted_entries"] += self.refs[old]
+        return events, scores
+
+    # ───────── INVALIDATION ──────────
+    def _forget(self, key, stale=True):
+        """Retire le classement d'une cohorte ; ses utilisateurs deviennent
+        périmés si `stale`."""
+        events, _, cutoff = self.ranked.pop(key)
+        for e in events.tolist():
+            keys = self.listed[e]
+            keys.discard(key)
+            if not keys:
+                del self.listed[e]
+        if cutoff is not None:
+            del self.cutoffs[bisect_right(self.cutoffs, (cutoff, key)) - 1]
+        if stale:
+            self.cohort_version[key] += 1
+
+    def _changed(self, e, up, keys=None):
+        """Score de e modifié pour les cohortes `keys` (None = toutes : matches
+        effectifs) ; `up` = hausse. Invalide les cohortes qui classent e et, en
+        cas de hausse, celles dont le seuil est atteint."""
+        if keys is None:
+            hit = set(self.listed.get(e, ()))
+            if up:   # potentiel ≤ participants 'going' de e : borne des seuils à examiner
+                bound = self.base[e] + len(self.attendees.get(e, ()))
+                for cutoff, key in self.cutoffs[:bisect_right(self.cutoffs, (bound, (chr(0x10FFFF),)))]:
+                    if key not in hit and self.base[e] + self._counts(key).get(e, 0) >= cutoff:
+                        hit.add(key)
+        else:
+            hit = set()
+            for key in keys:
+                entry = self.ranked.get(key)
+                if entry is None:
+                    continue
+                if key in self.listed.get(e, ()) or (
+                        up and self.base[e] + self._counts(key).get(e, 0) >= entry[2]):
+                    hit.add(key)
+        for key in hit:
+            self._forget(key)
+            self.evicted.pop(key, None)
+            self.stats["invalidations"] += 1
+
+    def _count_keys(self, profile):
+        """Cohortes dont le potentiel lit les comptes (city, gender) de ce profil."""
+        city, gender, _ = profile
+        if not city:
+            return []
+        keys = [(city, "", "other")]
+        if gender in OPPOSITE:
+            keys.append((city, OPPOSITE[gender], "heterosexual"))
+        return keys
+
+    def _effective(self, e, delta):
+        if delta:
+            self.base[e] += 2 * delta
+            self._changed(e, delta > 0)
+
+    def _on_match(self, delta):
+        sign, a, b = delta[0], delta[1], delta[2]
+        if sign == "+":
+            self.partners.setdefault(a, set()).add(b); self.partners.setdefault(b, set()).add(a)
+        else:
+            self.partners[a].discard(b); self.partners[b].discard(a)
+        for e in self.index.going.get(a, set()) & self.index.going.get(b, set()):
+            self._effective(e, 1 if sign == "+" else -1)
+
+    # ───────── ÉVÉNEMENTS ──────────
+    def like(self, src, tgt, value="like", created_at=0, canceled_at=None):
+        """Ligne de likes (remplace le couple (src, tgt)) ; matches via MatchEngine."""
+        return self.engine.apply(src, tgt, value, created_at, canceled_at)
+
+    def participation(self, uid, event, status=None):
+        """Statut de (uid, event) : 'going', 'interested' ou None (supprimée)."""
+        was = event in self.index.going[uid]
+        self.index.set_participation(uid, event, status)
+        now = event in self.index.going[uid]
+        if was == now:
+            return
+        attendees = self.attendees.setdefault(event, set())
+        (attendees.add if now else attendees.discard)(uid)
+        self.user_version[uid] += 1
+        sign = 1 if now else -1
+        self._effective(event, sign * len(self.partners.get(uid, set()) & attendees))
+        self._changed(event, now, self._count_keys(self.index.profile[uid]))
+
+    def add_user(self, uid, city="", gender="", orientation=""):
+        self.index.add_user(uid, city, gender, orientation)   # aucune participation : comptes inchangés
+
+    def update_user(self, uid, city=None, gender=None, orientation=None):
+        """Attributs modifiés (None = inchangé) : comptes de ses événements
+        transférés de l'ancienne cohorte à la nouvelle."""
+        old = self.index.profile[uid]
+        self.index.update_user(uid, city, gender, orientation)
+        new = self.index.profile[uid]
+        if new == old:
+            return
+        self.user_version[uid] += 1
+        if new[:2] == old[:2]:   # orientation seule : comptes inchangés
+            return
+        for e in self.index.going[uid]:
+            self._changed(e, False, self._count_keys(old))
+            self._changed(e, True, self._count_keys(new))
+
+    def summary(self):
+        s = dict(self.stats)
+        lookups = s.get("hits", 0) + s.get("misses", 0)
+        s["hit_rate"] = s.get("hits", 0) / lookups if lookups else 0.0
+        s["entries"], s["cohorts"] = len(self.users), len(self.ranked)
+        s["cohort_limit"] = self.max_cohorts
+        return s
+
+# ───────── VÉRIFICATION ──────────
+def reference(cache):
+    """Top-k recalculé de zéro (recommend.Recommender) sur l'état courant."""
+    ix = cache.index
+    n = max(ix.profile)
+    profiles = [ix.profile.get(u, ("", "", "")) for u in range(n + 1)]
+    _, city = np.unique(np.array([""] + [p[0] for p in profiles[1:]]), return_inverse=True)
+    gender = np.array([GENDERS.get(p[1], NULL) for p in profiles], np.int64)
+    orientation = np.array([ORIENTATIONS.get(p[2], NULL) for p in profiles], np.int64)
+    users = [u for u, evs in ix.going.items() for _ in evs]
+    events = [e for evs in ix.going.values() for e in evs]
+    going = Going(np.array(users, np.int64), np.array(events, np.int64), n, cache.n_events)
+    pairs = np.array([(x, y) for x, y, _, _ in cache.engine.matches()], np.int64).reshape(-1, 2)
+    return Recommender(city.astype(np.int64) - 1, gender, orientation, going, (pairs[:, 0], pairs[:, 1])).top_k(cache.k)
+
+def random_update(cache, rng, cities, users):
+    """Un événement aléatoire : like / annulation, participation ou attribut."""
+    u = rng.choice(users)
+    kind = rng.random()
+    if kind < 0.4:
+        v = rng.choice(users)
+        if v != u:
+            cache.like(u, v, "like", 0, None if rng.random() < 0.8 else 1)
+    elif kind < 0.9:
+        cache.participation(u, rng.randint(1, cache.n_events), rng.choice(["going", "going", "interested", None]))
+    else:
+        cache.update_user(u, city=rng.choice(cities)) if rng.random() < 0.7 else \
+            cache.update_user(u, gender=rng.choice(["man", "woman"]), orientation=rng.choice(["heterosexual", "other"]))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Cache des recommandations the_match.sql avec invalidation.")
+    ap.add_argument("csv_dir", type=Path, help="dossier des CSV (user, event, participation, likes)")
+    ap.add_argument("--k", type=int, default=10, help="événements recommandés par utilisateur")
+    ap.add_argument("--capacity", type=int, default=100_000, help="entrées utilisateur conservées (LRU)")
+    ap.add_argument("--cohorts", type=int, default=None,
+                    help="classements de cohorte conservés (LRU ; défaut : 2 × cohortes des profils chargés)")
+    ap.add_argument("--requests", type=int, default=100_000, help="requêtes simulées")
+    ap.add_argument("--updates", type=float, default=0.05, help="part des opérations qui sont des mises à jour")
+    ap.add_argument("--check", type=int, default=0, metavar="N",
+                    help="compare N utilisateurs tirés au recalcul complet (recommend.py) à la fin")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    cache = RecoCache.from_csv(args.csv_dir, k=args.k, capacity=args.capacity, cohorts=args.cohorts)
+    users = sorted(cache.index.profile)
+    cities = sorted({p[0] for p in cache.index.profile.values() if p[0]})
+    print(f"{len(users):,} utilisateurs, {cache.n_events:,} événements, {len(cache.engine.active):,} likes actifs "
+          f"chargés en {time.perf_counter()-t0:.2f} s")
+    rng = random.Random(args.seed)
+    hot = users[:max(1, len(users) // 10)]   # 80 % des requêtes sur 10 % des utilisateurs
+    t_get = t_upd = 0.0
+    n_upd = 0
+    for _ in range(args.requests):
+        if rng.random() < args.updates:
+            t = time.perf_counter(); random_update(cache, rng, cities, users); t_upd += time.perf_counter() - t
+            n_upd += 1
+        u = rng.choice(hot) if rng.random() < 0.8 else rng.choice(users)
+        t = time.perf_counter(); cache.get(u); t_get += time.perf_counter() - t
+    s = cache.summary()
+    print(f"{args.requests:,} requêtes : {t_get/max(args.requests, 1)*1e6:.1f} µs/requête, "
+          f"taux de succès {s['hit_rate']:.1%} ; {n_upd:,} mises à jour : {t_upd/max(n_upd, 1)*1e6:.1f} µs")
+    print("    " + ", ".join(f"{k} {v:,}" for k, v in sorted(s.items()) if k != "hit_rate"))
+    if args.check:
+        events, scores = reference(cache)
+        bad = [u for u in rng.sample(users, min(args.check, len(users)))
+               if not (np.array_equal(cache.get(u)[0], events[u]) and np.array_equal(cache.get(u)[1], scores[u]))]
+        print(f"vérification : {args.check - len(bad)} / {args.check} identiques au recalcul complet")
+        return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+recommend.py – Le Big Match
+───────────────────────────
+Recommandations d'événements de the_match.sql calculées pour **tous** les
+utilisateurs en une passe, au lieu d'une exécution par :current_user_id :
+
+    recommendation_index = 2 × matches effectifs + matches potentiels
+
+• Matches effectifs : indépendants de l'utilisateur → un vecteur par
+  événement, calculé une fois (mv_matches × participation 'going')
+• Matches potentiels : ne dépendent que de (ville, genre, orientation) →
+  comptes 'going' agrégés par (ville, genre, événement) en CSR, classement
+  calculé une fois par groupe ; seule l'exclusion de soi-même (orientation
+  'other') est corrigée par utilisateur, par blocs vectorisés
+• Sortie : top-k (user_id, rank, event_id, recommendation_index) en CSV ou
+  COPY binaire, table event_recommendation de create_tables.sql
+
+Ex æquo (ordre non défini par le SQL) : event_id croissant.
+
+Exécution :
+    python recommend.py CSV --k 10 --out CSV/event_recommendation.csv
+    python recommend.py CSV --k 10 --format binary --out CSV/event_recommendation.bin
+"""
+import argparse, csv, sys, time
+from pathlib import Path
+
+import numpy as np
+
+import pgcopy
+from likes_graph import CHUNK, LikesGraph
+
+GENDERS      = {"man": 0, "woman": 1}             # NULL → 2
+ORIENTATIONS = {"heterosexual": 0, "other": 1}    # NULL → 2
+HET, OTHER, NULL = 0, 1, 2
+BATCH = 4096   # utilisateurs corrigés ensemble (matrice BATCH × profondeur)
+
+def csr_positions(indptr, rows):
+    """Positions des éléments des lignes `rows` d'un CSR (concaténées) et,
+    pour chacune, l'index dans `rows` de sa ligne."""
+    deg = indptr[rows + 1] - indptr[rows]
+    owner = np.repeat(np.arange(len(rows)), deg)
+    pos = np.arange(deg.sum()) - np.repeat(np.cumsum(deg) - deg, deg) + indptr[rows][owner]
+    return pos, owner
+
+class Going:
+    """Participations status = 'going', en CSR par utilisateur."""
+
+    def __init__(self, users, events, n_users, n_events):
+        self.n_events = n_events
+        self.width = np.int64(n_events + 1)
+        self.keys = np.unique(np.asarray(users, np.int64) * self.width + events)
+        self.user, self.event = np.divmod(self.keys, self.width)
+        self.indptr = np.r_[0, np.cumsum(np.bincount(self.user, minlength=n_users + 1))]
+
+    def degree(self, users):
+        return self.indptr[users + 1] - self.indptr[users]
+
+    def contains(self, users, events):
+        """Masque : (users[i], events[i]) est une participation 'going'."""
+        if not len(self.keys):
+            return np.zeros(len(users), dtype=bool)
+        k = np.asarray(users, np.int64) * self.width + events
+        pos = np.minimum(np.searchsorted(self.keys, k), len(self.keys) - 1)
+        return self.keys[pos] == k
+
+class SparseCounts:
+    """Comptes par (groupe, événement) en CSR : row(g) → (événements, comptes)."""
+
+    def __init__(self, groups, events, n_groups, width):
+        keys, self.counts = np.unique(np.asarray(groups, np.int64) * width + events, return_counts=True)
+        g, self.events = np.divmod(keys, width)
+        self.indptr = np.r_[0, np.cumsum(np.bincount(g, minlength=n_groups))]
+
+    def row(self, g):
+        s = slice(self.indptr[g], self.indptr[g + 1])
+        return self.events[s], self.counts[s]
+
+def effective_matches(going, a, b):
+    """CTE `effective` : pour chaque événement, nombre de matches (a, b) dont
+    les deux membres sont 'going' (événements de a testés chez b)."""
+    eff = np.zeros(going.n_events + 1, np.int64)
+    for i in range(0, len(a), CHUNK):
+        ca, cb = a[i:i + CHUNK], b[i:i + CHUNK]
+        pos, owner = csr_positions(going.indptr, ca)
+        ev = going.event[pos]
+        eff += np.bincount(ev[going.contains(cb[owner], ev)], minlength=len(eff))
+    return eff
+
+class Recommender:
+    """Indice de recommandation de the_match.sql pour tous les utilisateurs.
+
+    `city`, `gender`, `orientation` : codes indexés par user_id (case 0
+    inutilisée) ; city = -1 pour NULL, gender / orientation = NULL (2)."""
+
+    def __init__(self, city, gender, orientation, going, matches):
+        self.city, self.gender, self.orientation = city, gender, orientation
+        self.going = going
+        self.n_users, self.n_events = len(city) - 1, going.n_events
+        self.base = 2 * effective_matches(going, *matches)
+        ids = np.arange(1, self.n_events + 1)
+        self.order = ids[np.lexsort((ids, -self.base[1:]))]   # classement sans matches potentiels
+        c = city[going.user]
+        ok = c >= 0                                            # u.city = ui.city : NULL exclu
+        n_cities = int(city.max(initial=-1)) + 1
+        self.by_bucket = SparseCounts(c[ok] * 3 + gender[going.user][ok], going.event[ok],
+                                      n_cities * 3, going.width)
+        self.by_city = SparseCounts(c[ok], going.event[ok], n_cities, going.width)
+
+    def potential(self, city, gender, orientation):
+        """CTE `potential` d'un groupe (ville, genre, orientation), sans
+        l'exclusion de l'utilisateur courant : (événements, comptes)."""
+        empty = np.zeros(0, np.int64), np.zeros(0, np.int64)
+        if city < 0:
+            return empty
+        if orientation == HET:   # u.gender <> ui.gender : NULL des deux côtés exclu
+            return empty if gender == NULL else self.by_bucket.row(city * 3 + 1 - gender)
+        if orientation == OTHER:
+            return self.by_city.row(city)
+        return empty
+
+    def ranked(self, events, pot, depth):
+        """`depth` premiers événements pour un vecteur creux de matches
+        potentiels : hors de `events`, l'ordre est celui de `self.order`."""
+        head = self.order[:depth + len(events)]
+        head = head[~np.isin(head, events)]
+        cand = np.concatenate([events, head])
+        score = self.base[cand] + np.concatenate([pot, np.zeros(len(head), np.int64)])
+        top = np.lexsort((cand, -score))[:depth]
+        return cand[top], score[top]
+
+    def top_k(self, k):
+        """Matrices (n_users + 1) × k des événements et indices : ligne u = top-k de u."""
+        k = min(k, self.n_events)
+        out_e = np.zeros((self.n_users + 1, k), np.int32)
+        out_s = np.zeros((self.n_users + 1, k), np.int64)
+        users = np.arange(1, self.n_users + 1)
+        groups = ((self.city + 1) * 3 + self.gender) * 3 + self.orientation
+        order = np.argsort(groups[1:], kind="stable")
+        bounds = np.flatnonzero(np.diff(groups[1:][order])) + 1
+        for members in np.split(users[order], bounds) if k and self.n_users else ():
+            u = members[0]
+            c, o = self.city[u], self.orientation[u]
+            ev, pot = self.potential(c, self.gender[u], o)
+            if o != OTHER or c < 0:   # même liste pour tout le groupe
+                out_e[members], out_s[members] = self.ranked(ev, pot, k)
+                continue
+            # u.user_id != ui.user_id : -1 sur les événements où u lui-même est 'going' ;
+            # au plus deg(u) candidats reculent, k + deg(u) candidats suffisent
+            cand, score = self.ranked(ev, pot, k + int(self.going.degree(members).max()))
+            for i in range(0, len(members), BATCH):
+                m = members[i:i + BATCH]
+                self_going = self.going.contains(np.repeat(m, len(cand)), np.tile(cand, len(m)))
+                adj = score - self_going.reshape(len(m), len(cand))
+                top = np.argsort(-adj * self.going.width + cand, axis=1, kind="stable")[:, :k]
+                out_e[m], out_s[m] = cand[top], np.take_along_axis(adj, top, 1)
+        return out_e, out_s
+
+# ───────── CHARGEMENT ──────────
+def read_chunks(path):
+    with open(path, newline="", encoding="utf8") as f:
+        r = csv.reader(f)
+        header = next(r)
+        while True:
+            rows = [row for _, row in zip(range(CHUNK), r)]
+            if not rows:
+                return
+            yield header, rows
+
+def load_users(path):
+    """user.csv → codes (ville, genre, orientation) indexés par user_id."""
+    cities, genders, orients = [], [], []
+    for header, rows in read_chunks(path):
+        ic, ig, io = (header.index(c) for c in ("city", "gender", "orientation"))
+        cities += [row[ic] for row in rows]
+        genders.append(np.array([GENDERS.get(row[ig], NULL) for row in rows], np.int64))
+        orients.append(np.array([ORIENTATIONS.get(row[io], NULL) for row in rows], np.int64))
+    # "" (NULL) toujours présent (case 0) et trié en tête → code -1
+    _, city = np.unique(np.array([""] + cities), return_inverse=True)
+    city = city - 1
+    return (city.astype(np.int64), np.concatenate([[NULL]] + genders),
+            np.concatenate([[NULL]] + orients))
+
+def load_going(path):
+    """participation.csv → (user_id, event_id) des lignes status = 'going'."""
+    users, events = [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+    for _, rows in read_chunks(path):
+        u, e, s, _ = zip(*rows)
+        keep = np.array(s) == "going"
+        users.append(np.array(u, np.int64)[keep]); events.append(np.array(e, np.int64)[keep])
+    return np.concatenate(users), np.concatenate(events)
+
+def count_rows(path):
+    return sum(len(rows) for _, rows in read_chunks(path))
+
+def write(path, events, scores, fmt):
+    n, k = events.shape[0] - 1, events.shape[1]
+    cols = (np.repeat(np.arange(1, n + 1), k), np.tile(np.arange(1, k + 1), n),
+            events[1:].ravel(), scores[1:].ravel())
+    rows = zip(*(c.tolist() for c in cols))
+    if fmt == "binary":
+        with open(path, "wb") as f:
+            f.write(pgcopy.HEADER)
+            pgcopy.BinaryWriter(f, "event_recommendation").writerows(rows)
+            f.write(pgcopy.TRAILER)
+    else:
+        with open(path, "w", newline="", encoding="utf8") as f:
+            w = csv.writer(f)
+            w.writerow(["user_id", "rank", "event_id", "recommendation_index"])
+            w.writerows(rows)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Top-k de the_match.sql pour tous les utilisateurs.")
+    ap.add_argument("csv_dir", type=Path, help="dossier des CSV (user, event, participation, likes)")
+    ap.add_argument("--k", type=int, default=10, help="événements recommandés par utilisateur")
+    ap.add_argument("--out", type=Path, default=Path("event_recommendation.csv"))
+    ap.add_argument("--format", choices=("csv", "binary"), default="csv")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    city, gender, orientation = load_users(args.csv_dir / "user.csv")
+    n_users, n_events = len(city) - 1, count_rows(args.csv_dir / "event.csv")
+    going = Going(*load_going(args.csv_dir / "participation.csv"), n_users, n_events)
+    matches = LikesGraph.from_csv(args.csv_dir / "likes.csv", n_users).reciprocal(active_only=True)
+    print(f"{n_users:,} utilisateurs, {n_events:,} événements, {len(going.keys):,} 'going', "
+          f"{len(matches[0]):,} matches chargés en {time.perf_counter()-t0:.2f} s")
+
+    t0 = time.perf_counter()
+    events, scores = Recommender(city, gender, orientation, going, matches).top_k(args.k)
+    print(f"top-{events.shape[1]} calculé en {time.perf_counter()-t0:.2f} s")
+    t0 = time.perf_counter()
+    write(args.out, events, scores, args.format)
+    print(f"{args.out} écrit en {time.perf_counter()-t0:.2f} s")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -118,6 +118,22 @@ WITH RECURSIVE category_tree AS (
 )
 SELECT * FROM category_tree;
 
+-- 13B. Même résultat par la table de fermeture (category_closure) : racine et
+-- profondeur de chaque catégorie sans récursion
+SELECT c.category_id, c.name, c.parent_id, r.ancestor_id AS root_id, r.depth
+FROM category c
+JOIN category_closure r ON r.descendant_id = c.category_id
+JOIN category root      ON root.category_id = r.ancestor_id AND root.parent_id IS NULL;
+
+-- 13C. Cumul tag → catégorie → racine : événements par catégorie racine
+SELECT root.name, COUNT(DISTINCT ea.event_id) AS events
+FROM tag_event_assignment ea
+JOIN tag_category tc     ON tc.tag_id = ea.tag_id
+JOIN category_closure r  ON r.descendant_id = tc.category_id
+JOIN category root       ON root.category_id = r.ancestor_id AND root.parent_id IS NULL
+GROUP BY root.name
+ORDER BY events DESC;
+
 -- 14. Top 5 utilisateurs par nombre de likes reçus par mois (fenêtrage)
 SELECT pseudo, month, likes_received
 FROM (
@@ -158,10 +174,9 @@ LEFT JOIN participation p ON e.event_id = p.event_id
 WHERE p.user_id IS NULL;
 
 -- 19. Nombre de tags par utilisateur
-SELECT target_id AS user_id, COUNT(tag_id) AS tag_count
-FROM tag_assignment
-WHERE target_type = 'user'
-GROUP BY target_id;
+SELECT user_id, COUNT(tag_id) AS tag_count
+FROM tag_user_assignment
+GROUP BY user_id;
 
 -- 20. Nombre de comptes sociaux par utilisateur
 SELECT u.pseudo, COUNT(sa.sa_id) AS social_accounts
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+scheduling.py – Le Big Match
+────────────────────────────
+Calendrier des lieux : index d'intervalles par place_id pour placer les
+événements sans chevauchement (make_csv.py) et répondre à « événements du
+lieu P pendant la fenêtre W » — même structure pour contrôler un event.csv.
+
+• Clé triée `place·SPAN + starts_at` (secondes) et `reach` = max cumulé des
+  ends_at du lieu, décalé comme la clé : chevauchements de [a, b) = tranche
+  entre deux searchsorted, O(log n + k), à l'unité ou par lots NumPy
+• Placement : les demandes qui ne touchent aucune autre (cas courant) sont
+  acceptées telles quelles en un seul tri ; les autres, par event_id
+  croissant, prennent le premier créneau libre du lieu à partir de l'heure
+  demandée (début dans la plage d'ouverture, sinon le jour suivant)
+• Listes triées (bisect) des créneaux occupés matérialisées pour les seuls
+  lieux en conflit → coût quasi linéaire à des millions d'événements
+• ends_at NULL = événement ponctuel (occupe la seconde de starts_at)
+
+Exécution :
+    python scheduling.py CSV/event.csv                      # conflits existants
+    python scheduling.py CSV/event.csv --place 3 --during 2025-04-01T00:00 2025-04-08T00:00
+    python scheduling.py --bench 1e6 --places 25000          # placement
+"""
+import argparse, csv, sys, time
+from bisect import bisect_right
+
+import numpy as np
+
+SPAN = 1 << 34                   # > secondes epoch jusqu'en 2514 : sépare les lieux
+DAY = 86400
+OPENING = (8*3600, 20*3600)      # débuts autorisés dans chaque jour (make_csv.gen_events : +8 h … +20 h)
+
+def seconds(ts):
+    """datetime64, datetime, chaînes ISO (vide = NULL → NaT) ou entiers → secondes epoch int64."""
+    a = np.asarray(ts)
+    if a.dtype.kind in "UOS":
+        a = a.astype("datetime64[s]")
+    if np.issubdtype(a.dtype, np.datetime64):
+        return a.astype("datetime64[s]").astype(np.int64)
+    return a.astype(np.int64, copy=False)
+
+class PlaceIndex:
+    """Intervalles [start, end) par lieu, triés par (place, start).
+
+    `event` = identifiant de chaque intervalle (rang + 1 par défaut), `order`
+    = position d'origine ; `reach` = place·SPAN + max des fins du lieu jusqu'à
+    la position (croissant sur tout l'index)."""
+
+    def __init__(self, place, start, end, event=None):
+        place, start, end = np.asarray(place, dtype=np.int64), seconds(start), seconds(end)
+        end = np.maximum(end, start + 1)   # NULL (NaT) ou durée nulle → ponctuel
+        keys = place*SPAN + start
+        self.order = np.argsort(keys, kind="stable")
+        self.keys, self.place = keys[self.order], place[self.order]
+        self.start, self.end = start[self.order], end[self.order]
+        self.event = self.order + 1 if event is None else np.asarray(event, dtype=np.int64)[self.order]
+        self.reach = np.maximum.accumulate(self.place*SPAN + self.end) if len(keys) else keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_csv(cls, path):
+        """event.csv (format make_csv.py / load.sql) ; event_id = rang de la
+        ligne, événements sans lieu ignorés."""
+        with open(path, newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            head = next(r)
+            p, s, e = head.index("place_id"), head.index("starts_at"), head.index("ends_at")
+            rows = [(i, row[p], row[s], row[e]) for i, row in enumerate(r, 1) if row[p]]
+        ids, place, start, end = zip(*rows) if rows else ((), (), (), ())
+        return cls(np.array(place, dtype=np.int64), np.array(start, dtype=str), np.array(end, dtype=str), ids)
+
+    def _range(self, place, lo, hi):
+        """Tranche candidate [i, j) : débuts < hi, fin cumulée > lo."""
+        place = np.asarray(place, dtype=np.int64)*SPAN
+        return (np.searchsorted(self.reach, place + seconds(lo), side="right"),
+                np.searchsorted(self.keys, place + seconds(hi), side="left"))
+
+    # ───────── REQUÊTES ──────────
+    def overlapping(self, place, lo, hi):
+        """event_id des intervalles du lieu `place` qui chevauchent [lo, hi), par début."""
+        i, j = self._range(place, lo, hi)
+        return self.event[i:j][self.end[i:j] > seconds(lo)]
+
+    def busy(self, places, lo, hi):
+        """Version vectorisée du test « au moins un chevauchement » : le premier
+        candidat de la tranche porte la fin cumulée, donc chevauche forcément."""
+        i, j = self._range(places, lo, hi)
+        return i < j
+
+    def clash(self):
+        """Masque (ordre d'origine) des intervalles qui en chevauchent un autre du même lieu."""
+        hit = np.zeros(len(self), dtype=bool)
+        if len(self) > 1:
+            hit[1:] = self.keys[1:] < self.reach[:-1]          # un précédent finit après mon début
+            hit[:-1] |= self.keys[1:] < self.place[:-1]*SPAN + self.end[:-1]   # le suivant commence avant ma fin
+        mask = np.empty_like(hit)
+        mask[self.order] = hit
+        return mask
+
+    def conflicts(self):
+        """Couples (event_id, event_id) du même lieu qui se chevauchent, le
+        premier commençant le premier."""
+        j = np.arange(len(self))
+        i = np.searchsorted(self.reach, self.keys, side="right")   # premier précédent finissant après keys[j]
+        k = np.minimum(i, j)
+        n = j - k
+        later = np.repeat(j, n)
+        earlier = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n) + np.repeat(k, n)
+        keep = self.place[earlier]*SPAN + self.end[earlier] > self.keys[later]
+        return self.event[earlier[keep]], self.event[later[keep]]
+
+# ───────── PLACEMENT ──────────
+class Calendar:
+    """Créneaux occupés modifiables : `index` (PlaceIndex) figé, listes triées
+    d'intervalles disjoints (contigus fusionnés) créées au premier accès d'un lieu.
+    Débuts autorisés : origin + jour·DAY + [opening[0], opening[1]]."""
+
+    def __init__(self, index, origin, opening=OPENING):
+        self.index, self.origin, self.opening = index, int(seconds(origin)), opening
+        self.lists = {}
+
+    def _busy(self, place):
+        if place not in self.lists:
+            ix = self.index
+            i, j = np.searchsorted(ix.keys, [place*SPAN, (place+1)*SPAN])
+            start, reach = ix.start[i:j], ix.reach[i:j] - place*SPAN
+            first = np.r_[True, start[1:] > reach[:-1]] if j > i else np.zeros(0, dtype=bool)
+            last = np.r_[first[1:], True] if j > i else first
+            self.lists[place] = (start[first].tolist(), reach[last].tolist())
+        return self.lists[place]
+
+    def fit(self, t):
+        """Premier début autorisé ≥ t."""
+        day, off = divmod(t - self.origin, DAY)
+        lo, hi = self.opening
+        if off < lo:
+            return self.origin + day*DAY + lo
+        return self.origin + (day+1)*DAY + lo if off > hi else t
+
+    def book(self, place, t, length):
+        """Réserve le premier créneau libre de `length` secondes à partir de t ;
+        renvoie son début. Intervalles contigus fusionnés : une plage pleine
+        se franchit en un pas."""
+        starts, ends = self._busy(place)
+        t = self.fit(t)
+        while True:
+            i = bisect_right(ends, t)
+            if i == len(starts) or starts[i] >= t + length:
+                break
+            t = self.fit(ends[i])
+        glue_left, glue_right = i and ends[i-1] == t, i < len(starts) and starts[i] == t + length
+        if glue_left and glue_right:
+            ends[i-1] = ends.pop(i)
+            del starts[i]
+        elif glue_left:
+            ends[i-1] = t + length
+        elif glue_right:
+            starts[i] = t
+        else:
+            starts.insert(i, t)
+            ends.insert(i, t + length)
+        return t
+
+def schedule(place, start, end, origin, booked=None, opening=OPENING):
+    """Place les demandes (place, start, end) sans chevauchement entre elles
+    ni avec `booked` (PlaceIndex des événements existants) : durées et lieux
+    conservés, seuls les débuts en conflit sont repoussés. Renvoie (début,
+    fin) en secondes et le nombre d'événements déplacés."""
+    place, start = np.asarray(place, dtype=np.int64), seconds(start)
+    length = np.maximum(seconds(end) - start, 1)
+    end = start + length
+    moved = PlaceIndex(place, start, end).clash()
+    if booked is not None and len(booked):
+        moved |= booked.busy(place, start, end)
+    moved = np.flatnonzero(moved)
+    if not len(moved):
+        return start, end, 0
+    ok = np.ones(len(place), dtype=bool)
+    ok[moved] = False
+    if booked is not None and len(booked):
+        fixed = PlaceIndex(np.r_[booked.place, place[ok]], np.r_[booked.start, start[ok]], np.r_[booked.end, end[ok]])
+    else:
+        fixed = PlaceIndex(place[ok], start[ok], end[ok])
+    cal, start = Calendar(fixed, origin, opening), start.copy()
+    for i, p, t, n in zip(moved.tolist(), place[moved].tolist(), start[moved].tolist(), length[moved].tolist()):
+        start[i] = cal.book(p, t, n)
+    return start, start + length, len(moved)
+
+# ───────── LIGNE DE COMMANDE ──────────
+def bench(n, places, seed=0):
+    """Demandes façon make_csv.gen_events (60 jours, +8 h … +20 h, 2 à 6 h)."""
+    rng = np.random.default_rng(seed)
+    origin = seconds(np.datetime64("2025-03-20T12:00"))
+    start = origin + rng.integers(1, 61, n)*DAY + rng.integers(8, 21, n)*3600
+    end = start + rng.integers(2, 7, n)*3600
+    place = rng.integers(1, places+1, n)
+    t0 = time.perf_counter()
+    s, e, moved = schedule(place, start, end, origin)
+    dt = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ix = PlaceIndex(place, s, e)
+    a, _ = ix.conflicts()
+    print(f"{n:,} événements / {places:,} lieux : {moved:,} déplacés, placés en {dt:.2f} s "
+          f"({n/dt:,.0f} /s) ; contrôle {len(a)} conflit(s) en {time.perf_counter()-t0:.2f} s")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Calendrier des lieux : conflits et occupation de event.csv.")
+    ap.add_argument("events", nargs="?", help="chemin de event.csv")
+    ap.add_argument("--place", type=int, help="lieu interrogé (avec --during)")
+    ap.add_argument("--during", nargs=2, metavar=("DEBUT", "FIN"), help="fenêtre [DEBUT, FIN) ISO")
+    ap.add_argument("--max", type=int, default=10, help="conflits affichés")
+    ap.add_argument("--bench", type=float, metavar="N", help="placement de N demandes aléatoires")
+    ap.add_argument("--places", type=int, default=25_000, help="lieux du banc d'essai")
+    args = ap.parse_args(argv)
+    if args.bench:
+        return bench(int(args.bench), args.places)
+    if not args.events:
+        ap.error("chemin de event.csv ou --bench requis")
+    t0 = time.perf_counter()
+    ix = PlaceIndex.from_csv(args.events)
+    if args.place is not None:
+        lo, hi = args.during or ("1970-01-01", "2514-01-01")
+        ids = ix.overlapping(args.place, lo, hi)
+        print(f"lieu {args.place} : {len(ids):,} événement(s) sur [{lo}, {hi})")
+        for e in ids[:args.max].tolist(): print(f"    event {e}")
+        return
+    a, b = ix.conflicts()
+    print(f"{len(ix):,} événements, {len(a):,} chevauchement(s) ({time.perf_counter()-t0:.2f} s)")
+    for x, y in zip(a[:args.max].tolist(), b[:args.max].tolist()): print(f"    event {x} ↔ event {y}")
+    return 1 if len(a) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+subscription_index.py – Le Big Match
+────────────────────────────────────
+Index des intervalles d'abonnement : « l'utilisateur U a-t-il un abonnement
+actif le jour D ? » en O(log n), à l'unité (bisect) ou par lots NumPy.
+
+Sémantique **identique** au trigger `trg_check_subscription_active`
+(create_tables.sql), avec CURRENT_DATE = D :
+
+    start_date <= D AND (end_date IS NULL OR end_date >= D)
+
+Structure : une seule clé triée `uid·SPAN + start_date` (les abonnements d'un
+même utilisateur sont contigus et triés par début) et, pour chaque position,
+`reach` = max des end_date des abonnements de l'utilisateur commencés avant
+(inclus). Le dernier abonnement commencé ≤ D porte donc la fin la plus
+lointaine atteinte : actif ⇔ reach ≥ D. Les chevauchements sont gérés.
+
+Dates manipulées en ordinal (`date.toordinal()`).
+"""
+import csv, datetime
+from bisect import bisect_right
+
+import numpy as np
+
+SPAN = 1 << 22                  # > date.max.toordinal() : sépare les utilisateurs
+OPEN = np.iinfo(np.int32).max   # end_date NULL = abonnement sans fin
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+def to_ordinals(days):
+    """Convertit un tableau datetime64 (ou déjà en ordinaux) en ordinaux int64."""
+    days = np.asarray(days)
+    if np.issubdtype(days.dtype, np.datetime64):
+        return days.astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    return days.astype(np.int64, copy=False)
+
+class SubscriptionIndex:
+    """Index « abonné actif le jour D » construit à partir des colonnes
+    (user_id, start_date, end_date) en ordinaux ; end = 0 ⇒ end_date NULL."""
+
+    def __init__(self, uids, starts, ends):
+        keys = np.asarray(uids, dtype=np.int64) * SPAN + np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        ends = np.where(ends[order] <= 0, OPEN, ends[order])
+        # max cumulé des fins, remis à zéro à chaque changement d'utilisateur :
+        # chaque bloc est décalé au-dessus du précédent avant l'accumulate
+        uid = self.keys // SPAN
+        block = np.cumsum(np.r_[0, uid[1:] != uid[:-1]]) * (int(OPEN) + 1)
+        self.reach = (np.maximum.accumulate(block + ends) - block).astype(np.int32) \
+            if len(ends) else np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Charge un subscription.csv (format make_csv.py / load.sql)."""
+        uids, starts, ends = [], [], []
+        with open(path, newline="", encoding="utf8") as f:
+            for row in csv.DictReader(f):
+                uids.append(int(row["user_id"]))
+                starts.append(datetime.date.fromisoformat(row["start_date"]).toordinal())
+                ends.append(datetime.date.fromisoformat(row["end_date"]).toordinal() if row["end_date"] else 0)
+        return cls(uids, starts, ends)
+
+    def is_active(self, uid, day):
+        """Abonnement actif pour `uid` le jour `day` (date ou ordinal) ?"""
+        if isinstance(day, datetime.date):
+            day = day.toordinal()
+        j = bisect_right(self.keys, uid * SPAN + day) - 1
+        return bool(j >= 0 and self.keys[j] // SPAN == uid and self.reach[j] >= day)
+
+    def active_batch(self, uids, days):
+        """Version vectorisée : tableaux (uid, jour) → tableau booléen."""
+        uids = np.asarray(uids, dtype=np.int64)
+        days = to_ordinals(days)
+        j = np.searchsorted(self.keys, uids * SPAN + days, side="right") - 1
+        if not len(self.keys):
+            return np.zeros(uids.shape, dtype=bool)
+        jj = np.maximum(j, 0)
+        return (j >= 0) & (self.keys[jj] // SPAN == uids) & (self.reach[jj] >= days)
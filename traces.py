@@ -0,0 +1,146 @@
+"""
+traces.py – Le Big Match
+────────────────────────
+Pipeline digital_trace (de loin la plus grosse table) : lignes produites en
+flux **dans l'ordre des horodatages**, payloads typés sérialisés par lots.
+
+• Types et payloads de la v1 : activity, like, post, comment, share, reaction
+• Sérialisation par lots : un gabarit JSON par type rempli colonne par
+  colonne, textes Faker échappés une seule fois par réservoir (plus de
+  `json.dumps` par ligne)
+• Plan de shards aligné sur les mois : chaque shard couvre une tranche de
+  temps disjointe et trie ses propres horodatages → table entière triée
+  sans tri externe, mémoire bornée par la taille d'un shard
+• Sortie par mois (make_csv.py --split-traces) : <out>/digital_trace/AAAA-MM.csv|.bin
+  avec load.sql (un \\copy indépendant par mois, exécutables en parallèle) et
+  attach.sql (un mois = une partition de digital_trace partitionnée par ts,
+  schéma create_traces_partitioned.sql ; trace_id = rang dans la table
+  comme pour un chargement séquentiel)
+"""
+import json
+
+import numpy as np
+
+from dataset import WRITERS
+from value_pools import choice
+
+TRACE_TYPES = ["activity", "like", "post", "comment", "share", "reaction"]
+COLUMNS = "sa_id,trace_type,ts,payload"
+
+# ───────── PAYLOADS ──────────
+_ESCAPED = {}
+
+def escaped(pools, field):
+    """Réservoir `field` déjà encodé en chaînes JSON (guillemets compris)."""
+    key = (id(pools), field)
+    if key not in _ESCAPED:
+        _ESCAPED[key] = np.array([json.dumps(s) for s in getattr(pools, field)])
+    return _ESCAPED[key]
+
+def sample_json(pools, field, rng, n):
+    pool = escaped(pools, field)
+    return pool[rng.integers(0, len(pool), n)].tolist()
+
+def ids(rng, n):
+    return rng.integers(1000, 10000, n).tolist()
+
+def activity(rng, n, pools):
+    ip = rng.integers(1, 255, (n, 4)).tolist()
+    return ['{"action": "%s", "device": "%s", "ip": "%d.%d.%d.%d"}' % (a, d, *q) for a, d, q in zip(
+        choice(rng, ["login", "logout", "profile_update", "browse"], n),
+        choice(rng, ["mobile", "desktop", "tablet"], n), ip)]
+
+def like(rng, n, pools):
+    return ['{"target_type": "%s", "target_id": %d}' % r for r in zip(
+        choice(rng, ["post", "comment", "photo"], n), ids(rng, n))]
+
+def post(rng, n, pools):
+    media = np.where(rng.random(n) < 0.5, '""', np.array(sample_json(pools, "image_url", rng, n)))
+    return ['{"content": %s, "media": %s}' % r for r in zip(sample_json(pools, "sentence", rng, n), media.tolist())]
+
+def comment(rng, n, pools):
+    return ['{"comment": %s, "post_id": %d}' % r for r in zip(sample_json(pools, "sentence", rng, n), ids(rng, n))]
+
+def share(rng, n, pools):
+    return ['{"shared_type": "%s", "shared_id": %d}' % r for r in zip(
+        choice(rng, ["event", "post", "profile"], n), ids(rng, n))]
+
+def reaction(rng, n, pools):
+    return ['{"reaction": "%s", "target_id": %d}' % r for r in zip(
+        choice(rng, ["like", "love", "haha", "wow", "sad", "angry"], n), ids(rng, n))]
+
+BUILDERS = [activity, like, post, comment, share, reaction]   # ordre de TRACE_TYPES
+
+def payloads(rng, types, pools):
+    """Payload JSON de chaque ligne, `types` = indices dans TRACE_TYPES."""
+    out = np.empty(len(types), dtype=object)
+    for code, build in enumerate(BUILDERS):
+        idx = np.flatnonzero(types == code)
+        if len(idx):
+            out[idx] = build(rng, len(idx), pools)
+    return out.tolist()
+
+def sorted_ts(rng, t0, t1, n):
+    """n horodatages uniformes dans [t0, t1) (secondes epoch), triés."""
+    return np.sort(rng.integers(t0, max(t1, t0 + 1), n)).astype("datetime64[s]")
+
+# ───────── PLAN PAR MOIS ──────────
+def epoch(dt):
+    return int(np.datetime64(dt, "s").astype(np.int64))
+
+def month_of(t):
+    """Secondes epoch → 'AAAA-MM'."""
+    return str(np.datetime64(int(t), "s").astype("datetime64[M]"))
+
+def month_edges(start, end):
+    """[start, 1ers des mois suivants…, end] en secondes epoch."""
+    months = np.arange(np.datetime64(start, "s").astype("datetime64[M]") + 1,
+                       np.datetime64(end, "s").astype("datetime64[M]") + 1)
+    inner = [int(m) for m in months.astype("datetime64[s]").astype(np.int64) if start < m < end]
+    return [start] + inner + [end]
+
+def trace_shards(total, n_sa, start, end, shard_rows):
+    """Args (lo, hi, n_sa, t0, t1) des shards de digital_trace sur [start, end) :
+    lignes réparties au prorata de la durée de chaque mois, puis de chaque
+    tranche ; aucun shard ne chevauche deux mois."""
+    end = max(end, start + 1)
+    edges, span = month_edges(start, end), end - start
+    shards = []
+    for m0, m1 in zip(edges, edges[1:]):
+        lo_m, hi_m = total*(m0-start)//span, total*(m1-start)//span
+        k = hi_m - lo_m
+        for lo in range(lo_m, hi_m, shard_rows):
+            hi = min(lo + shard_rows, hi_m)
+            shards.append((lo, hi, n_sa, m0 + (m1-m0)*(lo-lo_m)//k, m0 + (m1-m0)*(hi-lo_m)//k))
+    return shards or [(0, 0, n_sa, start, end)]
+
+# ───────── CHARGEMENT ──────────
+def write_loaders(folder, months, fmt):
+    """load.sql (\\copy mois par mois dans digital_trace) et attach.sql (une
+    partition par mois) pour les fichiers de `folder` ; `months` = [(mois,
+    rang de sa première ligne)] dans l'ordre."""
+    ext, opts = WRITERS[fmt].ext, "WITH (FORMAT binary)" if fmt.startswith("binary") else "CSV HEADER"
+    source = (lambda p: f"PROGRAM 'zcat {p}'") if ext.endswith(".gz") else (lambda p: f"'{p}'")
+    load = ["-- digital_trace par mois : chaque \\copy est indépendant (exécutables en parallèle, ex.",
+            f"--   ls {folder.as_posix()}/*.{ext} | xargs -P 8 -I{{}} psql -d le_big_match "
+            f"-c \"\\copy digital_trace({COLUMNS}) FROM {source('{}')} {opts}\")"]
+    attach = ["-- Variante partitionnée : schéma create_traces_partitioned.sql (PARTITION BY RANGE (ts),",
+              "-- PRIMARY KEY (trace_id, ts)). Chaque mois est chargé dans sa table, trace_id",
+              "-- numéroté depuis le rang de sa première ligne, puis attaché : la contrainte CHECK",
+              "-- et la clé primaire posées avant évitent le parcours de validation d'ATTACH.",
+              "\\set ON_ERROR_STOP on"]
+    for m, first in months:
+        path, part = f"{folder.as_posix()}/{m}.{ext}", f"digital_trace_{m.replace('-', '_')}"
+        lo = f"{m}-01"
+        hi = str(np.datetime64(m, "M") + 1) + "-01"
+        load.append(f"\\copy digital_trace({COLUMNS}) FROM {source(path)} {opts}")
+        attach += [f"CREATE TABLE {part} (LIKE digital_trace, CHECK (ts >= '{lo}' AND ts < '{hi}'));",
+                   f"ALTER TABLE {part} ALTER COLUMN trace_id ADD GENERATED ALWAYS AS IDENTITY (START WITH {first + 1});",
+                   f"\\copy {part}({COLUMNS}) FROM {source(path)} {opts}",
+                   f"ALTER TABLE {part} ALTER COLUMN trace_id DROP IDENTITY, ADD PRIMARY KEY (trace_id, ts);",
+                   f"ALTER TABLE digital_trace ATTACH PARTITION {part} FOR VALUES FROM ('{lo}') TO ('{hi}');"]
+    attach += ["SELECT setval(pg_get_serial_sequence('digital_trace', 'trace_id'), COALESCE(max(trace_id), 0) + 1, false)",
+               "FROM digital_trace;",
+               "ANALYZE digital_trace;"]
+    (folder / "load.sql").write_text("\n".join(load) + "\n", encoding="utf8")
+    (folder / "attach.sql").write_text("\n".join(attach) + "\n", encoding="utf8")
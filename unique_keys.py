@@ -0,0 +1,143 @@
+"""
+unique_keys.py – Le Big Match
+─────────────────────────────
+Clés uniques **par construction**, sans ensemble de valeurs déjà émises :
+la mémoire ne dépend pas du nombre de clés produites.
+
+• `Permutation(n, seed)` : bijection pseudo-aléatoire de [0, n) (réseau de
+  Feistel + cycle-walking). Le k-ième élément d'un tirage SANS remise est
+  P(k) : chaque shard calcule sa plage de k indépendamment des autres.
+• Couples (source, cible) distincts, source ≠ cible (likes) et couples
+  (user, event) distincts (participation) décodés depuis un index de paire.
+• Identifiants externes (provider, external_uid) : image de user_id par une
+  permutation propre au provider, encodée au format de la plateforme.
+"""
+import random
+
+import numpy as np
+
+ROUNDS = 6
+MULT   = 0x9E3779B97F4A7C15   # constante de Fibonacci (hachage multiplicatif)
+MASK64 = (1 << 64) - 1
+ALPHA26 = "abcdefghijklmnopqrstuvwxyz"
+ALPHA36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+class Permutation:
+    """Bijection pseudo-aléatoire de [0, n) déterminée par `seed`.
+
+    Feistel équilibré sur 2·h bits (2^(2h) ≥ n), puis cycle-walking : on
+    réapplique le chiffrement tant que la valeur sort de [0, n)."""
+
+    def __init__(self, n, seed):
+        if n <= 0:
+            raise ValueError("domaine vide")
+        bits = max((n - 1).bit_length(), 2)
+        self.n, self.half = n, (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(64) for _ in range(ROUNDS)]
+
+    def _f(self, x, k):
+        y = ((x ^ k) * MULT) & MASK64
+        return ((y ^ (y >> 29)) * MULT & MASK64) >> (64 - self.half)
+
+    def _encrypt(self, x):
+        l, r = x >> self.half, x & self.mask
+        for k in self.keys:
+            l, r = r, l ^ self._f(r, k)
+        return (l << self.half) | r
+
+    def __call__(self, i):
+        """Image de l'entier i (0 ≤ i < n)."""
+        y = self._encrypt(i)
+        while y >= self.n:
+            y = self._encrypt(y)
+        return y
+
+    def _encrypt_np(self, x):
+        h, mult = np.uint64(self.half), np.uint64(MULT)
+        l, r = x >> h, x & np.uint64(self.mask)
+        for k in self.keys:
+            y = (r ^ np.uint64(k)) * mult
+            y = ((y ^ (y >> np.uint64(29))) * mult) >> np.uint64(64 - self.half)
+            l, r = r, l ^ y
+        return (l << h) | r
+
+    def take(self, idx):
+        """Version vectorisée (tableau d'indices → tableau int64)."""
+        if 2 * self.half > 63:
+            return np.array([self(int(i)) for i in idx], dtype=object)
+        y = self._encrypt_np(np.asarray(idx, dtype=np.uint64))
+        out = y >= np.uint64(self.n)
+        while out.any():
+            y[out] = self._encrypt_np(y[out])
+            out = y >= np.uint64(self.n)
+        return y.astype(np.int64)
+
+# ───────── COUPLES SANS REMISE ──────────
+def ordered_pairs(k, n):
+    """Index k ∈ [0, n(n-1)) → couple (a, b) d'identifiants 1..n avec a ≠ b."""
+    a, t = np.divmod(k, n - 1)
+    return a + 1, t + (t >= a) + 1
+
+def frame_pairs(k, lo, n):
+    """Index k ∈ [0, n(n-1) - lo(lo-1)) → couple (a, b) d'identifiants 1..n avec
+    a ≠ b et max(a, b) > lo : couples apparus quand n passe de lo à n
+    (lo = 0 → même décodage que ordered_pairs)."""
+    k = np.asarray(k, dtype=np.int64)
+    first = (n - lo) * (n - 1)           # a nouveau, b quelconque ≠ a
+    a, t = np.divmod(np.minimum(k, first - 1), n - 1)
+    a += lo
+    old, new = np.divmod(np.maximum(k - first, 0), max(n - lo, 1))   # a ancien, b nouveau
+    inner = k < first
+    return np.where(inner, a + 1, old + 1), np.where(inner, t + (t >= a) + 1, lo + new + 1)
+
+def grid_pairs(k, n_cols):
+    """Index k ∈ [0, n_rows·n_cols) → couple (ligne, colonne), identifiants 1-indexés."""
+    r, c = np.divmod(k, n_cols)
+    return r + 1, c + 1
+
+# ───────── CHAÎNES UNIQUES ──────────
+def encode(i, alphabet, width=0):
+    """Entier → chaîne dans `alphabet` (base len(alphabet)), complétée à `width`."""
+    base, out = len(alphabet), []
+    while i or len(out) < max(width, 1):
+        i, d = divmod(i, base)
+        out.append(alphabet[d])
+    return "".join(reversed(out))
+
+def unique_suffix(stem, i, sep="_"):
+    """`stem` + séparateur + i : unique dès que i l'est et que `sep` n'apparaît
+    pas dans i (le dernier séparateur délimite i)."""
+    return f"{stem}{sep}{i}"
+
+class ExternalUids:
+    """external_uid unique par provider : une permutation de user_id par provider
+    (un utilisateur a au plus un compte par provider). `first` > 0 (ajout de
+    lot) : seuls les user_id first+1..n_users sont permutés, dans [first, n_users)
+    → jamais la valeur d'un utilisateur antérieur."""
+    DOMAINS = {
+        "facebook":     9 * 10**11,   # 12 chiffres
+        "ticketmaster": 9 * 10**9,    # 10 chiffres
+        "snapchat":     26**8,        # 8 lettres
+        "linkedin":     16**22,       # urn:li:person:<22 hex>
+    }
+
+    def __init__(self, seed, n_users, first=0):
+        self.perm = {p: Permutation(d, f"{seed}:{p}") for p, d in self.DOMAINS.items()}
+        self.first = first
+        for p in ("instagram", "X", "tiktok"):
+            self.perm[p] = Permutation(n_users - first, f"{seed}:{p}@{first}" if first else f"{seed}:{p}")
+
+    def __call__(self, provider, uid, handle):
+        """Identifiant du compte `provider` de l'utilisateur `uid` ; `handle` =
+        pseudo slugifié pour les réseaux à identifiant textuel."""
+        if provider in self.DOMAINS:
+            k = self.perm[provider](uid - 1)
+        else:
+            k = self.first + self.perm[provider](uid - 1 - self.first)
+        if provider == "facebook":     return str(10**11 + k)
+        if provider == "ticketmaster": return str(10**9 + k)
+        if provider == "snapchat":     return encode(k, ALPHA26, 8)
+        if provider == "linkedin":     return "urn:li:person:%022x" % k
+        return unique_suffix(handle, encode(k, ALPHA36))
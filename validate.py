@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+validate.py – Le Big Match
+──────────────────────────
+Validation d'un jeu généré **avant** load.sql : chaque CSV est lu une seule
+fois, par blocs, dans l'ordre des clés étrangères, et toutes les violations
+des contraintes de create_tables.sql sont rapportées avec leur numéro de
+ligne — au lieu d'un ROLLBACK de toute la transaction après des heures de COPY.
+
+• Numéro de ligne = rang de l'enregistrement hors en-tête = identifiant SERIAL
+  qu'il recevra au chargement
+• Existence des clés étrangères : `Bitset` (1 bit par identifiant) des tables
+  référencées, test vectorisé par bloc
+• Unicité : clés composites en int64 (likes, participation, tag_*…), textes
+  (pseudo, email, (provider, external_uid)) par empreinte 64 bits ; tri en
+  fin de lecture (8 octets par ligne) ; les collisions d'empreinte sont
+  confirmées en relisant uniquement les lignes candidates
+• CHECK : majorité (birthday ≤ --today − 18 ans), height_cm, weight_kg,
+  price, no_self_like, ends_after_starts, depth ≥ 0 ; NOT NULL ; ENUM ;
+  format des entiers / dates
+• Règle d'annulation des likes (trg_check_subscription_active, respectée par
+  make_csv.py) : canceled_at renseigné ⇒ abonnement actif du source_user_id
+  le jour de l'annulation (subscription_index.py) ; le trigger ne se déclenche
+  qu'en UPDATE, la règle est donc vérifiée ici
+• Code de sortie 1 si au moins une violation ; --max = exemples affichés par
+  contrainte, --report = toutes les violations en CSV
+
+Exécution :
+    python validate.py CSV/
+    python validate.py CSV/ --today 2025-03-20 --max 20 --report violations.csv
+"""
+import argparse, csv, datetime, json, sys, time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from subscription_index import EPOCH_ORDINAL, SubscriptionIndex
+
+CHUNK = 500_000
+FILL = {"i": "0", "f": "nan", "M": "NaT"}   # valeur neutre des NULL par type NumPy
+SHIFT = np.int64(1 << 32)   # clé composite (a, b) = a·2³² + b (identifiants SERIAL < 2³¹)
+
+# valeurs des types ENUM de create_tables.sql
+ENUMS = {
+    "like_value":          {"like", "nope"},
+    "participation_state": {"interested", "going"},
+    "target_kind":         {"user", "event", "place"},
+    "gender_value":        {"man", "woman"},
+    "orientation_value":   {"heterosexual", "other"},
+    "provider_value":      {"facebook", "instagram", "X", "linkedin", "ticketmaster", "snapchat", "tiktok"},
+}
+# ordre de lecture = ordre des clés étrangères (celui de load.sql)
+TABLES = ["user", "place", "tag", "category", "tag_category", "category_closure", "event", "subscription",
+          "social_account", "digital_trace", "likes", "participation", "tag_assignment", "notification"]
+
+class Bitset:
+    """Ensemble d'identifiants positifs, 1 bit chacun (tableau uint64 extensible)."""
+
+    def __init__(self):
+        self.words = np.zeros(1, dtype=np.uint64)
+        self.count = 0
+
+    def add(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        need = int(ids.max()) // 64 + 1
+        if need > len(self.words):
+            self.words = np.concatenate([self.words, np.zeros(max(need, 2*len(self.words)) - len(self.words), np.uint64)])
+        np.bitwise_or.at(self.words, ids >> 6, np.uint64(1) << (ids & 63).astype(np.uint64))
+        self.count += len(ids)
+
+    def contains(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        ok = (ids > 0) & (ids < 64*len(self.words))
+        w = self.words[np.where(ok, ids, 0) >> 6]
+        return ok & ((w >> (ids & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+# ───────── BLOCS ──────────
+class Block:
+    """Bloc de lignes d'un CSV : colonnes converties à la demande, erreurs de
+    format signalées au validateur. `ids` = numéros de toutes les lignes (1…),
+    `row` = ceux des lignes contrôlées (nombre de colonnes correct)."""
+
+    def __init__(self, v, table, names, rows, first):
+        self.v, self.table = v, table
+        self.ids = self.row = np.arange(first + 1, first + len(rows) + 1)
+        width = len(names)
+        if any(len(r) != width for r in rows):
+            bad = np.array([len(r) != width for r in rows], dtype=bool)
+            v.report(table, self.row[bad], "nombre de colonnes ≠ en-tête")
+            self.row, rows = self.row[~bad], [r for r in rows if len(r) == width]
+        self.cols = dict(zip(names, map(np.array, zip(*rows)))) if rows else {n: np.array([], str) for n in names}
+
+    def __len__(self):
+        return len(self.row)
+
+    def text(self, name, not_null=False):
+        a = self.cols[name]
+        if not_null:
+            self.v.report(self.table, self.row[a == ""], f"{name} NOT NULL")
+        return a
+
+    def _parse(self, name, dtype, not_null):
+        a = self.cols[name]
+        null = a == ""
+        try:
+            vals = np.where(null, FILL[np.dtype(dtype).kind], a).astype(dtype)
+        except ValueError:   # lent : valeur par valeur, les invalides deviennent NULL
+            vals, bad = [], np.zeros(len(a), bool)
+            for i, x in enumerate(a.tolist()):
+                try:
+                    vals.append(np.array(x or FILL[np.dtype(dtype).kind]).astype(dtype))
+                except ValueError:
+                    vals.append(np.array(FILL[np.dtype(dtype).kind]).astype(dtype)); bad[i] = True
+            vals = np.array(vals, dtype=dtype)
+            self.v.report(self.table, self.row[bad], f"{name} format", a[bad])
+            null |= bad
+        if not_null:
+            self.v.report(self.table, self.row[null], f"{name} NOT NULL")
+        return vals, null
+
+    def int(self, name, not_null=False):
+        return self._parse(name, np.int64, not_null)
+
+    def float(self, name):
+        return self._parse(name, np.float64, False)
+
+    def date(self, name, not_null=False):
+        return self._parse(name, "datetime64[D]", not_null)
+
+    def ts(self, name, not_null=False):
+        return self._parse(name, "datetime64[s]", not_null)
+
+    def enum(self, name, typ, not_null=False):
+        a = self.text(name, not_null)
+        bad = (a != "") & ~np.isin(a, list(ENUMS[typ]))
+        self.v.report(self.table, self.row[bad], f"{name} ENUM {typ}", a[bad])
+        return a
+
+    def fk(self, name, target, not_null=False):
+        """Clé étrangère vers `target` (Bitset des identifiants déjà lus)."""
+        vals, null = self.int(name, not_null)
+        bad = ~null & ~self.v.ids[target].contains(vals)
+        self.v.report(self.table, self.row[bad], f"{name} → {target}", vals[bad])
+        return vals, null
+
+    def check(self, name, bad, values=None):
+        self.v.report(self.table, self.row[bad], name, values[bad] if values is not None else None)
+
+# ───────── VALIDATEUR ──────────
+class Validator:
+    """Violations comptées par (table, contrainte), `limit` exemples conservés
+    chacune (None = toutes) ; `ids[table]` = Bitset des identifiants lus."""
+
+    def __init__(self, folder, today, limit=10, json_payload=False):
+        self.folder, self.limit, self.json = Path(folder), limit, json_payload
+        self.adult = adult_cutoff(today)
+        self.ids = {}
+        self.counts, self.examples = Counter(), {}
+        self.keys = {}          # (table, contrainte) → [tableaux de clés int64]
+        self.hashed = {}        # (table, contrainte) → colonnes hachées (confirmation)
+        self.subs = [[], [], []]
+        self.parents = []
+        self.rows = {}
+
+    def report(self, table, rows, constraint, values=None):
+        if not len(rows):
+            return
+        key = (table, constraint)
+        self.counts[key] += len(rows)
+        ex = self.examples.setdefault(key, [])
+        room = len(rows) if self.limit is None else max(self.limit - len(ex), 0)
+        vals = [None] * len(rows) if values is None else np.asarray(values).tolist()
+        ex.extend(zip(np.asarray(rows)[:room].tolist(), vals[:room]))
+
+    def unique(self, table, constraint, keys):
+        self.keys.setdefault((table, constraint), []).append(np.asarray(keys, dtype=np.int64))
+
+    def unique_text(self, table, constraint, cols, *values):
+        """UNIQUE sur des textes : empreinte 64 bits par ligne, confirmée en fin."""
+        joined = values[0] if len(values) == 1 else ["\x00".join(t) for t in zip(*values)]
+        h = np.fromiter(map(hash, joined), dtype=np.int64, count=len(values[0]))
+        self.unique(table, constraint, h)
+        self.hashed[(table, constraint)] = cols
+
+    def serial(self, table, block):
+        self.ids.setdefault(table, Bitset()).add(block.ids)
+
+    # ───────── TABLES ──────────
+    def check_user(self, b):
+        self.serial("user", b)
+        self.unique_text("user", "pseudo UNIQUE", ["pseudo"], b.text("pseudo", True).tolist())
+        self.unique_text("user", "email UNIQUE", ["email"], b.text("email", True).tolist())
+        h, hn = b.int("height_cm")
+        b.check("height_cm BETWEEN 50 AND 300", ~hn & ((h < 50) | (h > 300)), h)
+        w, wn = b.float("weight_kg")
+        b.check("weight_kg > 0", ~wn & (w <= 0), w)
+        b.enum("gender", "gender_value")
+        b.enum("orientation", "orientation_value")
+        d, dn = b.date("birthday")
+        b.check("birthday majeur (18 ans)", ~dn & (d > self.adult), d)
+
+    def check_place(self, b):
+        self.serial("place", b)
+        b.text("name", True)
+
+    def check_tag(self, b):
+        self.serial("tag", b)
+        b.text("type", True)
+
+    def check_category(self, b):
+        self.serial("category", b)
+        b.text("name", True)
+        p, pn = b.int("parent_id")
+        self.parents.append((b.row[~pn], p[~pn]))   # auto-référence : contrôlée en fin de table
+
+    def check_tag_category(self, b):
+        t, _ = b.fk("tag_id", "tag", True)
+        c, _ = b.fk("category_id", "category", True)
+        self.unique("tag_category", "PRIMARY KEY (tag_id, category_id)", t*SHIFT + c)
+
+    def check_category_closure(self, b):
+        a, _ = b.fk("ancestor_id", "category", True)
+        d, _ = b.fk("descendant_id", "category", True)
+        k, kn = b.int("depth", True)
+        b.check("depth >= 0", ~kn & (k < 0), k)
+        self.unique("category_closure", "PRIMARY KEY (ancestor_id, descendant_id)", a*SHIFT + d)
+
+    def check_event(self, b):
+        self.serial("event", b)
+        b.text("title", True)
+        b.fk("tag_id", "tag")
+        s, _ = b.ts("starts_at", True)
+        e, en = b.ts("ends_at")
+        b.check("ends_after_starts", ~en & (e < s), e)
+        p, pn = b.float("price")
+        b.check("price >= 0", ~pn & (p < 0), p)
+        b.fk("place_id", "place")
+        b.fk("organiser_id", "user")
+
+    def check_subscription(self, b):
+        self.serial("subscription", b)
+        u, un = b.fk("user_id", "user")
+        s, sn = b.date("start_date", True)
+        e, en = b.date("end_date")
+        ok = ~un & ~sn
+        self.subs[0].append(u[ok])
+        self.subs[1].append(s[ok].astype(np.int64) + EPOCH_ORDINAL)
+        self.subs[2].append(np.where(en, 0, e.astype(np.int64) + EPOCH_ORDINAL)[ok])
+
+    def check_social_account(self, b):
+        self.serial("social_account", b)
+        b.fk("user_id", "user")
+        p = b.enum("provider", "provider_value", True)
+        x = b.text("external_uid", True)
+        self.unique_text("social_account", "UNIQUE (provider, external_uid)", ["provider", "external_uid"],
+                         p.tolist(), x.tolist())
+
+    def check_digital_trace(self, b):
+        self.serial("digital_trace", b)
+        b.fk("sa_id", "social_account")
+        b.text("trace_type", True)
+        b.ts("ts", True)
+        if self.json:
+            payload = b.text("payload")
+            bad = np.zeros(len(b), bool)
+            for i, s in enumerate(payload.tolist()):
+                if s:
+                    try: json.loads(s)
+                    except ValueError: bad[i] = True
+            b.check("payload JSONB", bad)
+
+    def check_likes(self, b):
+        s, sn = b.fk("source_user_id", "user", True)
+        t, tn = b.fk("target_user_id", "user", True)
+        b.enum("value", "like_value", True)
+        b.check("no_self_like", ~sn & (s == t), s)
+        self.unique("likes", "PRIMARY KEY (source_user_id, target_user_id)", s*SHIFT + t)
+        c, cn = b.ts("canceled_at")
+        sel = ~cn & ~sn
+        active = np.ones(len(b), bool)
+        active[sel] = self.active.active_batch(s[sel], c[sel].astype("datetime64[D]"))
+        b.check("canceled_at sans abonnement actif", ~active, s)
+
+    def check_participation(self, b):
+        u, _ = b.fk("user_id", "user", True)
+        e, _ = b.fk("event_id", "event", True)
+        b.enum("status", "participation_state", True)
+        self.unique("participation", "PRIMARY KEY (user_id, event_id)", u*SHIFT + e)
+
+    def check_tag_assignment(self, b):
+        t, _ = b.fk("tag_id", "tag", True)
+        kind = b.enum("target_type", "target_kind", True)
+        target, tn = b.int("target_id", True)
+        for k in ("user", "event", "place"):
+            sel = kind == k
+            bad = sel & ~tn & ~self.ids[k].contains(target)
+            b.check(f"target_id → {k}", bad, target)
+            self.unique("tag_assignment", f"PRIMARY KEY tag_{k}_assignment", t[sel]*SHIFT + target[sel])
+
+    def check_notification(self, b):
+        self.serial("notification", b)
+        b.fk("user_id", "user")
+        b.text("message", True)
+
+    # ───────── PASSE ──────────
+    def run(self, tables=TABLES):
+        for table in tables:
+            path = self.folder / f"{table}.csv"
+            if not path.exists():
+                self.ids.setdefault(table, Bitset())
+                continue
+            if table == "likes":
+                self.active = SubscriptionIndex(*(np.concatenate(c) if c else np.zeros(0, np.int64) for c in self.subs))
+            check = getattr(self, f"check_{table}")
+            n = 0
+            with open(path, newline="", encoding="utf8") as f:
+                r = csv.reader(f)
+                names = next(r, [])
+                while True:
+                    rows = [row for _, row in zip(range(CHUNK), r)]
+                    if not rows:
+                        break
+                    check(Block(self, table, names, rows, n))
+                    n += len(rows)
+            self.rows[table] = n
+            if table == "category":
+                for rows, parent in self.parents:
+                    self.report("category", rows[~self.ids["category"].contains(parent)], "parent_id → category")
+        self.finish()
+
+    def finish(self):
+        """Doublons des clés uniques ; empreintes de textes confirmées par relecture."""
+        for (table, constraint), parts in self.keys.items():
+            keys = np.concatenate(parts)
+            order = np.argsort(keys, kind="stable")
+            dup = np.flatnonzero(keys[order][1:] == keys[order][:-1]) + 1
+            if not len(dup):
+                continue
+            later, first = order[dup] + 1, order[dup - 1] + 1   # numéros de ligne
+            if (table, constraint) in self.hashed:
+                later, first = self.confirm(table, self.hashed[(table, constraint)], later, first)
+            self.report(table, later, constraint, [f"doublon de la ligne {x}" for x in first])
+        self.keys.clear()
+
+    def confirm(self, table, cols, later, first):
+        wanted = set(later.tolist()) | set(first.tolist())
+        values = {}
+        with open(self.folder / f"{table}.csv", newline="", encoding="utf8") as f:
+            r = csv.reader(f)
+            names = next(r)
+            idx = [names.index(c) for c in cols]
+            for i, row in enumerate(r, 1):
+                if i in wanted:
+                    values[i] = tuple(row[j] for j in idx)
+        keep = np.array([values[a] == values[b] for a, b in zip(later.tolist(), first.tolist())], dtype=bool)
+        return later[keep], first[keep]
+
+def adult_cutoff(today):
+    """CURRENT_DATE - INTERVAL '18 years' (29 février → 28 février)."""
+    try:
+        d = today.replace(year=today.year - 18)
+    except ValueError:
+        d = today.replace(year=today.year - 18, day=28)
+    return np.datetime64(d, "D")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Contrôle des contraintes de create_tables.sql avant chargement.")
+    ap.add_argument("folder", type=Path, nargs="?", default=Path("CSV"), help="dossier des CSV (défaut : CSV/)")
+    ap.add_argument("--today", type=datetime.date.fromisoformat, default=datetime.date.today(),
+                    help="CURRENT_DATE du chargement (CHECK de majorité ; défaut : aujourd'hui)")
+    ap.add_argument("--max", type=int, default=10, help="exemples affichés par contrainte")
+    ap.add_argument("--report", type=Path, metavar="CSV", help="toutes les violations : table,ligne,contrainte,valeur")
+    ap.add_argument("--json", action="store_true", help="vérifie aussi le JSON de digital_trace.payload (lent)")
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    v = Validator(args.folder, args.today, None if args.report else args.max, args.json)
+    v.run()
+    dt = time.perf_counter() - t0
+    total = sum(v.rows.values())
+    print(f"{total:,} lignes, {len(v.rows)} tables lues en {dt:.2f} s ({total/dt if dt else 0:,.0f} lignes/s)")
+    for (table, constraint), n in sorted(v.counts.items(), key=lambda kv: TABLES.index(kv[0][0])):
+        print(f"✗ {table:<16} {constraint:<45} {n:>10,}")
+        for row, value in v.examples[(table, constraint)][:args.max]:
+            print(f"      ligne {row}" + ("" if value is None else f" : {value}"))
+    if args.report:
+        with open(args.report, "w", newline="", encoding="utf8") as f:
+            w = csv.writer(f)
+            w.writerow(["table", "row", "constraint", "value"])
+            for (table, constraint), ex in v.examples.items():
+                w.writerows([table, row, constraint, "" if value is None else value] for row, value in ex)
+    if v.counts:
+        print(f"❌ {sum(v.counts.values()):,} violation(s) : chargement refusé")
+        return 1
+    print("✅ aucune violation")
+
+if __name__ == "__main__":
+    sys.exit(main())
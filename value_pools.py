@@ -0,0 +1,77 @@
+"""
+value_pools.py – Le Big Match
+─────────────────────────────
+Réservoirs de valeurs Faker tirés **une seule fois** par champ, puis
+échantillonnés par index NumPy : une table est produite colonne par colonne
+(tableaux entiers) au lieu d'un appel Faker par ligne et par champ.
+
+• Locale fr_FR inchangée, valeurs issues des mêmes fournisseurs Faker
+• Horodatages, dates et prix calculés par arithmétique vectorisée
+• Réservoirs déterministes : même graine ⇒ mêmes réservoirs dans chaque worker
+"""
+import numpy as np
+from faker import Faker
+from slugify import slugify
+
+from dataset import STR, Column
+
+POOL_SIZE = 20_000   # valeurs distinctes par champ (plafond)
+
+class ValuePools:
+    """Réservoirs de valeurs Faker, un tableau NumPy de chaînes par champ."""
+
+    def __init__(self, seed, size=POOL_SIZE, locale="fr_FR"):
+        fake = Faker(locale)
+        fake.seed_instance(seed)
+        draw = lambda f: np.array([f() for _ in range(size)])
+        emails = [fake.email().split("@") for _ in range(size)]
+        self.user_name   = draw(lambda: slugify(fake.user_name()))
+        self.email_local = np.array([e[0] for e in emails])
+        self.email_domain = np.array([e[1] for e in emails])
+        self.city        = draw(fake.city)
+        self.country     = draw(fake.current_country)
+        self.company     = draw(fake.company)
+        self.address     = draw(lambda: fake.address().replace("\n", " "))
+        self.sentence    = draw(lambda: fake.sentence(10))
+        self.word        = draw(fake.word)
+        self.image_url   = draw(fake.image_url)
+        self.labels      = {}   # réservoirs convertis pour les colonnes codes
+
+    def sample(self, field, rng, n):
+        """n valeurs du réservoir `field`, tirées uniformément (liste de str)."""
+        pool = getattr(self, field)
+        return pool[rng.integers(0, len(pool), n)].tolist()
+
+    def column(self, field, rng, n):
+        """Même tirage que sample(), en colonne codes (index dans le réservoir, sans copie des chaînes)."""
+        if field not in self.labels:
+            self.labels[field] = np.asarray(getattr(self, field), dtype=STR)
+        pool = self.labels[field]
+        return Column.codes(rng.integers(0, len(pool), n), pool)
+
+def choice(rng, values, n):
+    """Équivalent vectorisé de `random.choice(values)` répété n fois."""
+    return np.asarray(values)[rng.integers(0, len(values), n)].tolist()
+
+def iso_column(ts):
+    """datetime64[s] → chaînes 'YYYY-MM-DD HH:MM:SS' (format CSV du générateur)."""
+    if not len(ts): return []   # np.char.replace refuse un tableau vide
+    return np.char.replace(np.datetime_as_string(ts, unit="s"), "T", " ").tolist()
+
+def date_column(days):
+    """datetime64[D] → chaînes 'YYYY-MM-DD'."""
+    return np.datetime_as_string(days, unit="D").tolist()
+
+def ts_this_year(rng, now, n, since=None):
+    """n horodatages uniformes entre le 1er janvier (ou `since` s'il est plus
+    récent : lot ajouté par make_csv.py --append) et `now` (datetime64[s])."""
+    now = np.datetime64(now, "s")
+    year_start = now.astype("datetime64[Y]").astype("datetime64[s]")
+    if since is not None:
+        year_start = max(year_start, np.datetime64(since, "s"))
+    span = max(int((now - year_start).astype(np.int64)), 1)
+    return year_start + rng.integers(0, span, n).astype("timedelta64[s]")
+
+def days_from(rng, today, lo_days, hi_days, n):
+    """n dates entre today+lo_days et today+hi_days inclus (datetime64[D])."""
+    return np.datetime64(today, "D") + rng.integers(lo_days, hi_days + 1, n).astype("timedelta64[D]")